@@ -2,15 +2,19 @@ import streamlit as st
 import pandas as pd
 import folium
 from streamlit_folium import st_folium
-from components.hazard_map import HazardMap
+from components.hazard_map import HazardMap, get_rendered_map_cache
 from components.enhanced_route_planner import EnhancedRoutePlanner
 from components.enhanced_safety_gpt import EnhancedSafetyGPT
 from components.enhanced_data_ingestion import EnhancedDataIngestion
 from components.community_reporting import CommunityReporting
 from models.hazard_clustering import HazardClustering
 from utils.database import DatabaseManager
+from utils.density_grid import get_density_grids
 from utils.error_handling import ErrorHandler
+from utils.hazard_filters import HazardFilter, get_filter_cache
+from utils.hazard_lod import HazardLOD, bbox_contains, viewport_around, viewport_from_state
 from utils.performance import PerformanceMonitor
+from utils.spatial import lonlat_to_tile, tile_bounds
 from utils.config import Config
 
 # Initialize configuration
@@ -26,6 +30,7 @@ class FinalSafeRouteApp:
         self.clustering = HazardClustering()
         self.performance_monitor = PerformanceMonitor()
         self.hazard_map = HazardMap()
+        self.hazard_lod = HazardLOD()
         
     def render_sidebar(self):
         """Render enhanced sidebar with filters"""
@@ -115,22 +120,87 @@ class FinalSafeRouteApp:
         with col1:
             # Load and process hazards
             with st.spinner("Loading real-time hazard data..."):
-                hazards_df = self.data_ingestion.get_real_time_hazards()
+                snapshot = self.data_ingestion.get_hazard_snapshot()
                 
-                # Apply clustering and risk prediction
-                if not hazards_df.empty:
-                    clustered_hazards = self.clustering.cluster_hazards(hazards_df)
-                    risk_assessed_hazards = self.clustering.predict_risk_zones(clustered_hazards)
+                # Filters are applied first (cached per snapshot and filter), so
+                # clustering and rendering only see the hazards that will be shown
+                hazard_filter = HazardFilter.from_dict(filters)
+                hazards_df = get_filter_cache().apply(snapshot, hazard_filter)
+                if len(hazards_df) < len(snapshot):
+                    st.caption(f"{len(hazards_df)} of {len(snapshot)} hazards match the selected filters")
+                
+                if Config.TILE_SERVER_URL:
+                    # Hazards stream from tile_server.py as vector tiles; nothing is embedded
+                    hazard_map = self.hazard_map.create_vector_map(Config.TILE_SERVER_URL, hazard_filter=hazard_filter)
+                    st_folium(hazard_map, width=800, height=600, key='hazard_vector_map', returned_objects=[])
+                elif not hazards_df.empty:
+                    # Density grids follow the filtered snapshot incrementally; a no-op until it changes
+                    get_density_grids(hazard_filter).update(hazards_df)
                     
-                    # Render map
-                    hazard_map = self.hazard_map.create_map(risk_assessed_hazards)
-                    st_folium(hazard_map, width=800, height=600)
+                    # Render only what the current viewport needs, at its level of detail
+                    self.render_lod_map(hazards_df, hazard_filter)
+                elif not snapshot.empty:
+                    st.info("No hazards match the selected filters")
                 else:
                     st.info("No hazard data available")
         
         with col2:
             self.render_hazard_insights(hazards_df)
     
+    def render_lod_map(self, hazards_df, hazard_filter, width=800, height=600):
+        """Serve the map at the viewport st_folium last reported; re-serve when the user leaves it.
+        
+        `hazards_df` is the snapshot already filtered by `hazard_filter`.
+        Built maps are cached by (snapshot version, filter, zoom, viewport
+        tile), so reruns that change none of them skip clustering, risk
+        prediction and map building.
+        """
+        viewport = st.session_state.get('hazard_map_viewport') or {
+            'center': self.hazard_map.default_location, 'zoom': self.hazard_map.zoom_level}
+        zoom = int(round(viewport['zoom']))
+        
+        # Snap to the tile under the viewport centre: nearby viewports share one map,
+        # and the padded region served around the tile still covers the real viewport
+        x, y = (int(v) for v in lonlat_to_tile(viewport['center'][1], viewport['center'][0], zoom))
+        west, south, east, north = tile_bounds(zoom, x, y)
+        tile_center = [(south + north) / 2, (west + east) / 2]
+        snapshot_version = hazards_df.attrs.get('snapshot_version')
+        key = None if snapshot_version is None else (
+            snapshot_version, hazard_filter, zoom, x, y, width, height)
+        
+        def build():
+            clustered_hazards = self.clustering.cluster_hazards(hazards_df)
+            risk_assessed_hazards = self.clustering.predict_risk_zones(clustered_hazards)
+            bbox = viewport_around(tile_center[0], tile_center[1], zoom, width, height)
+            view = self.hazard_lod.view(risk_assessed_hazards, bbox, zoom)
+            density = get_density_grids(hazard_filter).cells(view.zoom, view.bbox)
+            return self.hazard_map.create_lod_map(view, location=tile_center, zoom=zoom, density=density), view
+        
+        map_cache = get_rendered_map_cache()
+        hazard_map, view = map_cache.get_or_build(key, build)
+        if view.level == 'grid':
+            st.caption(f"{view.total} hazards summarized in {len(view.frame)} areas; zoom in to see individual hazards")
+        elif len(view.frame) < view.total:
+            st.caption(f"Showing the {len(view.frame)} most severe of {view.total} hazards here; zoom in for the rest")
+        
+        state = st_folium(hazard_map, width=width, height=height, key='hazard_map',
+                          center=viewport['center'], zoom=zoom, returned_objects=['bounds', 'zoom', 'center'])
+        st.caption(f"Map cache: {map_cache.hit_rate():.0%} hits, "
+                   f"{map_cache.stats['saved_seconds']:.1f}s of map building saved")
+        
+        reported = viewport_from_state(state)
+        if reported is None:
+            return
+        bbox, zoom = reported
+        # Panning inside the padded region that was served needs no new data
+        if round(zoom) != view.zoom or not bbox_contains(view.bbox, bbox):
+            center = state.get('center') or {}
+            st.session_state['hazard_map_viewport'] = {
+                'zoom': zoom,
+                'center': [center.get('lat', (bbox[1] + bbox[3]) / 2), center.get('lng', (bbox[0] + bbox[2]) / 2)]
+            }
+            st.rerun()
+    
     def render_hazard_insights(self, hazards_df):
         """Render hazard insights and alerts"""
         st.subheader("Hazard Insights")
@@ -144,6 +214,15 @@ class FinalSafeRouteApp:
                      len(hazards_df[hazards_df.get('is_hotspot', False)]))
             st.metric("Verification Rate", f"{stats['verification_rate']:.1f}%")
             
+            # Flag sources served from an older snapshot
+            for source, status in hazards_df.attrs.get('source_status', {}).items():
+                if status['state'] == 'stale':
+                    st.caption(f"{source.title()} data is {status['age_seconds']:.0f}s old ({status['reason']})")
+                elif status['state'] == 'missing':
+                    st.caption(f"{source.title()} data unavailable")
+            if hazards_df.attrs.get('duplicates_merged'):
+                st.caption(f"{hazards_df.attrs['duplicates_merged']} duplicate reports merged across sources")
+            
             # Alert for emerging patterns
             recent_count = stats['recent_activity']
             if recent_count > 10:
@@ -151,7 +230,7 @@ class FinalSafeRouteApp:
             
             # Top hazard types
             st.write("**Top Hazards:**")
-            for hazard_type in hazards_df['hazard_type'].value_counts().head(3).items():
+            for hazard_type in hazards_df['hazard_type'].astype(str).value_counts().head(3).items():
                 st.write(f"- {hazard_type[0]}: {hazard_type[1]}")
         else:
             st.info("No insights available")
@@ -179,12 +258,14 @@ class FinalSafeRouteApp:
             
             if st.button("Find Safest Route", type="primary"):
                 with st.spinner("Calculating optimal safe route..."):
-                    hazards_df = self.data_ingestion.get_real_time_hazards()
+                    hazards_df = self.data_ingestion.get_hazard_snapshot()
                     route_result = self.route_planner.find_safest_route(
                         start_location, end_location, hazards_df,
                         preferences={
                             'avoid_high_risk': avoid_high_risk,
-                            'consider_weather': consider_weather
+                            'prefer_main_roads': prefer_main_roads,
+                            'consider_weather': consider_weather,
+                            'max_detour': max_detour
                         }
                     )
                     st.session_state['route_result'] = route_result
@@ -208,6 +289,27 @@ class FinalSafeRouteApp:
                     st.write("**Hazards Avoided:**")
                     for hazard in route['hazards_avoided'][:5]:
                         st.write(f"{hazard}")
+                
+                # Hazard exposure along the route
+                analysis = route.get('hazard_analysis', {})
+                if analysis.get('by_type'):
+                    st.write("**Hazards Along Route:**")
+                    for hazard_type, count in analysis['by_type'].items():
+                        st.write(f"- {hazard_type}: {count}")
+                
+                # Alternative routes
+                if route.get('alternatives'):
+                    st.write("**Alternative Routes:**")
+                    for alternative in route['alternatives']:
+                        with st.expander(
+                            f"{alternative['details']} - Safety {alternative['safety_score']}/100, "
+                            f"{alternative['distance_km']:.1f} km"
+                        ):
+                            st.write(" → ".join(alternative['route']))
+                            st.write(f"**Est. Time:** {alternative['estimated_time']}")
+                            st.write(f"**Hazard Exposure:** {alternative['hazard_exposure']}")
+                            st.write(f"**Hazards on Route:** "
+                                    f"{alternative['hazard_analysis']['total_hazards']}")
     
     def render_community_reporting_tab(self):
         """Render community reporting and engagement"""
@@ -302,7 +404,8 @@ class FinalSafeRouteApp:
             
             if st.button("Generate Comprehensive Analysis", type="primary"):
                 with st.spinner("AI is analyzing safety patterns..."):
-                    hazards_df = self.data_ingestion.get_real_time_hazards()
+                    hazards_df = get_filter_cache().apply(self.data_ingestion.get_hazard_snapshot(),
+                                                          HazardFilter.from_dict(filters))
                     recommendations = self.safety_gpt.generate_comprehensive_analysis(
                         scope=analysis_scope,
                         focus_areas=focus_areas,
@@ -3,6 +3,7 @@ from datetime import datetime
 import json
 import os
 import random
+from utils.cache_manager import invalidate_hazards
 
 class CommunityReporting:
     def __init__(self):
@@ -135,6 +136,8 @@ class CommunityReporting:
             
             with open(self.reports_file, 'w') as f:
                 json.dump(reports, f, indent=2)
+            
+            invalidate_hazards(report_data['lat'], report_data['lon'])
                 
         except Exception as e:
             st.error(f"Failed to save report: {e}")
@@ -155,6 +158,7 @@ class CommunityReporting:
             with open(self.reports_file, 'r') as f:
                 reports = json.load(f)
             
+            updated = None
             for report in reports:
                 if report['id'] == report_id:
                     report['status'] = status
@@ -162,10 +166,14 @@ class CommunityReporting:
                     report['verified_by'] = "admin_user"
                     if notes:
                         report['verification_notes'] = notes
+                    updated = report
                     break
             
             with open(self.reports_file, 'w') as f:
                 json.dump(reports, f, indent=2)
+            
+            if updated is not None and updated.get('lat') is not None:
+                invalidate_hazards(updated['lat'], updated.get('lon'))
                 
             return True
         except Exception as e:
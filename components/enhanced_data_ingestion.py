@@ -1,44 +1,186 @@
 ﻿import requests
 import pandas as pd
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import functools
 import random
+import threading
+import time
 import streamlit as st
 from utils.config import Config
 from utils.database import DatabaseManager
+from utils.hazard_schema import HAZARD_TYPES
+from utils.hazard_store import HazardSnapshot, HazardTable
+from utils.invalidation import get_invalidation_bus
+from components.real_mapbox_integration import RealMapboxIntegration
+from components.source_adapters import DatabaseSource, MapboxIncidentSource, TrafficIncidentSource, WeatherSource
+from models.hazard_dedup import HazardDeduplicator
+
+# Shared by all sessions: source fetches run on this pool and their deltas
+# are merged into one long-lived hazard table per bbox, next to each
+# source's high-water mark and last successful poll time.
+_source_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='hazard-source')
+_hazard_tables = {}
+_source_state = {}
+_hazard_snapshots = {}
+_deduplicated = {}  # bbox -> (table version, deduplicated frame)
+_state_lock = threading.Lock()
+
+
+def _get_hazard_table(bbox):
+    with _state_lock:
+        return _hazard_tables.setdefault(bbox, HazardTable(window_hours=24))
+
+
+def _get_ingestion_state(bbox, source):
+    table = _get_hazard_table(bbox)
+    with _state_lock:
+        state = _source_state.setdefault((source, bbox), {'watermark': None, 'fetched_at': None})
+    return table, state
+
+
+def expire_hazard_snapshots(keys=None):
+    """Reload every hazard snapshot on its next read.
+
+    Subscribed to the invalidation bus, so a hazard write reaches readers
+    at once instead of after the snapshot interval.
+    """
+    with _state_lock:
+        snapshots = list(_hazard_snapshots.values())
+    for snapshot in snapshots:
+        snapshot.expire()
+
+
+def _merge_delta(table, state, source, batch):
+    """Upsert a source delta and advance its high-water mark"""
+    table.upsert(source, batch.frame)
+    with _state_lock:
+        if batch.watermark and (state['watermark'] is None or batch.watermark > state['watermark']):
+            state['watermark'] = batch.watermark
+        state['fetched_at'] = datetime.now()
+
+
+def _merge_late_delta(table, state, source, future):
+    """Merge a delta that arrived after its deadline so the next call sees it"""
+    if not future.cancelled() and future.exception() is None:
+        _merge_delta(table, state, source, future.result())
+
 
 class EnhancedDataIngestion:
     def __init__(self):
         self.db = DatabaseManager()
-        self.hazard_types = [
-            'Potholes', 'Flooding', 'Accidents', 'Road Closures',
-            'Construction', 'Debris', 'Landslides', 'Traffic'
-        ]
+        self.hazard_types = [hazard_type for hazard_type in HAZARD_TYPES if hazard_type != 'Other']
         self.locations = [
             'Connaught Place', 'India Gate', 'Rajpath', 'Janpath', 
             'Barakhamba Road', 'Kasturba Gandhi Marg', 'Parliament Street',
             'Ashoka Road', 'Mandir Marg', 'Bangla Sahib Road'
         ]
+        # Source name -> SourceAdapter; each carries its own deadline and watermark field
+        traffic = TrafficIncidentSource() if Config.DEBUG else MapboxIncidentSource(RealMapboxIntegration())
+        self.feeds = {adapter.name: adapter for adapter in (traffic, WeatherSource())}
+        fallback = None if Config.INGESTION_MODE == 'service' else functools.partial(self.generate_mock_hazards, 30)
+        self.sources = {'database': DatabaseSource(self.db, fallback=fallback)}
+        self.deduplicator = HazardDeduplicator()
+        if Config.INGESTION_MODE != 'service':
+            # In service mode feeds are polled by ingestion_service.py and the UI only reads the store
+            self.sources.update(self.feeds)
+    
+    def get_hazard_snapshot(self, bbox="77.2090,28.6139,77.2290,28.6339"):
+        """Get the process-wide hazard snapshot for a bbox.
+        
+        Shared by every tab and session and reloaded at most once per
+        Config.HAZARD_UPDATE_INTERVAL seconds. In service mode the published
+        data version is polled instead and the snapshot reloads only when
+        the ingestion service has written new data. The frame is shared
+        without copying, so callers must not modify it in place.
+        """
+        with _state_lock:
+            snapshot = _hazard_snapshots.get(bbox)
+            if snapshot is None:
+                loader = functools.partial(self.get_real_time_hazards, bbox)
+                if Config.INGESTION_MODE == 'service':
+                    snapshot = HazardSnapshot(loader, Config.VERSION_POLL_INTERVAL,
+                                              version_probe=self.db.get_data_version)
+                else:
+                    snapshot = HazardSnapshot(loader, Config.HAZARD_UPDATE_INTERVAL)
+                if not _hazard_snapshots:
+                    get_invalidation_bus().subscribe(expire_hazard_snapshots)
+                _hazard_snapshots[bbox] = snapshot
+        return snapshot.get()
     
     def get_real_time_hazards(self, bbox="77.2090,28.6139,77.2290,28.6339"):
-        """Get real-time hazards from multiple sources"""
-        hazards = []
+        """Get real-time hazards from multiple sources concurrently.
         
-        # Get from database first
-        db_hazards = self.db.get_recent_hazards(hours=24)
-        if not db_hazards.empty:
-            hazards.extend(db_hazards.to_dict('records'))
-        else:
-            # Generate mock data if no database entries
-            hazards.extend(self.generate_mock_hazards(30))
+        Each source is polled in parallel for records newer than its
+        high-water mark, under its own deadline, so page latency is set by
+        the slowest deadline rather than the sum of source latencies. Deltas
+        are upserted into a long-lived table keyed by (source, id) that
+        expires rows older than 24 hours, so merge cost follows the amount of
+        new data rather than the window size. Reports of the same hazard from
+        different sources are then merged (see HazardDeduplicator).
         
-        # Add real API data (mock for now)
-        traffic_incidents = self._get_traffic_incidents(bbox)
-        hazards.extend(traffic_incidents)
+        A source that times out or fails keeps the rows it delivered last
+        time. Per-source freshness is attached to the result as
+        `attrs['source_status']`, and `attrs['partial']` is set when any
+        source is not fresh.
+        """
+        started = time.monotonic()
+        polls = {}
+        for name, source in self.sources.items():
+            table, state = _get_ingestion_state(bbox, name)
+            polls[name] = (table, state, _source_executor.submit(source.fetch, bbox, state['watermark']))
         
-        weather_hazards = self._get_weather_hazards(bbox)
-        hazards.extend(weather_hazards)
+        source_status = {}
+        for name, (table, state, future) in polls.items():
+            source = self.sources[name]
+            status = {'state': 'fresh'}
+            try:
+                batch = future.result(timeout=max(0.0, started + source.timeout - time.monotonic()))
+                _merge_delta(table, state, name, batch)
+                status['new_records'] = len(batch.frame)
+            except FutureTimeoutError:
+                # Merge the delta whenever it arrives
+                future.add_done_callback(
+                    functools.partial(_merge_late_delta, table, state, name)
+                )
+                status = {'state': 'stale', 'reason': 'timeout'}
+            except Exception as e:
+                status = {'state': 'stale', 'reason': f'error: {e}'}
+            
+            fetched_at = state['fetched_at']
+            if fetched_at is None:
+                status['state'] = 'missing'
+            status.update(
+                fetched_at=fetched_at,
+                age_seconds=round((datetime.now() - fetched_at).total_seconds(), 1) if fetched_at else None
+            )
+            source_status[name] = status
+        
+        hazards_df = self._deduplicated_hazards(bbox)
+        hazards_df.attrs['source_status'] = source_status
+        hazards_df.attrs['partial'] = any(status['state'] != 'fresh' for status in source_status.values())
+        return hazards_df
+    
+    def _deduplicated_hazards(self, bbox):
+        """Deduplicated rows of a bbox's hazard table, rebuilt only when the table version changes.
         
-        return pd.DataFrame(hazards)
+        Returns a shallow copy, so per-call attrs don't leak into the cached frame.
+        """
+        table = _get_hazard_table(bbox)
+        table.expire()
+        # Read before to_frame: a change merged in between only costs a rebuild next time
+        version = table.version
+        with _state_lock:
+            cached = _deduplicated.get(bbox)
+        if cached is None or cached[0] != version:
+            merged_rows = table.to_frame()
+            hazards_df = self.deduplicator.deduplicate(merged_rows)
+            hazards_df.attrs['data_version'] = version
+            hazards_df.attrs['duplicates_merged'] = len(merged_rows) - len(hazards_df)
+            cached = (version, hazards_df)
+            with _state_lock:
+                _deduplicated[bbox] = cached
+        return cached[1].copy(deep=False)
     
     def generate_mock_hazards(self, count=50):
         """Generate mock hazard data for demonstration"""
@@ -73,38 +215,3 @@ class EnhancedDataIngestion:
             self.db.save_hazard(hazard)
         
         return hazards
-    
-    def _get_traffic_incidents(self, bbox):
-        """Get traffic incidents (mock implementation)"""
-        incidents = []
-        for i in range(5):
-            incidents.append({
-                'id': f"TRAFFIC_{i}",
-                'hazard_type': random.choice(['Accidents', 'Traffic', 'Road Closures']),
-                'severity': random.randint(2, 4),
-                'confidence': 85,
-                'lat': 28.6139 + random.uniform(-0.05, 0.05),
-                'lon': 77.2090 + random.uniform(-0.05, 0.05),
-                'location': 'Road Incident',
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M'),
-                'description': 'Traffic incident reported',
-                'source': 'Traffic API',
-                'verified': True
-            })
-        return incidents
-    
-    def _get_weather_hazards(self, bbox):
-        """Get weather-related hazards (mock implementation)"""
-        return [{
-            'id': 'WEATHER_001',
-            'hazard_type': 'Flooding',
-            'severity': 3,
-            'confidence': 75,
-            'lat': 28.6250,
-            'lon': 77.2150,
-            'location': 'Connaught Place Area',
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M'),
-            'description': 'Heavy rainfall causing waterlogging',
-            'source': 'Weather API',
-            'verified': True
-        }]
@@ -5,10 +5,22 @@ from geopy.distance import geodesic
 import streamlit as st
 import random
 from utils.error_handling import DataValidator
+from utils.gazetteer import Gazetteer, get_gazetteer
+from utils.spatial import HazardIndex
 
 class EnhancedRoutePlanner:
     def __init__(self):
         self.road_network = self._create_road_network()
+        self.node_index = Gazetteer(
+            (name, lat, lon, 'node')
+            for name, (lat, lon) in nx.get_node_attributes(self.road_network, 'pos').items()
+        )
+        self.default_center = (28.6139, 77.2090)  # Delhi coordinates
+        self.corridor_radius_m = 300  # Hazards this close to a segment count as exposure
+        self.risk_weight_km = 0.5  # Detour (km) worth accepting per unit of hazard exposure
+        self.exposure_scale = 25.0  # Exposure at which the safety score drops to ~37
+        self.max_route_overlap = 0.8  # Max shared length between alternatives
+        self.average_speed_kmh = 24
     
     def _create_road_network(self):
         """Create a graph representing the road network"""
@@ -21,7 +33,11 @@ class EnhancedRoutePlanner:
             'Rajiv Chowk': (28.6326, 77.2197),
             'Kashmere Gate': (28.6660, 77.2285),
             'Nehru Place': (28.5480, 77.2522),
-            'Hauz Khas': (28.5545, 77.1947)
+            'Hauz Khas': (28.5545, 77.1947),
+            'Lodhi Road': (28.5910, 77.2270),
+            'AIIMS': (28.5672, 77.2100),
+            'Karol Bagh': (28.6519, 77.1909),
+            'Lajpat Nagar': (28.5677, 77.2433)
         }
         
         for name, coords in locations.items():
@@ -34,7 +50,15 @@ class EnhancedRoutePlanner:
             ('India Gate', 'Rajiv Chowk', 2.0),
             ('Connaught Place', 'Kashmere Gate', 4.0),
             ('Rajiv Chowk', 'Nehru Place', 8.0),
-            ('Nehru Place', 'Hauz Khas', 3.0)
+            ('Nehru Place', 'Hauz Khas', 3.0),
+            ('India Gate', 'Lodhi Road', 2.6),
+            ('Lodhi Road', 'Lajpat Nagar', 3.4),
+            ('Lajpat Nagar', 'Nehru Place', 2.6),
+            ('Lodhi Road', 'AIIMS', 3.5),
+            ('AIIMS', 'Hauz Khas', 2.4),
+            ('AIIMS', 'Lajpat Nagar', 3.8),
+            ('Connaught Place', 'Karol Bagh', 4.2),
+            ('Karol Bagh', 'Kashmere Gate', 4.8)
         ]
         
         for u, v, dist in edges:
@@ -51,7 +75,8 @@ class EnhancedRoutePlanner:
             preferences = {
                 'avoid_high_risk': True,
                 'minimize_exposure': True,
-                'consider_weather': True
+                'consider_weather': True,
+                'max_detour': 25
             }
         
         try:
@@ -61,91 +86,275 @@ class EnhancedRoutePlanner:
                 missing_cols = [col for col in required_hazard_cols if col not in hazards_df.columns]
                 if missing_cols:
                     st.warning(f"Missing hazard data columns: {missing_cols}")
+                    hazards_df = pd.DataFrame()
             
-            # For demo purposes, return mock route
-            return self._mock_route(start, end, hazards_df)
+            routes = self.find_alternative_routes(start, end, hazards_df, preferences)
+            if not routes:
+                return self._fallback_route(start, end)
+            selected_route = routes[0]
+            selected_route['alternatives'] = routes[1:]
+            return selected_route
                 
         except Exception as e:
             st.error(f"Route planning error: {e}")
             return self._fallback_route(start, end)
     
-    def _mock_route(self, start, end, hazards_df):
-        """Mock route calculation for demo with validation"""
-        # Validate start and end locations exist in network
-        if start not in self.road_network.nodes:
-            st.warning(f"Start location '{start}' not in network, using nearest known location")
-            start = self._find_nearest_location(start)
-        
-        if end not in self.road_network.nodes:
-            st.warning(f"End location '{end}' not in network, using nearest known location") 
-            end = self._find_nearest_location(end)
-        
-        routes = [
-            {
-                'route': [start, 'Rajiv Chowk', end],
-                'distance_km': 8.5,
-                'safety_score': 85,
-                'hazards_avoided': ['Major pothole cluster', 'Flooding area'],
-                'estimated_time': '25 minutes',
-                'details': 'Safest route avoiding high-risk zones',
-                'hazard_exposure': 'Low'
-            },
-            {
-                'route': [start, end],
-                'distance_km': 6.2, 
-                'safety_score': 65,
-                'hazards_avoided': ['Minor traffic congestion'],
-                'estimated_time': '18 minutes',
-                'details': 'Fastest route with moderate safety',
-                'hazard_exposure': 'Medium'
-            },
-            {
-                'route': [start, 'Kashmere Gate', end],
-                'distance_km': 10.1,
-                'safety_score': 92,
-                'hazards_avoided': ['All major hazards', 'Construction zones'],
-                'estimated_time': '32 minutes',
-                'details': 'Maximum safety with longer travel time',
-                'hazard_exposure': 'Very Low'
-            }
+    def find_alternative_routes(self, start, end, hazards_df, preferences=None, k=3):
+        """Find up to k routes ranked by combined distance and hazard exposure.
+        
+        One shortest-path tree is grown from each endpoint and candidate routes
+        are formed by joining the two trees at every shared via node, so k
+        alternatives cost two searches instead of k independent ones. The
+        distance-fastest path is always a candidate, so at least one route is
+        returned. Candidates longer than the fastest route plus `max_detour`
+        percent, or overlapping an already chosen route too heavily, are
+        discarded.
+        """
+        preferences = preferences or {}
+        start = self._resolve_location(start)
+        end = self._resolve_location(end)
+        
+        hazards = self._prepare_hazards(hazards_df, preferences)
+        edge_hazards = self._map_hazards_to_edges(hazards)
+        edge_exposure = {
+            edge: float(hazards['exposure_weight'].values[idx].sum())
+            for edge, (idx, _) in edge_hazards.items()
+        }
+        risk_weight = self.risk_weight_km if preferences.get('avoid_high_risk', True) else self.risk_weight_km / 4
+        
+        def edge_cost(u, v, data):
+            return data['weight'] + risk_weight * edge_exposure.get(self._edge_key(u, v), 0.0)
+        
+        fastest_km, fastest_path = nx.single_source_dijkstra(
+            self.road_network, start, end, weight='weight'
+        )
+        fastest_hazards = self._route_hazard_indices(fastest_path, edge_hazards)
+        max_km = fastest_km * (1 + preferences.get('max_detour', 25) / 100)
+        
+        # Shared search state: both trees are reused for every candidate
+        cost_from_start, paths_from_start = nx.single_source_dijkstra(
+            self.road_network, start, weight=edge_cost
+        )
+        cost_to_end, paths_to_end = nx.single_source_dijkstra(
+            self.road_network, end, weight=edge_cost
+        )
+        
+        # The fastest path always fits the detour budget; the hazard-optimal
+        # path competes like any other candidate
+        candidates = [
+            (self._path_cost(fastest_path, edge_cost), fastest_path),
+            (cost_from_start[end], paths_from_start[end])
         ]
+        for via, cost in cost_from_start.items():
+            if via not in cost_to_end:
+                continue
+            path = paths_from_start[via] + paths_to_end[via][-2::-1]
+            if len(set(path)) == len(path):
+                candidates.append((cost + cost_to_end[via], path))
+        candidates.sort(key=lambda candidate: candidate[0])
         
-        # Select best route based on hazards and preferences
-        high_risk_hazards = len(hazards_df[hazards_df['severity'] >= 4]) if not hazards_df.empty else 0
+        routes = []
+        chosen_edges = []
+        seen = set()
+        for cost, path in candidates:
+            if tuple(path) in seen:
+                continue
+            seen.add(tuple(path))
+            
+            distance_km = self._path_length(path)
+            if distance_km > max_km + 1e-9:
+                continue
+            
+            edges = set(self._path_edges(path))
+            if any(
+                self._edges_length(edges & other) > self.max_route_overlap * distance_km
+                for other in chosen_edges
+            ):
+                continue
+            chosen_edges.append(edges)
+            
+            routes.append(self._build_route_result(
+                path, distance_km, hazards, edge_hazards, fastest_hazards,
+                is_fastest=path == fastest_path, rank=len(routes),
+                max_detour=preferences.get('max_detour', 25)
+            ))
+            if len(routes) == k:
+                break
         
-        if high_risk_hazards > 3:
-            selected_route = routes[2]  # Safest route
-        elif high_risk_hazards > 0:
-            selected_route = routes[0]  # Balanced route
+        return routes
+    
+    def _resolve_location(self, location):
+        """Map a free-text location onto a node of the road network"""
+        if location in self.road_network.nodes:
+            return location
+        
+        nearest = self._find_nearest_location(location)
+        if nearest.lower() not in location.lower():
+            st.warning(f"Location '{location}' not in network, using nearest known location '{nearest}'")
+        return nearest
+    
+    def _prepare_hazards(self, hazards_df, preferences):
+        """Select usable hazard rows and weight them by severity and confidence"""
+        if hazards_df is None or hazards_df.empty:
+            return pd.DataFrame(columns=['hazard_type', 'severity', 'lat', 'lon', 'exposure_weight'])
+        
+        hazards = hazards_df.dropna(subset=['lat', 'lon']).reset_index(drop=True)
+        severity = hazards['severity'].astype(float).values
+        confidence = hazards['confidence'].astype(float).fillna(50).values
+        
+        weights = severity * confidence / 100
+        if preferences.get('avoid_high_risk', True):
+            weights = np.where(severity >= 4, weights * 2, weights)
+        if not preferences.get('consider_weather', True) and 'source' in hazards.columns:
+            is_weather = hazards['source'].astype(str).str.contains('Weather').values
+            weights = np.where(is_weather, 0.0, weights)
+        
+        return hazards.assign(exposure_weight=weights)
+    
+    def _map_hazards_to_edges(self, hazards):
+        """Map each road segment to the hazards inside its corridor.
+        
+        All segments are matched in one vectorized KD-tree query. Returns
+        {edge: (hazard_indices, distances_m)}.
+        """
+        if hazards.empty:
+            return {}
+        
+        index = HazardIndex(hazards['lat'].astype(float).values, hazards['lon'].astype(float).values,
+                            ref_lat=self.default_center[0])
+        positions = nx.get_node_attributes(self.road_network, 'pos')
+        edges = list(self.road_network.edges)
+        a = np.array([positions[u] for u, _ in edges])
+        b = np.array([positions[v] for _, v in edges])
+        
+        segment_idx, hazard_idx, distances = index.segments_query(
+            a[:, 0], a[:, 1], b[:, 0], b[:, 1], self.corridor_radius_m
+        )
+        
+        # Pairs come back sorted by segment, so each edge owns one contiguous slice
+        bounds = np.searchsorted(segment_idx, np.arange(len(edges) + 1))
+        return {
+            self._edge_key(*edges[e]): (hazard_idx[lo:hi], distances[lo:hi])
+            for e, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:]))
+            if hi > lo
+        }
+    
+    @staticmethod
+    def _edge_key(u, v):
+        return (u, v) if u <= v else (v, u)
+    
+    def _path_edges(self, path):
+        return [self._edge_key(u, v) for u, v in zip(path[:-1], path[1:])]
+    
+    def _edges_length(self, edges):
+        return sum(self.road_network.edges[u, v]['weight'] for u, v in edges)
+    
+    def _path_cost(self, path, edge_cost):
+        return sum(edge_cost(u, v, self.road_network.edges[u, v]) for u, v in zip(path[:-1], path[1:]))
+    
+    def _path_length(self, path):
+        return sum(self.road_network.edges[u, v]['weight'] for u, v in zip(path[:-1], path[1:]))
+    
+    def _route_hazard_indices(self, path, edge_hazards):
+        """Unique hazard rows exposed along a path"""
+        indices = [edge_hazards[edge][0] for edge in self._path_edges(path) if edge in edge_hazards]
+        if not indices:
+            return np.array([], dtype=int)
+        return np.unique(np.concatenate(indices))
+    
+    def _build_route_result(self, path, distance_km, hazards, edge_hazards, fastest_hazards,
+                            is_fastest, rank, max_detour):
+        """Assemble the route dict shown in the UI, with its own exposure breakdown"""
+        hazard_analysis = self._analyze_route_hazards(path, hazards, edge_hazards)
+        safety_score = int(round(100 * np.exp(-hazard_analysis['exposure'] / self.exposure_scale)))
+        
+        if safety_score >= 90:
+            hazard_exposure = 'Very Low'
+        elif safety_score >= 75:
+            hazard_exposure = 'Low'
+        elif safety_score >= 50:
+            hazard_exposure = 'Medium'
+        else:
+            hazard_exposure = 'High'
+        
+        # Rank 0 has the lowest combined distance and hazard cost, not necessarily no hazards
+        if rank == 0 and is_fastest:
+            details = f'Fastest route; no better distance/hazard trade-off within {max_detour}% detour'
+        elif rank == 0:
+            details = f'Best distance/hazard trade-off within {max_detour}% detour'
+        elif is_fastest:
+            details = 'Fastest route with higher hazard exposure'
         else:
-            selected_route = routes[1]  # Fastest route
+            details = f'Alternative route via {path[1]}' if len(path) > 2 else 'Direct alternative route'
         
-        # Add hazard analysis
-        selected_route['hazard_analysis'] = self._analyze_route_hazards(selected_route['route'], hazards_df)
+        # Hazards the fastest route would pass that this one does not
+        avoided_idx = np.setdiff1d(fastest_hazards, self._route_hazard_indices(path, edge_hazards))
+        avoided = hazards.iloc[avoided_idx].sort_values('severity', ascending=False)
+        hazards_avoided = [
+            f"{row.hazard_type} (severity {int(row.severity)})"
+            for row in avoided.itertuples()
+        ]
         
-        return selected_route
+        return {
+            'route': path,
+            'distance_km': distance_km,
+            'safety_score': safety_score,
+            'hazards_avoided': hazards_avoided,
+            'estimated_time': f"{int(round(distance_km / self.average_speed_kmh * 60))} minutes",
+            'details': details,
+            'hazard_exposure': hazard_exposure,
+            'hazard_analysis': hazard_analysis
+        }
     
     def _find_nearest_location(self, location):
-        """Find nearest known location in the network"""
-        known_locations = list(self.road_network.nodes.keys())
-        
-        # Simple matching - in real implementation, use geocoding
-        location_lower = location.lower()
-        for known_loc in known_locations:
-            if location_lower in known_loc.lower() or known_loc.lower() in location_lower:
-                return known_loc
-        
-        # Default fallback
-        return 'Connaught Place'
-    
-    def _analyze_route_hazards(self, route, hazards_df):
-        """Analyze hazards along the route"""
-        if hazards_df.empty:
-            return {"total_hazards": 0, "high_risk_hazards": 0, "risk_level": "Low"}
-        
-        # Count hazards near route points (simplified)
-        total_hazards = len(hazards_df)
-        high_risk_hazards = len(hazards_df[hazards_df['severity'] >= 4])
+        """Resolve free text with the offline gazetteer and snap it to the nearest network node"""
+        place = get_gazetteer().resolve(location)
+        if place is None:
+            # Default fallback
+            return 'Connaught Place'
+        
+        return self.node_index.nearest(place['lat'], place['lon'])[0]['name']
+    
+    def _analyze_route_hazards(self, route, hazards, edge_hazards):
+        """Analyze hazards inside the route corridor, broken down per segment"""
+        empty = (np.array([], dtype=np.intp), np.array([], dtype=np.float64))
+        segments = []
+        hit_idx, hit_dist, hit_segment = [], [], []
+        for n, (u, v) in enumerate(zip(route[:-1], route[1:])):
+            idx, distances = edge_hazards.get(self._edge_key(u, v), empty)
+            segments.append({
+                'from': u,
+                'to': v,
+                'distance_km': self.road_network.edges[u, v]['weight'],
+                'hazards': int(idx.size),
+                'high_risk_hazards': int((hazards['severity'].values[idx] >= 4).sum()),
+                'exposure': round(float(hazards['exposure_weight'].values[idx].sum()), 2)
+            })
+            hit_idx.append(idx)
+            hit_dist.append(distances)
+            hit_segment.append(np.full(idx.size, n))
+        
+        if not segments or not np.concatenate(hit_idx).size:
+            return {
+                "total_hazards": 0, "high_risk_hazards": 0, "risk_level": "Low",
+                "exposure": 0.0, "by_type": {}, "by_severity": {},
+                "segments": segments, "hazards_encountered": []
+            }
+        
+        # Keep each hazard once, at the segment it comes closest to
+        hit_idx, hit_dist, hit_segment = map(np.concatenate, (hit_idx, hit_dist, hit_segment))
+        order = np.lexsort((hit_dist, hit_idx))
+        first = np.ones(order.size, dtype=bool)
+        first[1:] = np.diff(hit_idx[order]) != 0
+        order = order[first]
+        
+        route_hazards = hazards.iloc[hit_idx[order]].assign(
+            distance_m=np.round(hit_dist[order], 1),
+            segment=hit_segment[order]
+        )
+        
+        total_hazards = len(route_hazards)
+        high_risk_hazards = int((route_hazards['severity'] >= 4).sum())
 
         risk_level = "Low"
         if high_risk_hazards > 5:
@@ -153,10 +362,19 @@ class EnhancedRoutePlanner:
         elif high_risk_hazards > 2:
             risk_level = "Medium"
         
+        encountered_cols = [col for col in ['id', 'hazard_type', 'severity', 'lat', 'lon', 'distance_m', 'segment']
+                            if col in route_hazards.columns]
+        encountered = route_hazards.sort_values(['severity', 'distance_m'], ascending=[False, True])
+        
         return {
             "total_hazards": total_hazards,
             "high_risk_hazards": high_risk_hazards,
-            "risk_level": risk_level
+            "risk_level": risk_level,
+            "exposure": round(float(route_hazards['exposure_weight'].sum()), 2),
+            "by_type": route_hazards['hazard_type'].astype(str).value_counts().to_dict(),
+            "by_severity": route_hazards['severity'].astype(int).value_counts().sort_index().to_dict(),
+            "segments": segments,
+            "hazards_encountered": encountered[encountered_cols].to_dict('records')
         }
     
     def _fallback_route(self, start, end):
@@ -107,7 +107,7 @@ class EnhancedSafetyGPT:
             # It's a DataFrame
             summary = f"Total hazards: {len(hazard_data)}, "
             if not hazard_data.empty:
-                summary += f"Top types: {hazard_data['hazard_type'].value_counts().head(3).to_dict()}"
+                summary += f"Top types: {hazard_data['hazard_type'].astype(str).value_counts().head(3).to_dict()}"
             return summary
         return str(hazard_data)
     
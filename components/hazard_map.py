@@ -1,82 +1,453 @@
-﻿import folium
+﻿import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+import folium
+import numpy as np
 import pandas as pd
-from folium.plugins import MarkerCluster, HeatMap
+from branca.element import Element, MacroElement
+from folium.elements import JSCSSMixin
+from folium.map import Layer
+from folium.plugins import MarkerCluster, HeatMap, VectorGridProtobuf
+from folium.template import Template
+from folium.utilities import remove_empty
 import streamlit as st
 
+# Severity -> marker colour and hazard type -> glyphicon, shared by
+# get_hazard_icon and the client-side marker callback
+SEVERITY_COLORS = {
+    1: 'green',   # Low
+    2: 'orange',  # Medium
+    3: 'red',     # High
+    4: 'darkred', # Critical
+    5: 'black'    # Extreme
+}
+
+HAZARD_ICONS = {
+    'Potholes': 'info-sign',
+    'Flooding': 'tint',
+    'Accidents': 'flash',
+    'Road Closures': 'remove-sign',
+    'Construction': 'wrench',
+    'Debris': 'tree-deciduous',
+    'Landslides': 'certificate',
+    'Traffic': 'road'
+}
+
+
+class HazardColumns(MacroElement):
+    """Hazard column arrays as one JS object, shared by the layers drawn from it.
+
+    Takes a hazard frame (see hazard_columns) or ready-made columns.
+    branca re-parses every rendered script as a Jinja template; for
+    megabytes of data that dominates render time (and would expand any
+    '{{' in user-supplied text), so the data is emitted verbatim.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = {{ this.data_json }};
+        {% endmacro %}
+    """)
+
+    def __init__(self, data):
+        super().__init__()
+        self._name = 'HazardColumns'
+        columns = hazard_columns(data) if isinstance(data, pd.DataFrame) else data
+        self.data_json = _script_json(columns)
+
+    def render(self, **kwargs):
+        script = f"var {self.get_name()} = {self.data_json};"
+        self.get_root().script.add_child(_Verbatim(script), name=self.get_name())
+
+
+class _Verbatim(Element):
+    def __init__(self, text):
+        super().__init__()
+        self.text = text
+
+    def render(self, **kwargs):
+        return self.text
+
+
+class HazardMarkerLayer(MarkerCluster):
+    """Clustered hazard markers built in the browser from HazardColumns.
+
+    Replaces a server-side Marker, Icon and HTML popup per hazard: the
+    callback creates the markers, styles them from severity and type, and
+    builds each popup only when it is opened.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(){
+                var cols = {{ this.columns.get_name() }};
+                var colors = {{ this.colors_json }};
+                var icons = {{ this.icons_json }};
+                var escape = function (s) {
+                    return String(s).replace(/[&<>"']/g, function (c) {
+                        return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+                    });
+                };
+                var popup = function (i) {
+                    return '<div style="width: 200px;">'
+                        + '<h4> ' + escape(cols.types[cols.type[i]]) + '</h4>'
+                        + '<p><strong>Severity:</strong> ' + cols.severity[i] + '/5</p>'
+                        + '<p><strong>Confidence:</strong> ' + cols.confidence[i] + '%</p>'
+                        + '<p><strong>Location:</strong> ' + escape(cols.locations[cols.location[i]]) + '</p>'
+                        + '<p><strong>Reported:</strong> ' + escape(cols.timestamps[cols.timestamp[i]]) + '</p>'
+                        + '<p><strong>Description:</strong> ' + escape(cols.descriptions[cols.description[i]]) + '</p>'
+                        + '</div>';
+                };
+
+                var cluster = L.markerClusterGroup({{ this.options|tojavascript }});
+                var markers = new Array(cols.lat.length);
+                for (var i = 0; i < cols.lat.length; i++) {
+                    var type = cols.types[cols.type[i]];
+                    var marker = L.marker([cols.lat[i], cols.lon[i]], {
+                        icon: L.AwesomeMarkers.icon({
+                            icon: icons[type] || 'info-sign',
+                            markerColor: colors[cols.severity[i]] || 'blue',
+                            prefix: 'glyphicon'
+                        })
+                    });
+                    marker.bindPopup(popup.bind(null, i), {maxWidth: 300});
+                    marker.bindTooltip(escape(type) + ' (Severity: ' + cols.severity[i] + ')');
+                    markers[i] = marker;
+                }
+                cluster.addLayers(markers);
+                cluster.addTo({{ this._parent.get_name() }});
+                return cluster;
+            })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, columns, name='Hazards', **kwargs):
+        super().__init__(name=name, chunkedLoading=True, **kwargs)
+        self._name = 'HazardMarkerLayer'
+        self.columns = columns
+        self.colors_json = _script_json(SEVERITY_COLORS)
+        self.icons_json = _script_json(HAZARD_ICONS)
+
+
+class HazardHeatLayer(JSCSSMixin, Layer):
+    """Heatmap over HazardColumns, like folium's HeatMap without the per-point list.
+
+    Draws either raw hazards weighted by severity or, with
+    weight_field='weight', pre-aggregated density cells.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(){
+                var cols = {{ this.columns.get_name() }};
+                var points = new Array(cols.lat.length);
+                for (var i = 0; i < cols.lat.length; i++) {
+                    points[i] = [cols.lat[i], cols.lon[i], cols[{{ this.weight_field|tojson }}][i]];
+                }
+                return L.heatLayer(points, {{ this.options|tojavascript }});
+            })();
+        {% endmacro %}
+    """)
+
+    default_js = HeatMap.default_js
+
+    def __init__(self, columns, name=None, weight_field='severity', min_opacity=0.5, max_zoom=18,
+                 radius=25, blur=15, **kwargs):
+        super().__init__(name=name, overlay=True, control=True, show=True)
+        self._name = 'HeatMap'
+        self.columns = columns
+        self.weight_field = weight_field
+        self.options = remove_empty(min_opacity=min_opacity, max_zoom=max_zoom, radius=radius, blur=blur, **kwargs)
+
+
+class HazardGridLayer(Layer):
+    """Grid-cell summaries from HazardLOD: one circle per cell, sized by
+    hazard count and coloured by the worst severity in it"""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(){
+                var cols = {{ this.columns.get_name() }};
+                var colors = {{ this.colors_json }};
+                var group = L.featureGroup();
+                for (var i = 0; i < cols.lat.length; i++) {
+                    var count = cols.count[i];
+                    var color = colors[cols.max_severity[i]] || 'blue';
+                    L.circleMarker([cols.lat[i], cols.lon[i]], {
+                        radius: Math.min(6 + 3 * Math.log2(count), 30),
+                        color: color,
+                        fillColor: color,
+                        fillOpacity: 0.5,
+                        weight: 1
+                    }).bindTooltip(count + ' hazards, mostly ' + cols.types[cols.type[i]]
+                        + ' (max severity ' + cols.max_severity[i] + ')').addTo(group);
+                }
+                return group;
+            })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, columns, name='Hazard Summary'):
+        super().__init__(name=name, overlay=True, control=True, show=True)
+        self._name = 'HazardGridLayer'
+        self.columns = columns
+        self.colors_json = _script_json(SEVERITY_COLORS)
+
+
+class HazardVectorLayer(JSCSSMixin, Layer):
+    """Hazards streamed as vector tiles from tile_server.py (Leaflet.VectorGrid).
+
+    The 'clusters' layer (zoomed out) is drawn like HazardGridLayer and the
+    'hazards' layer (street zoom) as circles coloured by severity; popups
+    are built from the clicked feature's properties.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(){
+                var colors = {{ this.colors_json }};
+                var escape = function (s) {
+                    return String(s).replace(/[&<>"']/g, function (c) {
+                        return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+                    });
+                };
+                var circle = function (color, radius, opacity) {
+                    return {radius: radius, color: color, fillColor: color, fill: true, fillOpacity: opacity, weight: 1};
+                };
+                var layer = L.vectorGrid.protobuf({{ this.url|tojson }}, {
+                    interactive: true,
+                    maxNativeZoom: 18,
+                    vectorTileLayerStyles: {
+                        clusters: function (p) {
+                            return circle(colors[p.max_severity] || 'blue', Math.min(6 + 3 * Math.log2(p.count), 30), 0.5);
+                        },
+                        hazards: function (p) {
+                            return circle(colors[p.severity] || 'blue', 4 + p.severity, 0.8);
+                        }
+                    }
+                });
+                layer.on('click', function (e) {
+                    var p = e.layer.properties;
+                    var html = p.count !== undefined
+                        ? '<div style="width: 200px;">' + p.count + ' hazards, mostly ' + escape(p.hazard_type)
+                            + '<br>Max severity: ' + p.max_severity + '/5'
+                            + '<br>Mean confidence: ' + p.mean_confidence + '%</div>'
+                        : '<div style="width: 200px;">'
+                            + '<h4> ' + escape(p.hazard_type) + '</h4>'
+                            + '<p><strong>Severity:</strong> ' + p.severity + '/5</p>'
+                            + '<p><strong>Confidence:</strong> ' + p.confidence + '%</p>'
+                            + '<p><strong>Location:</strong> ' + escape(p.location) + '</p>'
+                            + '<p><strong>Reported:</strong> ' + escape(p.timestamp) + '</p>'
+                            + '<p><strong>Description:</strong> ' + escape(p.description) + '</p>'
+                            + '</div>';
+                    L.popup({maxWidth: 300}).setLatLng(e.latlng).setContent(html).openOn({{ this._parent.get_name() }});
+                });
+                return layer;
+            })();
+        {% endmacro %}
+    """)
+
+    default_js = VectorGridProtobuf.default_js
+
+    def __init__(self, url, name='Hazards'):
+        super().__init__(name=name, overlay=True, control=True, show=True)
+        self._name = 'HazardVectorLayer'
+        self.url = url
+        self.colors_json = _script_json(SEVERITY_COLORS)
+
+
+def density_columns(density_df):
+    """Column arrays for HazardHeatLayer(weight_field='weight') from DensityGrids.cells"""
+    return {
+        'lat': np.round(density_df['lat'].to_numpy(dtype=np.float64), 6).tolist(),
+        'lon': np.round(density_df['lon'].to_numpy(dtype=np.float64), 6).tolist(),
+        'weight': np.round(density_df['weight'].to_numpy(dtype=np.float64), 2).tolist()
+    }
+
+
+def grid_columns(grid_df):
+    """Column arrays for HazardGridLayer from a HazardLOD grid frame"""
+    codes, types = pd.factorize(grid_df['hazard_type'].astype(str))
+    return {
+        'lat': np.round(grid_df['lat'].to_numpy(dtype=np.float64), 6).tolist(),
+        'lon': np.round(grid_df['lon'].to_numpy(dtype=np.float64), 6).tolist(),
+        'count': grid_df['count'].to_numpy(dtype=np.int64).tolist(),
+        'max_severity': grid_df['max_severity'].to_numpy(dtype=np.int64).tolist(),
+        'type': codes.tolist(),
+        'types': types.tolist()
+    }
+
+
+def hazard_columns(hazards_df):
+    """Column arrays for HazardColumns; strings are sent once each and referenced by code"""
+    def encode(field):
+        if field not in hazards_df:
+            return [0] * len(hazards_df), ['']
+        values = hazards_df[field]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.floor('min')
+        # Factorize first, so only the distinct values are formatted
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Series(uniques)
+        if pd.api.types.is_datetime64_any_dtype(uniques):
+            labels = uniques.dt.strftime('%Y-%m-%d %H:%M').tolist()
+        else:
+            labels = uniques.astype(str).tolist()
+        # Missing values get code -1; point them at an empty label
+        return np.where(codes < 0, len(labels), codes).tolist(), labels + ['']
+
+    columns = {
+        'lat': np.round(hazards_df['lat'].to_numpy(dtype=np.float64), 6).tolist(),
+        'lon': np.round(hazards_df['lon'].to_numpy(dtype=np.float64), 6).tolist(),
+        'severity': hazards_df['severity'].to_numpy(dtype=np.int64).tolist(),
+        'confidence': np.round(hazards_df['confidence'].to_numpy(dtype=np.float64), 1).tolist()
+    }
+    columns['type'], columns['types'] = encode('hazard_type')
+    columns['location'], columns['locations'] = encode('location')
+    columns['description'], columns['descriptions'] = encode('description')
+    columns['timestamp'], columns['timestamps'] = encode('timestamp')
+    return columns
+
+
+def _script_json(value):
+    # Safe inside a <script> block: no "</script>" or HTML entities can break out
+    return (json.dumps(value, separators=(',', ':'))
+            .replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026'))
+
+
+class RenderedMapCache:
+    """LRU of built maps keyed by everything that determines them.
+
+    Entries are kept pristine and handed out as deep copies, because
+    st_folium mutates the map it renders (element ids, add-to-map
+    children). Copying takes about a millisecond against a build of
+    tens to hundreds. A None key means the inputs cannot be identified
+    and the map is simply built.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (map, extra, build_seconds)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'build_seconds': 0.0, 'saved_seconds': 0.0}
+
+    def get_or_build(self, key, build):
+        """(map, extra) for key; `build()` returns (map, extra) on a miss"""
+        if key is not None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    self.stats['saved_seconds'] += entry[2]
+                    return copy.deepcopy(entry[0]), entry[1]
+
+        started = time.perf_counter()
+        built, extra = build()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.stats['misses'] += 1
+            self.stats['build_seconds'] += elapsed
+            if key is None:
+                return built, extra
+            self._entries[key] = (built, extra, elapsed)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return copy.deepcopy(built), extra
+
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+
+_rendered_map_cache = None
+_rendered_map_cache_lock = threading.Lock()
+
+
+def get_rendered_map_cache():
+    """Process-wide rendered map cache, shared by every session"""
+    global _rendered_map_cache
+    with _rendered_map_cache_lock:
+        if _rendered_map_cache is None:
+            _rendered_map_cache = RenderedMapCache()
+        return _rendered_map_cache
+
+
 class HazardMap:
     def __init__(self):
         self.default_location = [28.6139, 77.2090]  # Delhi coordinates
         self.zoom_level = 10
-    
+
     def get_hazard_icon(self, hazard_type, severity):
         """Get appropriate icon and color for hazard type"""
-        color_map = {
-            1: 'green',   # Low
-            2: 'orange',  # Medium
-            3: 'red',     # High
-            4: 'darkred', # Critical
-            5: 'black'    # Extreme
-        }
-        
-        icon_map = {
-            'Potholes': 'info-sign',
-            'Flooding': 'tint',
-            'Accidents': 'flash',
-            'Road Closures': 'remove-sign',
-            'Construction': 'wrench',
-            'Debris': 'tree-deciduous',
-            'Landslides': 'certificate',
-            'Traffic': 'road'
-        }
-        
-        return icon_map.get(hazard_type, 'info-sign'), color_map.get(severity, 'blue')
-    
-    def create_map(self, hazards_df):
-        """Create interactive Folium map with hazards"""
+        return HAZARD_ICONS.get(hazard_type, 'info-sign'), SEVERITY_COLORS.get(severity, 'blue')
+
+    def create_map(self, hazards_df, location=None, zoom=None, density=None):
+        """Create interactive Folium map with hazards.
+
+        `density` (DensityGrids.cells) replaces the per-hazard heatmap points
+        with a bounded number of pre-aggregated weighted cells.
+        """
         # Create base map
         m = folium.Map(
-            location=self.default_location,
-            zoom_start=self.zoom_level,
+            location=location or self.default_location,
+            zoom_start=zoom or self.zoom_level,
             tiles='OpenStreetMap'
         )
-        
-        # Create marker cluster
-        marker_cluster = MarkerCluster().add_to(m)
-        
-        # Add hazards to map
-        for _, hazard in hazards_df.iterrows():
-            icon_type, color = self.get_hazard_icon(hazard['hazard_type'], hazard['severity'])
-            
-            # Create popup content
-            popup_content = f"""
-            <div style="width: 200px;">
-                <h4> {hazard['hazard_type']}</h4>
-                <p><strong>Severity:</strong> {hazard['severity']}/5</p>
-                <p><strong>Confidence:</strong> {hazard['confidence']}%</p>
-                <p><strong>Location:</strong> {hazard['location']}</p>
-                <p><strong>Reported:</strong> {hazard['timestamp']}</p>
-                <p><strong>Description:</strong> {hazard['description']}</p>
-            </div>
-            """
-            
-            # Add marker to cluster
-            folium.Marker(
-                location=[hazard['lat'], hazard['lon']],
-                popup=folium.Popup(popup_content, max_width=300),
-                tooltip=f"{hazard['hazard_type']} (Severity: {hazard['severity']})",
-                icon=folium.Icon(
-                    color=color,
-                    icon=icon_type,
-                    prefix='glyphicon'
-                )
-            ).add_to(marker_cluster)
-        
-        # Add heatmap layer for hazard density
-        heat_data = [[row['lat'], row['lon'], row['severity']] for _, row in hazards_df.iterrows()]
-        if heat_data:
-            HeatMap(heat_data, name="Hazard Density").add_to(m)
-        
+
+        located = hazards_df['lat'].notna() & hazards_df['lon'].notna()
+        hazards_df = hazards_df[located]
+        if not hazards_df.empty:
+            # One set of column arrays; markers, styling and popups are built client-side
+            columns = HazardColumns(hazards_df).add_to(m)
+            HazardMarkerLayer(columns).add_to(m)
+
+            # Add heatmap layer for hazard density
+            if density is None:
+                HazardHeatLayer(columns, name="Hazard Density").add_to(m)
+        if density is not None and not density.empty:
+            cells = HazardColumns(density_columns(density)).add_to(m)
+            HazardHeatLayer(cells, name="Hazard Density", weight_field='weight').add_to(m)
+
         # Add layer control
         folium.LayerControl().add_to(m)
-        
+
+        return m
+
+    def create_vector_map(self, tile_server_url, location=None, zoom=None, hazard_filter=None):
+        """Map whose hazards are loaded tile by tile from tile_server.py; it embeds no hazard data.
+
+        A HazardFilter is passed to the server, which filters before indexing.
+        """
+        m = folium.Map(
+            location=location or self.default_location,
+            zoom_start=zoom or self.zoom_level,
+            tiles='OpenStreetMap'
+        )
+        url = tile_server_url.rstrip('/') + '/tiles/{z}/{x}/{y}.pbf'
+        if hazard_filter is not None and not hazard_filter.is_empty:
+            url += '?' + hazard_filter.to_query()
+        HazardVectorLayer(url).add_to(m)
+        folium.LayerControl().add_to(m)
+        return m
+
+    def create_lod_map(self, view, location=None, zoom=None, density=None):
+        """Map for a HazardLOD view: individual hazards at street zoom, cell summaries below it"""
+        if view.level == 'points':
+            return self.create_map(view.frame, location=location, zoom=zoom, density=density)
+
+        m = folium.Map(
+            location=location or self.default_location,
+            zoom_start=zoom or self.zoom_level,
+            tiles='OpenStreetMap'
+        )
+        if not view.frame.empty:
+            columns = HazardColumns(grid_columns(view.frame)).add_to(m)
+            HazardGridLayer(columns).add_to(m)
+        if density is not None and not density.empty:
+            cells = HazardColumns(density_columns(density)).add_to(m)
+            HazardHeatLayer(cells, name="Hazard Density", weight_field='weight').add_to(m)
+        folium.LayerControl().add_to(m)
         return m
@@ -1,7 +1,12 @@
-﻿import requests
+﻿import functools
+import requests
 import json
 import streamlit as st
 from utils.config import Config
+from utils.gazetteer import get_gazetteer
+from utils.geocode_cache import get_geocode_cache
+from utils.http_client import get_http_client
+from utils.incident_parser import parse_incidents
 import pandas as pd
 from geopy.geocoders import Nominatim
 import time
@@ -10,13 +15,24 @@ class RealMapboxIntegration:
     def __init__(self):
         self.access_token = Config.MAPBOX_ACCESS_TOKEN
         self.base_url = Config.MAPBOX_BASE_URL
+        self.http = get_http_client()
+        self.geocode_cache = get_geocode_cache()
         self.geolocator = Nominatim(user_agent="safetroute_ai")
     
     def geocode_address(self, address):
         """Convert address to coordinates using Mapbox Geocoding"""
+        # Known places resolve offline without a network round trip
+        place = get_gazetteer().resolve(address, min_score=0.9)
+        if place is not None:
+            return {'lon': place['lon'], 'lat': place['lat'], 'place_name': place['name']}
+        
         if Config.DEBUG and not self.access_token.startswith('pk.'):
             return self._mock_geocode(address)
 
+        cached, result = self.geocode_cache.get(address)
+        if cached:
+            return result if result is not None else self._mock_geocode(address)
+
         url = f"{self.base_url}/geocoding/v5/mapbox.places/{address}.json"
         params = {
             'access_token': self.access_token,
@@ -24,12 +40,15 @@ class RealMapboxIntegration:
         }
 
         try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data['features']:
-                    coords = data['features'][0]['geometry']['coordinates']
-                    return {'lon': coords[0], 'lat': coords[1], 'place_name': data['features'][0]['place_name']}
+            data = self.http.get_json(url, params=params, provider='mapbox')
+            if data is not None and data['features']:
+                coords = data['features'][0]['geometry']['coordinates']
+                result = {'lon': coords[0], 'lat': coords[1], 'place_name': data['features'][0]['place_name']}
+                self.geocode_cache.put(address, result)
+                return result
+            if data is not None:
+                # The provider has no match; don't ask again until the negative TTL runs out
+                self.geocode_cache.put(address, None)
         except Exception as e:
             st.error(f"Geocoding error: {e}")
 
@@ -45,14 +64,33 @@ class RealMapboxIntegration:
         }
 
         try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                return response.json()
+            # Polled every refresh: unchanged incident lists come back as 304s
+            data = self.http.get_json(url, params=params, conditional=True, provider='mapbox')
+            if data is not None:
+                return data
         except Exception as e:
             st.error(f"Traffic API error: {e}")
 
         return self._mock_traffic_incidents(bbox)
     
+    def get_traffic_hazards(self, bbox):
+        """Traffic incidents in a bbox as a canonical hazard frame.
+        
+        Used by the ingestion workers, so failures are raised rather than
+        reported or replaced with mock incidents: the caller keeps the last
+        good rows and marks the source stale. The body is parsed as it
+        streams in, and an unchanged feed returns the frame parsed last time.
+        """
+        url = f"{self.base_url}/traffic/v5/incidents/{bbox}.json"
+        params = {
+            'access_token': self.access_token
+        }
+        frame = self.http.get_json(url, params=params, conditional=True, provider='mapbox',
+                                   parse=functools.partial(parse_incidents, source='Traffic API'))
+        if frame is None:
+            raise RuntimeError(f"Traffic API returned no incident feed for {bbox}")
+        return frame
+    
     def get_route_with_hazards(self, start_coords, end_coords, avoid_hazards=True):
         """Get route considering hazards"""
         if Config.DEBUG:
@@ -66,22 +104,20 @@ class RealMapboxIntegration:
         }
 
         try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                return response.json()
+            data = self.http.get_json(url, params=params, provider='mapbox')
+            if data is not None:
+                return data
         except Exception as e:
             st.error(f"Routing API error: {e}")
 
         return self._mock_route(start_coords, end_coords)
     
     def _mock_geocode(self, address):
-        """Mock geocoding for demo"""
-        mock_locations = {
-            'connaught place, delhi': {'lon': 77.2189, 'lat': 28.6315, 'place_name': 'Connaught Place, New Delhi'},
-            'india gate, delhi': {'lon': 77.2295, 'lat': 28.6129, 'place_name': 'India Gate, New Delhi'},
-            'rajpath, delhi': {'lon': 77.2290, 'lat': 28.6140, 'place_name': 'Rajpath, New Delhi'}
-        }
-        return mock_locations.get(address.lower(), {'lon': 77.2090, 'lat': 28.6139, 'place_name': address})
+        """Offline geocoding from the local gazetteer for demo and fallback"""
+        place = get_gazetteer().resolve(address)
+        if place is None:
+            return {'lon': 77.2090, 'lat': 28.6139, 'place_name': address}
+        return {'lon': place['lon'], 'lat': place['lat'], 'place_name': place['name']}
     
     def _mock_traffic_incidents(self, bbox):
         """Mock traffic incidents for demo"""
@@ -0,0 +1,153 @@
+import json
+import os
+import random
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from datetime import datetime
+import pandas as pd
+from utils.hazard_schema import to_hazard_frame, to_records
+
+# One delta from a source: a frame in the canonical hazard schema and the
+# highest watermark value it contained (None when it carried no new rows)
+HazardBatch = namedtuple('HazardBatch', ['frame', 'watermark'])
+
+
+class SourceAdapter(ABC):
+    """Base class for hazard sources.
+
+    Subclasses implement `fetch_records(bbox, since)` returning raw dicts
+    newer than the `since` watermark; `fetch` converts them to the canonical
+    columnar schema once, at the edge, so merging and storage never see
+    source-specific layouts.
+    """
+
+    name = None
+    source_label = 'Other'
+    timeout = 3.0
+    watermark_field = 'timestamp'
+
+    def fetch(self, bbox, since=None):
+        """Fetch the delta after `since` as a HazardBatch"""
+        records = self.fetch_records(bbox, since)
+        marks = [str(record[self.watermark_field]) for record in records if record.get(self.watermark_field)]
+        return HazardBatch(to_hazard_frame(records, default_source=self.source_label), max(marks) if marks else None)
+
+    @abstractmethod
+    def fetch_records(self, bbox, since=None):
+        """Raw record dicts newer than the `since` watermark"""
+
+
+class DatabaseSource(SourceAdapter):
+    """Hazards written to the hazards table since the last poll"""
+
+    name = 'database'
+    source_label = 'User Report'
+    timeout = 2.0
+    watermark_field = 'created_at'
+
+    def __init__(self, db, fallback=None):
+        self.db = db
+        # Called with no arguments on the first poll of an empty database
+        self.fallback = fallback
+
+    def fetch_records(self, bbox, since=None):
+        db_hazards = self.db.get_hazards_since(since, hours=24)
+        if not db_hazards.empty:
+            return db_hazards.to_dict('records')
+        if since is not None or self.fallback is None:
+            return []
+        return self.fallback()
+
+
+class TrafficIncidentSource(SourceAdapter):
+    """Traffic incidents (mock implementation)"""
+
+    name = 'traffic'
+    source_label = 'Traffic API'
+
+    def fetch_records(self, bbox, since=None):
+        incidents = []
+        for i in range(5):
+            incidents.append({
+                'id': f"TRAFFIC_{i}",
+                'hazard_type': random.choice(['Accidents', 'Traffic', 'Road Closures']),
+                'severity': random.randint(2, 4),
+                'confidence': 85,
+                'lat': 28.6139 + random.uniform(-0.05, 0.05),
+                'lon': 77.2090 + random.uniform(-0.05, 0.05),
+                'location': 'Road Incident',
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M'),
+                'description': 'Traffic incident reported',
+                'source': self.source_label,
+                'verified': True
+            })
+        return [incident for incident in incidents if since is None or incident['timestamp'] >= since]
+
+
+class MapboxIncidentSource(SourceAdapter):
+    """Live Mapbox traffic incidents, parsed column-wise from the GeoJSON feed"""
+
+    name = 'traffic'
+    source_label = 'Traffic API'
+
+    def __init__(self, mapbox):
+        self.mapbox = mapbox
+
+    def fetch_records(self, bbox, since=None):
+        return to_records(self.fetch(bbox, since).frame)
+
+    def fetch(self, bbox, since=None):
+        frame = self.mapbox.get_traffic_hazards(bbox)
+        if since is not None and not frame.empty:
+            frame = frame[frame['timestamp'] >= pd.Timestamp(since)].reset_index(drop=True)
+        watermark = frame['timestamp'].max().strftime('%Y-%m-%d %H:%M:%S') if not frame.empty else None
+        return HazardBatch(frame, watermark)
+
+
+class WeatherSource(SourceAdapter):
+    """Weather-related hazards (mock implementation)"""
+
+    name = 'weather'
+    source_label = 'Weather API'
+
+    def fetch_records(self, bbox, since=None):
+        hazards = [{
+            'id': 'WEATHER_001',
+            'hazard_type': 'Flooding',
+            'severity': 3,
+            'confidence': 75,
+            'lat': 28.6250,
+            'lon': 77.2150,
+            'location': 'Connaught Place Area',
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M'),
+            'description': 'Heavy rainfall causing waterlogging',
+            'source': self.source_label,
+            'verified': True
+        }]
+        return [hazard for hazard in hazards if since is None or hazard['timestamp'] >= since]
+
+
+class CommunityReportSource(SourceAdapter):
+    """Community reports created or re-verified since the last poll"""
+
+    name = 'community'
+    source_label = 'Community Report'
+    timeout = 5.0
+    watermark_field = 'updated_at'
+
+    def __init__(self, reports_file):
+        self.reports_file = reports_file
+
+    def fetch_records(self, bbox, since=None):
+        if not os.path.exists(self.reports_file):
+            return []
+        with open(self.reports_file, 'r') as f:
+            reports = json.load(f)
+
+        updated = []
+        for report in reports:
+            report = dict(report, source=self.source_label)
+            report['updated_at'] = report.get('verified_at') or report.get('timestamp')
+            if since is None or (report['updated_at'] and report['updated_at'] >= since):
+                updated.append(report)
+        return updated
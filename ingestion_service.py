@@ -0,0 +1,158 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from components.community_reporting import CommunityReporting
+from components.enhanced_data_ingestion import EnhancedDataIngestion
+from components.source_adapters import CommunityReportSource
+from utils.config import Config
+from utils.database import DatabaseManager
+from utils.hazard_schema import to_records
+
+
+class IngestionService:
+    """Background hazard ingestion, decoupled from the Streamlit UI.
+
+    Every cycle polls all source adapters concurrently for records past
+    their watermark (already in the canonical hazard schema), drops rows
+    without coordinates, duplicates and rows unchanged since the last
+    write, bulk-writes the rest in one transaction and bumps the published
+    'hazards' data version. Watermarks and written fingerprints advance only
+    once the write has succeeded, so a failed cycle is retried in full.
+    UIs running with INGESTION_MODE=service poll that version and only read
+    the store.
+    """
+
+    def __init__(self, bbox="77.2090,28.6139,77.2290,28.6339", max_workers=4):
+        self.bbox = bbox
+        self.db = DatabaseManager()
+        self.ingestion = EnhancedDataIngestion()
+        self.community = CommunityReporting()
+
+        self.adapters = dict(self.ingestion.feeds)
+        community = CommunityReportSource(self.community.reports_file)
+        self.adapters[community.name] = community
+        self.watermarks = {name: None for name in self.adapters}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest')
+
+        self._written = {}  # id -> fingerprint of the last version written
+        self.totals = {'cycles': 0, 'failures': 0, 'fetched': 0, 'written': 0, 'rejected': 0, 'seconds': 0.0}
+
+    def run_once(self):
+        """Run one ingestion cycle and return its statistics"""
+        started = time.perf_counter()
+        futures = {
+            name: self.executor.submit(adapter.fetch, self.bbox, self.watermarks[name])
+            for name, adapter in self.adapters.items()
+        }
+
+        frames = []
+        watermarks = {}
+        for name, future in futures.items():
+            adapter = self.adapters[name]
+            try:
+                batch = future.result(timeout=max(0.0, started + adapter.timeout - time.perf_counter()))
+            except Exception as e:
+                print(f"[WARN] Source '{name}' skipped this cycle: {e or type(e).__name__}")
+                continue
+
+            if batch.watermark:
+                watermarks[name] = max(batch.watermark, self.watermarks[name] or '')
+            frames.append(batch.frame)
+
+        batch = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        fetched = len(batch)
+        rejected = saved = unique = 0
+        if fetched:
+            valid = batch['lat'].notna() & batch['lon'].notna() & (batch['id'] != '')
+            rejected = int((~valid).sum())
+            # The same id from several polls or sources: last one wins
+            batch = batch[valid].drop_duplicates('id', keep='last')
+            unique = len(batch)
+
+            fingerprints = pd.util.hash_pandas_object(batch, index=False).to_numpy()
+            changed = [
+                self._written.get(row_id) != fingerprint
+                for row_id, fingerprint in zip(batch['id'], fingerprints)
+            ]
+            batch, fingerprints = batch[changed], fingerprints[changed]
+            if len(batch):
+                saved_ids, invalid = self.db.save_hazards(to_records(batch))
+                saved, rejected = len(saved_ids), rejected + invalid
+
+                if len(self._written) > 100000:
+                    self._written.clear()
+                saved_rows = batch['id'].isin(saved_ids).to_numpy()
+                self._written.update(zip(batch['id'][saved_rows], fingerprints[saved_rows]))
+
+        self.watermarks.update(watermarks)
+        version = self.db.bump_data_version('hazards') if saved else self.db.get_data_version('hazards')
+        elapsed = time.perf_counter() - started
+
+        stats = {
+            'fetched': fetched,
+            'unique': unique,
+            'written': saved,
+            'rejected': rejected,
+            'seconds': elapsed,
+            'records_per_second': fetched / elapsed if elapsed > 0 else 0.0,
+            'version': version
+        }
+        self.totals['cycles'] += 1
+        for key in ('fetched', 'written', 'rejected', 'seconds'):
+            self.totals[key] += stats[key]
+        return stats
+
+    def run_forever(self, interval):
+        """Run cycles every `interval` seconds until interrupted; a failed cycle is logged and retried"""
+        print(f"[INFO] Ingestion service started (interval {interval}s, sources: {', '.join(self.adapters)})")
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    stats = self.run_once()
+                except Exception as e:
+                    # e.g. "database is locked"; nothing was recorded, so the next cycle retries
+                    self.totals['failures'] += 1
+                    print(f"[ERROR] Ingestion cycle failed: {e or type(e).__name__}")
+                else:
+                    print(
+                        f"[INFO] Cycle {self.totals['cycles']}: fetched {stats['fetched']}, "
+                        f"wrote {stats['written']}, rejected {stats['rejected']} in {stats['seconds']:.3f}s "
+                        f"({stats['records_per_second']:.0f} rec/s), data version {stats['version']}"
+                    )
+                time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+        except KeyboardInterrupt:
+            print(
+                f"\n[INFO] Stopped after {self.totals['cycles']} cycles ({self.totals['failures']} failed): "
+                f"{self.totals['fetched']} fetched, {self.totals['written']} written, "
+                f"{self.totals['rejected']} rejected in {self.totals['seconds']:.1f}s of work"
+            )
+        finally:
+            self.executor.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SafeRoute.AI background hazard ingestion service")
+    parser.add_argument('--interval', type=int, default=Config.INGESTION_INTERVAL,
+                        help="seconds between ingestion cycles")
+    parser.add_argument('--bbox', default="77.2090,28.6139,77.2290,28.6339",
+                        help="bounding box passed to feed adapters (minLon,minLat,maxLon,maxLat)")
+    parser.add_argument('--once', action='store_true', help="run a single cycle and exit")
+    args = parser.parse_args(argv)
+
+    service = IngestionService(bbox=args.bbox)
+    if args.once:
+        stats = service.run_once()
+        print(f"[INFO] Fetched {stats['fetched']}, wrote {stats['written']}, rejected {stats['rejected']} "
+              f"in {stats['seconds']:.3f}s, data version {stats['version']}")
+        service.executor.shutdown(wait=False)
+        return 0
+
+    service.run_forever(args.interval)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
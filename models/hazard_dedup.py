@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from utils.hazard_schema import HAZARD_TYPES
+from utils.spatial import project
+
+# How far apart two reports of the same hazard type can be and still
+# describe the same event; linear hazards (closures, flooding) spread wider
+DEDUP_DISTANCE_M = {
+    'Potholes': 30,
+    'Debris': 50,
+    'Construction': 100,
+    'Accidents': 150,
+    'Road Closures': 200,
+    'Traffic': 300,
+    'Landslides': 300,
+    'Flooding': 500,
+    'Other': 100
+}
+
+# Cell offsets visited for each record: the cell itself plus half of its
+# neighbours in (x, y, time), so every adjacent cell pair is joined once
+_HALF_STENCIL = [
+    (dx, dy, dt)
+    for dt in (0, 1) for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+    if (dt, dy, dx) >= (0, 0, 0)
+]
+
+
+class HazardDeduplicator:
+    """Merge reports of the same hazard that arrive from several sources.
+
+    Records are bucketed on a spatial grid sized to each type's distance
+    threshold and on time windows, candidate pairs come from hash joins
+    between neighbouring buckets, and pairs within the threshold and time
+    window are unioned into groups. Each group becomes one hazard whose
+    confidence combines its sources (noisy-OR over the best report per
+    source) and which lists the ids and sources it was built from.
+
+    Cost is linear in the number of records as long as buckets stay small,
+    which the type-sized cells guarantee for real report densities.
+    """
+
+    def __init__(self, time_window_minutes=120, distance_thresholds=None):
+        self.time_window = np.int64(time_window_minutes) * 60 * 10**9
+        thresholds = dict(DEDUP_DISTANCE_M, **(distance_thresholds or {}))
+        self.thresholds = np.array([thresholds.get(t, thresholds['Other']) for t in HAZARD_TYPES], dtype=np.float64)
+
+    def deduplicate(self, hazards_df):
+        """Return one row per distinct hazard, with provenance columns.
+
+        Adds `report_count`, `sources` (comma-separated) and `merged_ids`
+        (tuple of source record ids); singleton rows keep their values.
+        """
+        if hazards_df.empty:
+            return hazards_df.assign(report_count=pd.Series(dtype=np.int32), sources='', merged_ids=None)
+
+        hazards_df = hazards_df.reset_index(drop=True)
+        groups = self.find_groups(hazards_df)
+        return self._merge_groups(hazards_df, groups)
+
+    def find_groups(self, hazards_df):
+        """Group label per row; rows describing the same hazard share a label"""
+        n = len(hazards_df)
+        type_codes = self._codes(hazards_df['hazard_type'], HAZARD_TYPES)
+        lat = hazards_df['lat'].to_numpy(dtype=np.float64)
+        lon = hazards_df['lon'].to_numpy(dtype=np.float64)
+        x, y = project(lat, lon, float(np.nanmean(lat)))
+        t = pd.to_datetime(hazards_df['timestamp']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+        threshold = self.thresholds[type_codes]
+        # Rows without coordinates land in cell 0 but never pass the distance check
+        cx = np.floor(np.nan_to_num(x / threshold)).astype(np.int64)
+        cy = np.floor(np.nan_to_num(y / threshold)).astype(np.int64)
+        ct = t // self.time_window
+
+        # Keys are linear in the cell coordinates, so a stencil offset is a
+        # constant shift and every neighbour join is a sorted-into-sorted
+        # searchsorted over the same key array
+        keys = self._bucket_keys(type_codes, cx, cy, ct)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        positions = np.arange(n)
+
+        rows, cols = [], []
+        for dx, dy, dt in _HALF_STENCIL:
+            shifted = sorted_keys + self._bucket_keys(0, dx, dy, dt)
+            lo = np.searchsorted(sorted_keys, shifted, side='left')
+            hi = np.searchsorted(sorted_keys, shifted, side='right')
+            if (dx, dy, dt) == (0, 0, 0):
+                # Pairs inside one bucket are seen from both ends
+                lo = positions + 1
+            counts = np.maximum(hi - lo, 0)
+            if not counts.any():
+                continue
+
+            p = np.repeat(positions, counts)
+            q = np.repeat(lo, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+            i, j = order[p], order[q]
+
+            close = (
+                (np.hypot(x[i] - x[j], y[i] - y[j]) <= threshold[i])
+                & (np.abs(t[i] - t[j]) <= self.time_window)
+            )
+            rows.append(i[close])
+            cols.append(j[close])
+
+        if not rows:
+            return np.arange(n)
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        graph = coo_matrix((np.ones(rows.size, dtype=np.int8), (rows, cols)), shape=(n, n))
+        _, labels = connected_components(graph, directed=False)
+        return labels
+
+    @staticmethod
+    def _bucket_keys(type_codes, cx, cy, ct):
+        # Mixes the four bucket coordinates into one int64 (wrapping on
+        # overflow); collisions only add candidate pairs, which the exact
+        # distance check then rejects
+        key = np.asarray(type_codes, dtype=np.int64)
+        with np.errstate(over='ignore'):
+            for part in (cx, cy, ct):
+                key = key * np.int64(1000003) + np.asarray(part, dtype=np.int64)
+        return key
+
+    @staticmethod
+    def _codes(column, categories):
+        if isinstance(column.dtype, pd.CategoricalDtype) and list(column.cat.categories) == categories:
+            codes = column.cat.codes.to_numpy()
+        else:
+            codes = pd.Categorical(column.astype(object), categories=categories).codes
+        # Unknown values share the 'Other' bucket
+        return np.where(codes < 0, categories.index('Other'), codes).astype(np.int64)
+
+    def _merge_groups(self, hazards_df, groups):
+        n_groups = int(groups.max()) + 1
+        sizes = np.bincount(groups, minlength=n_groups)
+
+        confidence = hazards_df['confidence'].to_numpy(dtype=np.float64)
+        # Representative: the most confident report, ties to the first seen
+        order = np.lexsort((-confidence, groups))
+        first = np.ones(order.size, dtype=bool)
+        first[1:] = groups[order[1:]] != groups[order[:-1]]
+        representative = order[first]
+
+        merged = hazards_df.iloc[representative].reset_index(drop=True)
+        merged['report_count'] = sizes.astype(np.int32)
+
+        if (sizes > 1).any():
+            self._combine(hazards_df, groups, n_groups, confidence, merged)
+            provenance = self._provenance(hazards_df, groups, sizes, order)
+            merged['sources'] = provenance['sources']
+            merged['merged_ids'] = provenance['merged_ids']
+        else:
+            merged['sources'] = merged['source'].astype(str).to_numpy()
+            merged['merged_ids'] = [(row_id,) for row_id in merged['id']]
+        return merged
+
+    @staticmethod
+    def _combine(hazards_df, groups, n_groups, confidence, merged):
+        weights = np.maximum(confidence, 1.0)
+        weight_sum = np.bincount(groups, weights, minlength=n_groups)
+        for column in ('lat', 'lon'):
+            values = hazards_df[column].to_numpy(dtype=np.float64)
+            merged[column] = (np.bincount(groups, values * weights, minlength=n_groups) / weight_sum).astype(merged[column].dtype)
+
+        severity = np.zeros(n_groups, dtype=np.int64)
+        np.maximum.at(severity, groups, hazards_df['severity'].to_numpy(dtype=np.int64))
+        merged['severity'] = severity.astype(merged['severity'].dtype)
+
+        verified = np.bincount(groups, hazards_df['verified'].to_numpy(dtype=np.float64), minlength=n_groups) > 0
+        merged['verified'] = verified
+
+        timestamps = pd.to_datetime(hazards_df['timestamp']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        latest = np.full(n_groups, np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(latest, groups, timestamps)
+        merged['timestamp'] = latest.view('datetime64[ns]')
+
+        # Noisy-OR across sources, using each source's best report so that
+        # repeated polls of one feed do not inflate confidence
+        source_codes = pd.factorize(hazards_df['source'].astype(str))[0]
+        pair = groups.astype(np.int64) * (source_codes.max() + 1) + source_codes
+        pair_ids, pair_index = np.unique(pair, return_inverse=True)
+        best = np.zeros(pair_ids.size)
+        np.maximum.at(best, pair_index, confidence)
+        miss = np.log1p(-np.clip(best / 100, 0, 0.999))
+        combined = 100 * -np.expm1(np.bincount(pair_ids // (source_codes.max() + 1), miss, minlength=n_groups))
+        merged['confidence'] = np.round(combined, 1).astype(merged['confidence'].dtype)
+
+    @staticmethod
+    def _provenance(hazards_df, groups, sizes, order):
+        ids = hazards_df['id'].to_numpy(dtype=object)
+        sources = hazards_df['source'].astype(str).to_numpy(dtype=object)
+        merged_ids = [(row_id,) for row_id in ids[order[np.r_[0, np.cumsum(sizes)[:-1]]]]]
+        merged_sources = list(sources[order[np.r_[0, np.cumsum(sizes)[:-1]]]])
+
+        # Only groups with several reports need their members listed
+        multi = order[sizes[groups[order]] > 1]
+        bounds = np.flatnonzero(np.diff(groups[multi])) + 1
+        for group, part in zip(groups[multi[np.r_[0, bounds]]], np.split(multi, bounds)):
+            merged_ids[group] = tuple(ids[part])
+            merged_sources[group] = ', '.join(dict.fromkeys(sources[part]))
+        return {'merged_ids': merged_ids, 'sources': merged_sources}
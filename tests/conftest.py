@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Keep caches the code under test opens out of the working tree's data/ directory
+os.environ.setdefault('GEOCODE_CACHE_PATH', os.path.join(tempfile.mkdtemp(prefix='safetroute-tests-'), 'geocode_cache.db'))
@@ -0,0 +1,87 @@
+import threading
+import time
+import pytest
+import redis
+from utils import serialization
+from utils.cache_manager import CacheManager
+from utils.redis_pool import RedisHealth
+
+
+class _FakeRedis:
+    def __init__(self, payloads=None, error=None):
+        self.payloads = payloads or {}
+        self.error = error
+
+    def mget(self, keys):
+        if self.error is not None:
+            raise self.error
+        return [self.payloads.get(key) for key in keys]
+
+
+def _manager(client):
+    health = RedisHealth('redis://unused')
+    # Skip the pool and the background checker: Redis is up and answers with `client`
+    health._checker, health._client, health.available = object(), client, True
+    cache = CacheManager()
+    cache._redis = health
+    return cache
+
+
+def test_undecodable_value_is_a_miss_and_keeps_redis_up():
+    cache = _manager(_FakeRedis({'good': serialization.dumps({'a': 1}), 'bad': b'\x00not a payload'}))
+    assert cache.get_many(['good', 'bad', 'absent']) == {'good': {'a': 1}}
+    assert cache.redis_available
+
+
+@pytest.mark.parametrize('error, down', [
+    (redis.ConnectionError('refused'), True),
+    (redis.TimeoutError('slow'), True),
+    (redis.ResponseError('WRONGTYPE'), False)
+])
+def test_only_connection_errors_mark_redis_down(error, down):
+    cache = _manager(_FakeRedis(error=error))
+    cache.memory_cache.set('cached', 'from memory', ttl=60)
+    assert cache.get_many(['cached']) == {'cached': 'from memory'}
+    assert cache.redis_available is not down
+
+
+def test_unreachable_redis_never_blocks_and_memory_serves():
+    health = RedisHealth('redis://127.0.0.1:1', retry_interval=60)
+    started = time.monotonic()
+    # The pool is created lazily and the first ping runs in the background
+    assert health.client is None
+    assert time.monotonic() - started < 0.1
+    assert health.wait_until_checked(timeout=2.0) is False
+
+    cache = CacheManager()
+    cache._redis = health
+    calls = []
+    compute = lambda: calls.append(1) or 'value'
+    assert cache.get_or_compute('test:redis-down', compute, ttl_seconds=60) == 'value'
+    assert cache.get_or_compute('test:redis-down', compute, ttl_seconds=60) == 'value'
+    assert len(calls) == 1
+
+
+class _FlakyPing:
+    def __init__(self, failures):
+        self.failures = failures
+
+    def ping(self):
+        if self.failures:
+            self.failures -= 1
+            raise redis.ConnectionError('refused')
+        return True
+
+
+def test_checker_reenables_redis_once_ping_succeeds():
+    health = RedisHealth('redis://unused', check_interval=60, retry_interval=0.01)
+    health._client = _FlakyPing(failures=2)
+    health._checker = threading.Thread(target=health._check_loop, daemon=True)
+    health._checker.start()
+
+    deadline = time.monotonic() + 2
+    while not health.available:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert health.client is health._client
+    assert health.stats['recoveries'] == 1
@@ -0,0 +1,110 @@
+import threading
+import time
+from datetime import datetime
+from components.enhanced_data_ingestion import EnhancedDataIngestion
+from components.source_adapters import SourceAdapter
+from models.hazard_dedup import HazardDeduplicator
+
+
+class _Feed(SourceAdapter):
+    """Returns each queued batch once, then nothing"""
+
+    name = 'feed'
+    source_label = 'Traffic API'
+
+    def __init__(self, *batches):
+        self.batches = list(batches)
+
+    def fetch_records(self, bbox, since=None):
+        return self.batches.pop(0) if self.batches else []
+
+
+class _SlowFeed(SourceAdapter):
+    """Delivers one hazard once `release` is set, well after its deadline"""
+
+    name = 'slow'
+    source_label = 'Weather API'
+    timeout = 0.2
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.delivered = False
+
+    def fetch_records(self, bbox, since=None):
+        self.release.wait(5)
+        if self.delivered:
+            return []
+        self.delivered = True
+        return [_hazard('S', 28.66)]
+
+
+class _BrokenFeed(SourceAdapter):
+    name = 'broken'
+
+    def fetch_records(self, bbox, since=None):
+        raise ConnectionError('feed down')
+
+
+class _CountingDeduplicator(HazardDeduplicator):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def deduplicate(self, hazards):
+        self.calls += 1
+        return super().deduplicate(hazards)
+
+
+def _hazard(row_id, lat):
+    # Far enough apart that none of them are duplicates of each other
+    return {'id': row_id, 'hazard_type': 'Potholes', 'severity': 3, 'lat': lat, 'lon': 77.21,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def test_unchanged_table_reuses_the_deduplicated_frame():
+    ingestion = EnhancedDataIngestion.__new__(EnhancedDataIngestion)
+    ingestion.sources = {'feed': _Feed([_hazard('A', 28.60), _hazard('B', 28.62)], [], [_hazard('C', 28.64)])}
+    ingestion.deduplicator = _CountingDeduplicator()
+    bbox = 'test:unchanged-table'
+
+    first = ingestion.get_real_time_hazards(bbox)
+    first.attrs['source_status'] = None
+    second = ingestion.get_real_time_hazards(bbox)
+    assert ingestion.deduplicator.calls == 1
+    assert sorted(second['id']) == sorted(first['id']) == ['A', 'B']
+    assert second.attrs['data_version'] == first.attrs['data_version']
+    # Per-call attrs never reach the cached frame
+    assert second.attrs['source_status']['feed']['state'] == 'fresh'
+
+    third = ingestion.get_real_time_hazards(bbox)
+    assert ingestion.deduplicator.calls == 2
+    assert sorted(third['id']) == ['A', 'B', 'C']
+    assert third.attrs['data_version'] > second.attrs['data_version']
+
+
+def test_slow_and_failing_sources_are_reported_stale_without_blocking():
+    slow = _SlowFeed()
+    ingestion = EnhancedDataIngestion.__new__(EnhancedDataIngestion)
+    ingestion.sources = {'feed': _Feed([_hazard('A', 28.60)]), 'slow': slow, 'broken': _BrokenFeed()}
+    ingestion.deduplicator = HazardDeduplicator()
+    bbox = 'test:deadlines'
+
+    started = time.monotonic()
+    hazards = ingestion.get_real_time_hazards(bbox)
+    # Bounded by the slowest deadline, not by the slow source
+    assert time.monotonic() - started < 1.0
+    status = hazards.attrs['source_status']
+    assert status['feed']['state'] == 'fresh'
+    assert status['slow'] == dict(status['slow'], state='missing', reason='timeout')
+    assert status['broken']['state'] == 'missing'
+    assert status['broken']['reason'] == 'error: feed down'
+    assert hazards.attrs['partial']
+    assert list(hazards['id']) == ['A']
+
+    # The late delta is merged when it arrives and shows up on the next call
+    slow.release.set()
+    deadline = time.monotonic() + 5
+    while 'S' not in set(ingestion.get_real_time_hazards(bbox)['id']):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert ingestion.get_real_time_hazards(bbox).attrs['source_status']['slow']['fetched_at'] is not None
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from utils.density_grid import DensityGrids
+
+
+def _hazards(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': [f"H{i}" for i in range(n)],
+        'lat': rng.uniform(28.40, 28.80, n),
+        'lon': rng.uniform(77.00, 77.40, n),
+        'severity': rng.integers(1, 6, n)
+    })
+
+
+def _assert_same_grids(incremental, rebuilt):
+    for zoom in range(incremental.min_zoom, incremental.max_zoom + 1):
+        got, expected = incremental.cells(zoom), rebuilt.cells(zoom)
+        assert len(got) == len(expected)
+        np.testing.assert_array_equal(got['count'].to_numpy(), expected['count'].to_numpy())
+        np.testing.assert_allclose(got[['lat', 'lon', 'weight']].to_numpy(),
+                                   expected[['lat', 'lon', 'weight']].to_numpy(), rtol=0, atol=1e-9)
+
+
+def test_incremental_updates_match_a_fresh_build():
+    grids = DensityGrids(max_cells=10 ** 6)
+    hazards = _hazards(5000, seed=0)
+    assert grids.update(hazards) == 5000
+
+    changed = hazards.copy()
+    changed.loc[:99, 'severity'] = changed.loc[:99, 'severity'] % 5 + 1  # re-rated
+    changed.loc[100:199, ['lat', 'lon']] += 0.01  # moved
+    changed = pd.concat([changed.drop(index=range(200, 300)),  # removed
+                         _hazards(250, seed=1).assign(id=lambda f: 'N' + f['id'])])  # added
+
+    # Old and new versions of the 200 changed rows, 100 removed, 250 added
+    assert grids.update(changed) == 2 * 200 + 100 + 250
+
+    rebuilt = DensityGrids(max_cells=10 ** 6)
+    rebuilt.update(changed)
+    _assert_same_grids(grids, rebuilt)
+
+
+def test_unchanged_frame_applies_nothing():
+    grids = DensityGrids()
+    hazards = _hazards(100, seed=2)
+    grids.update(hazards)
+    assert grids.update(hazards) == 0
+    assert grids.update(hazards.copy()) == 0
+
+
+def test_emptied_cells_are_dropped():
+    grids = DensityGrids(max_cells=10 ** 6)
+    grids.update(_hazards(50, seed=3))
+    grids.update(_hazards(0, seed=3))
+    assert all(grids.cells(zoom).empty for zoom in range(grids.min_zoom, grids.max_zoom + 1))
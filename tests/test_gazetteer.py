@@ -0,0 +1,69 @@
+from utils.gazetteer import Gazetteer, SEED_PLACES, SEED_REGIONS, read_osm_places
+
+DELHI = ('New Delhi', 'Delhi', 'India')
+MUMBAI = ('Mumbai', 'Maharashtra', 'India')
+
+
+def _gazetteer(*extra):
+    return Gazetteer([place + (SEED_REGIONS,) for place in SEED_PLACES] + list(extra))
+
+
+def test_exact_match_ignores_case_and_punctuation():
+    match = _gazetteer().resolve('india  gate!', min_score=0.9)
+    assert match['name'] == 'India Gate'
+    assert match['score'] == 1.0
+
+
+def test_prefix_and_word_suffix_matches():
+    gazetteer = _gazetteer()
+    assert gazetteer.resolve('Conn')['name'] == 'Connaught Place'
+    assert 'India Gate' in [match['name'] for match in gazetteer.search('gate')]
+
+
+def test_fuzzy_match_tolerates_misspelling():
+    match = _gazetteer().resolve('Connaught Palce')
+    assert match['name'] == 'Connaught Place'
+    assert match['score'] < 0.9
+
+
+def test_matching_qualifier_keeps_exact_score():
+    match = _gazetteer().resolve('India Gate, New Delhi 110001', min_score=0.9)
+    assert match['name'] == 'India Gate'
+    assert match['score'] == 1.0
+
+
+def test_qualifier_naming_nearby_place_is_consistent():
+    assert _gazetteer().resolve('Janpath, Connaught Place', min_score=0.9)['name'] == 'Janpath'
+
+
+def test_contradicting_qualifier_rejects_match():
+    gazetteer = _gazetteer()
+    assert gazetteer.resolve('India Gate, Mumbai', min_score=0.9) is None
+    assert gazetteer.resolve('India Gate, Mumbai') is None
+
+
+def test_qualifier_breaks_tie_between_same_names():
+    gazetteer = _gazetteer(('Station Road', 19.0596, 72.8295, 'street', MUMBAI),
+                           ('Station Road', 28.6419, 77.2194, 'street', DELHI))
+    assert gazetteer.resolve('Station Road, Mumbai')['lat'] == 19.0596
+    assert gazetteer.resolve('Station Road, Delhi')['lat'] == 28.6419
+
+
+def test_full_query_naming_a_place_skips_qualifiers():
+    gazetteer = _gazetteer(('Gate, Mumbai', 19.0, 72.8, 'neighbourhood'))
+    assert gazetteer.resolve('Gate, Mumbai', min_score=0.9)['name'] == 'Gate, Mumbai'
+
+
+def test_osm_places_carry_extract_and_tag_regions(tmp_path):
+    path = tmp_path / 'extract.osm'
+    path.write_text(
+        '<osm>'
+        '<node id="1" lat="28.61" lon="77.23"><tag k="name" v="Gate One"/><tag k="place" v="locality"/>'
+        '<tag k="addr:city" v="Noida"/></node>'
+        '</osm>'
+    )
+    [place] = read_osm_places(str(path), regions=['Delhi'])
+    assert place[:4] == ('Gate One', 28.61, 77.23, 'locality')
+    assert place[4] == ('Delhi', 'Noida')
+    gazetteer = Gazetteer([place])
+    assert gazetteer.resolve('Gate One, Noida', min_score=0.9)['name'] == 'Gate One'
@@ -0,0 +1,69 @@
+import pytest
+from utils import geocode_cache
+from utils.geocode_cache import GeocodeCache
+
+PLACE = {'lon': 77.2295, 'lat': 28.6129, 'place_name': 'India Gate, New Delhi'}
+
+
+class _Clock:
+    """Stands in for the time module inside utils.geocode_cache only"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(geocode_cache, 'time', clock)
+    return clock
+
+
+def _cache(tmp_path, **kwargs):
+    return GeocodeCache(str(tmp_path / 'geocode.db'), ttl=100, negative_ttl=10, **kwargs)
+
+
+def test_results_expire_after_their_ttl(tmp_path, clock):
+    cache = _cache(tmp_path)
+    assert cache.get('India Gate') == (False, None)
+    cache.put('India Gate', PLACE)
+    # Keys are normalized, so spelling variants share an entry
+    assert cache.get('  india gate!') == (True, PLACE)
+
+    clock.now += 99
+    assert cache.get('India Gate') == (True, PLACE)
+    clock.now += 2
+    assert cache.get('India Gate') == (False, None)
+    assert cache.purge_expired() == 1
+
+
+def test_misses_are_cached_for_the_shorter_negative_ttl(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.put('Nowhere Lane', None)
+    assert cache.get('Nowhere Lane') == (True, None)
+    assert cache.stats['negative_hits'] == 1
+    clock.now += 11
+    assert cache.get('Nowhere Lane') == (False, None)
+
+
+def test_disk_tier_survives_restart_and_lru_bound(tmp_path, clock):
+    cache = _cache(tmp_path, memory_size=2)
+    cache.put_many([(f"Street {i}", dict(PLACE, place_name=f"Street {i}")) for i in range(5)])
+    assert len(cache._memory) == 2
+
+    restarted = _cache(tmp_path)
+    assert restarted.get('Street 0') == (True, dict(PLACE, place_name='Street 0'))
+    assert restarted.stats['disk_hits'] == 1
+    restarted.get('Street 0')
+    assert restarted.stats['memory_hits'] == 1
+
+
+def test_warm_up_loads_csv_rows_with_coordinates(tmp_path, clock):
+    path = tmp_path / 'addresses.csv'
+    path.write_text('address,lat,lon,place_name\nJanpath,28.6238,77.2186,Janpath\nNo coordinates,,,\n')
+    cache = _cache(tmp_path)
+    assert cache.warm_up(str(path)) == 1
+    assert cache.get('janpath') == (True, {'lon': 77.2186, 'lat': 28.6238, 'place_name': 'Janpath'})
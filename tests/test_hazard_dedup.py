@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from models.hazard_dedup import HazardDeduplicator
+from utils.hazard_schema import HAZARD_TYPES
+from utils.spatial import project
+
+
+def _reports(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': [f"R{i}" for i in range(n)],
+        'hazard_type': rng.choice(HAZARD_TYPES, n),
+        'severity': rng.integers(1, 6, n),
+        'confidence': rng.uniform(40, 95, n).round(1),
+        'lat': 28.60 + rng.uniform(0, 0.02, n),
+        'lon': 77.20 + rng.uniform(0, 0.02, n),
+        'location': 'Test',
+        'description': '',
+        'source': rng.choice(['Traffic API', 'User Report', 'Weather API'], n),
+        'verified': rng.random(n) < 0.5,
+        'timestamp': pd.Timestamp('2026-10-19 08:00') + pd.to_timedelta(rng.integers(0, 360, n), unit='m')
+    })
+
+
+def _brute_force_groups(dedup, reports):
+    """Every pair compared directly, then unioned"""
+    codes = np.array([HAZARD_TYPES.index(t) for t in reports['hazard_type']])
+    lat, lon = reports['lat'].to_numpy(), reports['lon'].to_numpy()
+    x, y = project(lat, lon, float(np.nanmean(lat)))
+    t = reports['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    i, j = np.triu_indices(len(reports), k=1)
+    close = ((codes[i] == codes[j]) & (np.hypot(x[i] - x[j], y[i] - y[j]) <= dedup.thresholds[codes[i]])
+             & (np.abs(t[i] - t[j]) <= dedup.time_window))
+    graph = coo_matrix((np.ones(close.sum()), (i[close], j[close])), shape=(len(reports),) * 2)
+    return connected_components(graph, directed=False)[1]
+
+
+def _partition(labels):
+    return sorted(tuple(np.flatnonzero(labels == label)) for label in np.unique(labels))
+
+
+def test_hash_join_groups_match_brute_force_pairs():
+    dedup = HazardDeduplicator()
+    for seed in range(3):
+        reports = _reports(1500, seed)
+        groups = dedup.find_groups(reports)
+        assert len(np.unique(groups)) < len(reports)
+        assert _partition(groups) == _partition(_brute_force_groups(dedup, reports))
+
+
+def test_reports_from_two_sources_merge_into_one_hazard():
+    reports = _reports(2, seed=0).assign(
+        hazard_type='Potholes', lat=28.6, lon=77.2, confidence=[60.0, 50.0],
+        source=['Traffic API', 'User Report'], severity=[2, 4],
+        timestamp=[pd.Timestamp('2026-10-19 08:00'), pd.Timestamp('2026-10-19 08:30')]
+    )
+    merged = HazardDeduplicator().deduplicate(reports)
+    assert len(merged) == 1
+    row = merged.iloc[0]
+    assert row['report_count'] == 2
+    assert row['severity'] == 4
+    assert row['confidence'] == 80.0  # 1 - 0.4 * 0.5
+    assert set(row['merged_ids']) == {'R0', 'R1'}
+    assert row['timestamp'] == pd.Timestamp('2026-10-19 08:30')
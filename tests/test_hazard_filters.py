@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+from tile_server import synthetic_hazards
+from utils.hazard_filters import SOURCE_GROUPS, FilteredHazardCache, HazardFilter
+
+FILTERS = [
+    {},
+    {'hazard_types': [], 'sources': []},
+    {'hazard_types': ['Potholes', 'Flooding'], 'min_severity': 3},
+    {'sources': ['Community Reports', 'Government Feeds'], 'min_confidence': 70},
+    {'hazard_types': ['Accidents'], 'sources': ['Traffic APIs'], 'min_severity': 5, 'min_confidence': 90.5}
+]
+
+
+def _reference(hazards, filters):
+    """The sidebar filters applied row by row in pandas"""
+    keep = pd.Series(True, index=hazards.index)
+    if filters.get('hazard_types'):
+        keep &= hazards['hazard_type'].astype(str).isin(filters['hazard_types'])
+    if filters.get('sources'):
+        sources = [source for group in filters['sources'] for source in SOURCE_GROUPS[group]]
+        provenance = hazards['sources'] if 'sources' in hazards else hazards['source'].astype(str)
+        keep &= np.array([any(source in sources for source in row.split(', ')) for row in provenance])
+    if filters.get('min_severity') is not None:
+        keep &= hazards['severity'] >= filters['min_severity']
+    if filters.get('min_confidence') is not None:
+        keep &= hazards['confidence'] >= filters['min_confidence']
+    return keep.to_numpy()
+
+
+@pytest.fixture(scope='module')
+def hazards():
+    return synthetic_hazards(5000, (77.0, 28.4, 77.4, 28.8), hotspots=4)
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_mask_matches_reference_on_categorical_and_plain_columns(hazards, filters):
+    hazard_filter = HazardFilter.from_dict(filters)
+    expected = _reference(hazards, filters)
+    np.testing.assert_array_equal(hazard_filter.mask(hazards), expected)
+    plain = hazards.astype({'hazard_type': object, 'source': object})
+    np.testing.assert_array_equal(hazard_filter.mask(plain), expected)
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_query_round_trip(filters):
+    hazard_filter = HazardFilter.from_dict(filters)
+    assert HazardFilter.from_query(hazard_filter.to_query()) == hazard_filter
+
+
+def test_empty_selection_means_no_restriction(hazards):
+    hazard_filter = HazardFilter.from_dict({'hazard_types': [], 'sources': []})
+    assert hazard_filter.is_empty
+    assert hazard_filter.apply(hazards) is hazards
+
+
+def test_source_filter_matches_merged_provenance(hazards):
+    merged = hazards.head(4).assign(
+        source=['Traffic API', 'Traffic API', 'Weather API', 'Govt API'],
+        sources=['Traffic API, User Report', 'Traffic API', 'Weather API, Traffic Cam', 'Govt API']
+    )
+    hazard_filter = HazardFilter.from_dict({'sources': ['Community Reports']})
+    np.testing.assert_array_equal(hazard_filter.mask(merged), [True, False, False, False])
+    hazard_filter = HazardFilter.from_dict({'sources': ['Traffic APIs']})
+    np.testing.assert_array_equal(hazard_filter.mask(merged), [True, True, True, False])
+
+
+def _snapshot(hazards, version):
+    snapshot = hazards.copy(deep=False)
+    snapshot.attrs['data_version'] = version
+    return snapshot
+
+
+def test_filtered_frames_are_shared_per_snapshot_and_filter(hazards):
+    cache = FilteredHazardCache()
+    hazard_filter = HazardFilter.from_dict({'min_severity': 4})
+    snapshot = _snapshot(hazards, 1)
+    first = cache.apply(snapshot, hazard_filter)
+    assert cache.apply(snapshot, HazardFilter.from_dict({'min_severity': 4})) is first
+    cache.apply(snapshot, HazardFilter.from_dict({'min_severity': 5}))
+    assert len(cache._entries) == 2
+
+    # A new version replaces every entry of the old one
+    assert cache.apply(_snapshot(hazards, 2), hazard_filter) is not first
+    assert len(cache._entries) == 1
+    # Unversioned frames are never cached
+    assert cache.apply(hazards, hazard_filter) is not cache.apply(hazards, hazard_filter)
+    assert cache.stats == {'hits': 1, 'misses': 5}
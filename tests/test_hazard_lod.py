@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.hazard_lod import (DETAIL_ZOOM, GRID_COLUMNS, HazardLOD, bbox_contains, max_points, pad_bbox,
+                              viewport_from_state)
+
+VIEWPORT = (77.18, 28.58, 77.24, 28.64)
+
+
+@pytest.fixture(scope='module')
+def hazards():
+    rng = np.random.default_rng(0)
+    n = 20000
+    return pd.DataFrame({
+        'id': [f"H{i}" for i in range(n)],
+        'hazard_type': pd.Categorical(rng.choice(['Potholes', 'Flooding', 'Accidents'], n)),
+        'severity': rng.integers(1, 6, n),
+        'confidence': rng.uniform(40, 100, n).round(1),
+        'lat': rng.uniform(28.50, 28.72, n),
+        'lon': rng.uniform(77.10, 77.32, n)
+    })
+
+
+def test_point_cap_thresholds():
+    assert [max_points(zoom) for zoom in (10, 13, 14, 15, 18)] == [1500, 1500, 3000, 5000, 5000]
+
+
+def test_below_detail_zoom_serves_grid_summaries(hazards):
+    view = HazardLOD().view(hazards, VIEWPORT, DETAIL_ZOOM - 1)
+    assert view.level == 'grid'
+    assert list(view.frame.columns) == GRID_COLUMNS
+    # Every hazard in the padded viewport is counted in exactly one cell
+    west, south, east, north = view.bbox
+    inside = hazards['lon'].between(west, east) & hazards['lat'].between(south, north)
+    assert view.total == int(inside.sum()) == int(view.frame['count'].sum())
+    assert view.frame['max_severity'].max() == 5
+
+
+def test_grid_coarsens_to_the_cell_budget(hazards):
+    grid = HazardLOD(max_grid_cells=50).grid(hazards, cell_zoom=16)
+    assert len(grid) <= 50
+    assert grid['count'].sum() == len(hazards)
+
+
+def test_detail_zoom_serves_capped_points_most_severe_first(hazards):
+    view = HazardLOD().view(hazards, VIEWPORT, DETAIL_ZOOM)
+    assert view.level == 'points'
+    assert view.total > len(view.frame) == max_points(DETAIL_ZOOM)
+    west, south, east, north = view.bbox
+    inside = hazards[hazards['lon'].between(west, east) & hazards['lat'].between(south, north)]
+    dropped = inside[~inside['id'].isin(view.frame['id'])]
+    # Nothing dropped is more severe than what was kept
+    assert dropped['severity'].max() <= view.frame['severity'].min()
+
+
+def test_padded_viewport_covers_small_pans():
+    padded = pad_bbox(VIEWPORT)
+    assert bbox_contains(padded, (77.19, 28.59, 77.25, 28.65))
+    assert not bbox_contains(padded, (77.25, 28.65, 77.31, 28.71))
+
+
+def test_viewport_from_map_state():
+    state = {'zoom': 14, 'bounds': {'_southWest': {'lat': 28.58, 'lng': 77.18},
+                                    '_northEast': {'lat': 28.64, 'lng': 77.24}}}
+    assert viewport_from_state(state) == (VIEWPORT, 14)
+    assert viewport_from_state({'zoom': 14, 'bounds': {'_southWest': {}, '_northEast': {}}}) is None
+    assert viewport_from_state(None) is None
@@ -0,0 +1,73 @@
+import json
+import folium
+import pandas as pd
+from components.hazard_map import HazardColumns, RenderedMapCache, hazard_columns
+
+
+def _hazards():
+    return pd.DataFrame({
+        'hazard_type': ['Potholes', 'Flooding', 'Potholes', 'Debris'],
+        'severity': [2, 5, 3, 1],
+        'confidence': [80.04, 91.26, 55.0, 60.0],
+        'lat': [28.6, 28.61, 28.62, 28.63],
+        'lon': [77.2, 77.21, 77.22, 77.23],
+        'location': ['Ring Road', 'ITO', None, 'Ring Road'],
+        'description': ['</script><script>alert(1)</script>', '{{ x }} & more', '', 'ok'],
+        'timestamp': pd.to_datetime(['2026-10-19 08:00:31', '2026-10-19 08:05:00', None, '2026-10-19 08:00:59'])
+    })
+
+
+def _decoded(columns, name):
+    return [columns[name + 's'][code] for code in columns[name]]
+
+
+def test_columns_round_trip_the_frame():
+    hazards = _hazards()
+    columns = hazard_columns(hazards)
+    assert columns['lat'] == hazards['lat'].tolist()
+    assert columns['severity'] == [2, 5, 3, 1]
+    assert columns['confidence'] == [80.0, 91.3, 55.0, 60.0]
+    assert _decoded(columns, 'type') == hazards['hazard_type'].tolist()
+    assert _decoded(columns, 'location') == ['Ring Road', 'ITO', '', 'Ring Road']
+    assert _decoded(columns, 'description') == hazards['description'].tolist()
+    assert _decoded(columns, 'timestamp') == ['2026-10-19 08:00', '2026-10-19 08:05', '', '2026-10-19 08:00']
+    # Each distinct string is sent once
+    assert columns['types'].count('Potholes') == 1
+    assert columns['timestamps'].count('2026-10-19 08:00') == 1
+
+
+def test_columns_json_is_script_safe():
+    data_json = HazardColumns(_hazards()).data_json
+    # No '<' can close the <script> block; Jinja syntax in user text is left alone
+    assert '<' not in data_json and '&' not in data_json
+    assert json.loads(data_json) == hazard_columns(_hazards())
+    assert json.loads(data_json)['descriptions'][1] == '{{ x }} & more'
+
+
+def test_rendered_maps_are_cached_and_handed_out_as_copies():
+    cache = RenderedMapCache(max_entries=2)
+    builds = []
+
+    def build():
+        builds.append(1)
+        m = folium.Map(location=[28.6, 77.2], zoom_start=12)
+        folium.Marker([28.6, 77.2]).add_to(m)
+        return m, {'level': 'points'}
+
+    first, extra = cache.get_or_build(('v1', 'filters', '13/1/2'), build)
+    # st_folium adds to the map it renders; the cached original must not see that
+    folium.Marker([28.61, 77.21]).add_to(first)
+    second, _ = cache.get_or_build(('v1', 'filters', '13/1/2'), build)
+    assert len(builds) == 1 and extra == {'level': 'points'}
+    assert second is not first
+    assert len(second._children) == len(first._children) - 1
+
+    # A new data version is a new key; the least recently used entry goes
+    cache.get_or_build(('v2', 'filters', '13/1/2'), build)
+    cache.get_or_build(('v3', 'filters', '13/1/2'), build)
+    assert ('v1', 'filters', '13/1/2') not in cache._entries
+    # Unidentifiable inputs are built every time and never stored
+    cache.get_or_build(None, build)
+    cache.get_or_build(None, build)
+    assert len(builds) == 5 and len(cache._entries) == 2
+    assert cache.hit_rate() == 1 / 6
@@ -0,0 +1,102 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from components.source_adapters import SourceAdapter
+from utils.hazard_schema import to_hazard_frame
+from utils.hazard_store import HazardSnapshot, HazardTable
+
+
+def _frame(ids, age_hours):
+    stamp = (datetime.now() - timedelta(hours=age_hours)).strftime('%Y-%m-%d %H:%M:%S')
+    return to_hazard_frame([
+        {'id': row_id, 'hazard_type': 'Potholes', 'severity': 3, 'confidence': 80,
+         'lat': 28.6, 'lon': 77.2, 'timestamp': stamp}
+        for row_id in ids
+    ])
+
+
+def test_expire_after_growth_drops_only_rows_outside_the_window():
+    table = HazardTable(window_hours=24, capacity=4)
+    table.upsert('feed', _frame([f"old{i}" for i in range(3)], age_hours=23.5))
+    # Grows the column arrays past their initial capacity
+    table.upsert('feed', _frame([f"new{i}" for i in range(20)], age_hours=1))
+
+    assert table.expire(datetime.now() + timedelta(hours=1)) == 3
+    assert sorted(table.to_frame()['id']) == sorted(f"new{i}" for i in range(20))
+
+
+def test_source_adapter_requires_fetch_records():
+    with pytest.raises(TypeError):
+        SourceAdapter()
+
+    class Empty(SourceAdapter):
+        def fetch_records(self, bbox, since=None):
+            return []
+
+    assert Empty().fetch('bbox').frame.empty
+    assert isinstance(Empty().fetch('bbox').frame, pd.DataFrame)
+
+
+def test_expired_snapshot_reloads_past_an_unchanged_version_probe():
+    frames = iter([pd.DataFrame({'id': ['a']}), pd.DataFrame({'id': ['a', 'b']})])
+    snapshot = HazardSnapshot(lambda: next(frames), 0, version_probe=lambda: 7)
+    first = snapshot.get()
+    # The probe hasn't moved yet (writes invalidate before the version is bumped)
+    assert snapshot.get() is first
+
+    snapshot.expire()
+    second = snapshot.get()
+    assert list(second['id']) == ['a', 'b']
+    assert second.attrs['loaded_at'] >= first.attrs['loaded_at']
+    assert snapshot.get() is second
+
+
+def test_concurrent_readers_share_one_load():
+    loads = []
+    gate = threading.Event()
+
+    def loader():
+        loads.append(1)
+        gate.wait(5)
+        return pd.DataFrame({'id': ['a']})
+
+    snapshot = HazardSnapshot(loader, 300)
+    frames = []
+    readers = [threading.Thread(target=lambda: frames.append(snapshot.get())) for _ in range(8)]
+    for reader in readers:
+        reader.start()
+    time.sleep(0.1)
+    gate.set()
+    for reader in readers:
+        reader.join()
+    assert len(loads) == 1
+    assert all(frame is frames[0] for frame in frames)
+    assert frames[0].attrs['snapshot_version'] == 1
+
+
+def test_refresh_keeps_identity_for_unchanged_data_and_survives_errors():
+    results = [pd.DataFrame({'id': ['a']}), pd.DataFrame({'id': ['a']}), RuntimeError('feed down'),
+               pd.DataFrame({'id': ['a', 'b']})]
+    for frame, version, partial in zip(results, (1, 1, None, 2), (False, True, None, False)):
+        if version is not None:
+            frame.attrs.update(data_version=version, partial=partial)
+
+    def loader():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    snapshot = HazardSnapshot(loader, 0)
+    first = snapshot.get()
+    # Same data version: same frame, refreshed freshness attrs
+    assert snapshot.get() is first
+    assert first.attrs['partial']
+    # A failed reload keeps serving the previous snapshot
+    assert snapshot.get() is first
+    changed = snapshot.get()
+    assert list(changed['id']) == ['a', 'b']
+    assert (first.attrs['snapshot_version'], changed.attrs['snapshot_version']) == (1, 2)
+    assert snapshot.refreshes == 3
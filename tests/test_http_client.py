@@ -0,0 +1,111 @@
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from utils.http_client import PROVIDER_LIMITS, HttpClient
+
+PAYLOAD = {'features': [
+    {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [77.2 + i * 1e-3, 28.6]},
+     'properties': {'incident_type': 'accident', 'description': f'Incident {i}'}}
+    for i in range(500)
+]}
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    """A local server that mimics a polled JSON API and counts connections, requests and bytes"""
+    body = gzip.compress(json.dumps(PAYLOAD).encode('utf-8'))
+    etag = '"v1"'
+    counters = {'connections': 0, 'requests': 0, 'bytes_sent': 0, 'delay': 0, 'failing': False}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes on a kept-alive socket
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with lock:
+                counters['connections'] += 1
+
+        def do_GET(self):
+            with lock:
+                counters['requests'] += 1
+            if counters['failing']:
+                self._empty(503)
+                return
+            if self.headers.get('If-None-Match') == etag:
+                self._empty(304)
+                return
+            if counters['delay']:
+                time.sleep(counters['delay'])
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+            with lock:
+                counters['bytes_sent'] += len(body)
+
+        def _empty(self, status):
+            self.send_response(status)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    monkeypatch.setitem(PROVIDER_LIMITS, 'stand-in', {'rate': 10000, 'burst': 10000})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = HttpClient(retries=0)
+    yield client, f"http://127.0.0.1:{server.server_address[1]}/traffic/v5/incidents/bbox.json", counters
+    client.close()
+    server.shutdown()
+
+
+def test_connections_are_pooled(stand_in):
+    client, url, counters = stand_in
+    for _ in range(20):
+        assert client.get_json(url, provider='stand-in') == PAYLOAD
+    assert counters['requests'] == 20
+    assert counters['connections'] == 1
+
+
+def test_unchanged_resource_is_revalidated_without_a_body(stand_in):
+    client, url, counters = stand_in
+    for _ in range(10):
+        assert client.get_json(url, conditional=True, provider='stand-in') == PAYLOAD
+    assert counters['requests'] == 10
+    assert client.stats['not_modified'] == 9
+    # Only the first response carried a body
+    assert client.stats['bytes_received'] == counters['bytes_sent']
+
+
+def test_concurrent_identical_requests_are_coalesced(stand_in):
+    client, url, counters = stand_in
+    counters['delay'] = 0.2
+    threads = [threading.Thread(target=client.get_json, args=(url,), kwargs={'provider': 'stand-in'})
+               for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counters['requests'] < 20
+    assert client.stats['coalesced'] > 0
+
+
+def test_outage_serves_the_cached_body_and_opens_the_circuit(stand_in):
+    client, url, counters = stand_in
+    client.get_json(url, conditional=True, provider='stand-in')
+    counters.update(requests=0, failing=True)
+    served = [client.get_json(url, conditional=True, provider='stand-in') for _ in range(10)]
+    assert all(body == PAYLOAD for body in served)
+    assert counters['requests'] == 5
+    assert client.provider_status()['stand-in']['circuit'] == 'open'
@@ -0,0 +1,90 @@
+import gzip
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import pytest
+from components.real_mapbox_integration import RealMapboxIntegration
+from components.source_adapters import MapboxIncidentSource
+from utils.http_client import HttpClient
+from utils import incident_parser
+from utils.incident_parser import parse_incidents
+
+PAYLOAD = {'features': [
+    {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [77.2 + i * 1e-4, 28.6]},
+     'properties': {'incident_type': ('accident', 'construction', 'flood')[i % 3], 'impact': 'major',
+                    'start_time': '2026-10-19T01:00:00'}}
+    for i in range(3000)
+]}
+
+
+@pytest.fixture
+def feed():
+    body = gzip.compress(json.dumps(PAYLOAD).encode('utf-8'))
+    state = {'status': 200}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(state['status'])
+            if state['status'] != 200:
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    mapbox = RealMapboxIntegration()
+    mapbox.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    mapbox.http = HttpClient(retries=0)
+    yield mapbox, state
+    mapbox.http.close()
+    server.shutdown()
+
+
+def test_streamed_parse_matches_decoded_parse():
+    streamed = parse_incidents(io.BytesIO(json.dumps(PAYLOAD).encode('utf-8')), chunk_size=1000)
+    decoded = parse_incidents(PAYLOAD)
+    pd.testing.assert_frame_equal(streamed, decoded)
+
+
+
+@pytest.mark.parametrize('read_size', [7, 4096])
+def test_stream_without_ijson_is_read_in_blocks(monkeypatch, read_size):
+    monkeypatch.setattr(incident_parser, 'ijson', None)
+    monkeypatch.setattr(incident_parser, 'READ_SIZE', read_size)
+    body = json.dumps({'type': 'FeatureCollection', 'features': PAYLOAD['features'][:50]},
+                      ensure_ascii=False).replace('"major"', '"major", "road": "Mathura Road → NH-19"')
+    reads = []
+
+    class Stream(io.BytesIO):
+        def read(self, size=-1):
+            assert size > 0, 'the body was read in one call'
+            reads.append(size)
+            return super().read(size)
+
+    streamed = parse_incidents(Stream(body.encode('utf-8')), chunk_size=16)
+    pd.testing.assert_frame_equal(streamed, parse_incidents(body))
+    assert streamed['location'].eq('Mathura Road → NH-19').all()
+    assert len(reads) > 1
+
+def test_adapter_parses_the_response_stream(feed):
+    mapbox, _ = feed
+    batch = MapboxIncidentSource(mapbox).fetch('bbox')
+    pd.testing.assert_frame_equal(batch.frame, parse_incidents(PAYLOAD))
+
+
+def test_adapter_raises_instead_of_serving_mock_incidents(feed):
+    mapbox, state = feed
+    state['status'] = 404
+    with pytest.raises(RuntimeError):
+        MapboxIncidentSource(mapbox).fetch('bbox')
@@ -0,0 +1,87 @@
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import pytest
+import ingestion_service
+from components.source_adapters import SourceAdapter
+from ingestion_service import IngestionService
+
+
+class _Feed(SourceAdapter):
+    name = 'feed'
+
+    def fetch_records(self, bbox, since=None):
+        return [
+            {'id': 'H1', 'hazard_type': 'Potholes', 'severity': 3, 'lat': 28.61, 'lon': 77.21,
+             'timestamp': '2026-10-19 08:00:00'},
+            {'id': 'H2', 'hazard_type': 'Potholes', 'severity': 4, 'lat': 28.62, 'lon': 77.22,
+             'timestamp': '2026-10-19 08:05:00'}
+        ]
+
+
+class _Store:
+    """save_hazards fails `failures` times, then saves every row but the invalid ones"""
+
+    def __init__(self, failures=0, invalid=('H2',)):
+        self.failures = failures
+        self.invalid = set(invalid)
+        self.saved = []
+
+    def save_hazards(self, hazards):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError('database is locked')
+        valid = [hazard['id'] for hazard in hazards if hazard['id'] not in self.invalid]
+        self.saved.extend(valid)
+        return valid, len(hazards) - len(valid)
+
+    def bump_data_version(self, name='hazards'):
+        return len(self.saved)
+
+    def get_data_version(self, name='hazards'):
+        return len(self.saved)
+
+
+def _service(store):
+    service = IngestionService.__new__(IngestionService)
+    service.bbox = 'unused'
+    service.db = store
+    service.adapters = {'feed': _Feed()}
+    service.watermarks = {'feed': None}
+    service.executor = ThreadPoolExecutor(max_workers=1)
+    service._written = {}
+    service.totals = {'cycles': 0, 'failures': 0, 'fetched': 0, 'written': 0, 'rejected': 0, 'seconds': 0.0}
+    return service
+
+
+def test_failed_write_records_nothing():
+    service = _service(_Store(failures=1))
+    with pytest.raises(sqlite3.OperationalError):
+        service.run_once()
+    assert service.watermarks == {'feed': None}
+    assert service._written == {}
+
+    stats = service.run_once()
+    assert (stats['written'], stats['rejected']) == (1, 1)
+    assert service.watermarks['feed'] == '2026-10-19 08:05:00'
+    # Only the row that was saved is skipped as unchanged next time
+    assert list(service._written) == ['H1']
+
+
+def test_run_forever_survives_a_failed_cycle(monkeypatch):
+    store = _Store(failures=1)
+    service = _service(store)
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            raise KeyboardInterrupt
+
+    # Only the service's own sleeps stop the loop; other threads keep the real time module
+    monkeypatch.setattr(ingestion_service, 'time', SimpleNamespace(perf_counter=time.perf_counter, sleep=sleep))
+    service.run_forever(interval=0)
+    assert service.totals['failures'] == 1
+    assert service.totals['cycles'] == 1
+    assert store.saved == ['H1']
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils import cache_manager
+from utils.cache_manager import MemoryCache
+
+
+def _frame(n=2000):
+    return pd.DataFrame({'id': [f"H{i}" for i in range(n)], 'lat': np.linspace(28.5, 28.7, n)})
+
+
+def test_envelope_is_sized_without_pickling_its_frame(monkeypatch):
+    def refuse(*args, **kwargs):
+        raise AssertionError('sizeof pickled a value')
+
+    monkeypatch.setattr(cache_manager.pickle, 'dumps', refuse)
+    frame = _frame()
+    envelope = {'value': frame, 'delta': 0.2, 'expires_at': 1.0, 'stale_until': 2.0}
+    frame_bytes = int(frame.memory_usage(index=True, deep=True).sum())
+    size = MemoryCache.sizeof(envelope)
+    assert frame_bytes < size < frame_bytes + 2048
+    assert MemoryCache.sizeof([frame, frame]) > 2 * frame_bytes
+
+
+class _Clock:
+    """Stands in for the time module inside utils.cache_manager only"""
+
+    def __init__(self):
+        self.now = 50.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache_manager, 'time', clock)
+    return clock
+
+
+def test_expired_entries_are_purged_in_expiry_order(clock):
+    cache = MemoryCache(max_bytes=1 << 20)
+    for key, ttl in [('c', 30), ('a', 10), ('b', 20)]:
+        cache.set(key, key * 10, ttl=ttl)
+    # Overwriting leaves a stale heap entry that must not expire the new value
+    cache.set('a', 'fresh', ttl=100)
+
+    clock.now += 20
+    assert cache.purge_expired() == 1
+    assert ('a' in cache, 'b' in cache, 'c' in cache) == (True, False, True)
+    clock.now += 10
+    # A write purges too, without anyone reading the expired key
+    cache.set('d', 'dddd', ttl=100)
+    assert 'c' not in cache and len(cache) == 2
+    assert cache.get('a') == 'fresh'
+    assert cache.stats['expirations'] == 2
+
+
+def test_byte_budget_evicts_least_recently_used(clock):
+    value_size = MemoryCache.sizeof('x' * 1000)
+    cache = MemoryCache(max_bytes=3 * value_size)
+    for key in 'abc':
+        cache.set(key, key * 1000)
+    cache.get('a')
+    cache.set('d', 'd' * 1000)
+    assert sorted(cache._entries) == ['a', 'c', 'd']
+    assert cache.stats['evictions'] == 1
+    assert cache.stats['bytes'] == 3 * value_size
+
+    # A value larger than the whole budget is refused, not allowed to flush the cache
+    assert not cache.set('huge', 'h' * 10000)
+    assert len(cache) == 3 and cache.stats['rejected'] == 1
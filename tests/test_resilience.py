@@ -0,0 +1,99 @@
+import threading
+import time
+import pytest
+from utils import resilience
+from utils.resilience import CircuitBreaker, CircuitOpenError, RateLimitedError, SingleFlight, TokenBucket, backoff_delay
+
+
+class _Clock:
+    """Stands in for the time module inside utils.resilience only"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(resilience, 'time', clock)
+    return clock
+
+
+def test_token_bucket_allows_bursts_then_the_rate(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.try_acquire() == 0.0
+
+    # acquire sleeps until the next token, but not past max_wait
+    bucket.acquire(max_wait=1.0)
+    assert clock.now == pytest.approx(101.0)
+    slow = TokenBucket(rate=0.1, capacity=1)
+    slow.try_acquire()
+    with pytest.raises(RateLimitedError):
+        slow.acquire(max_wait=5.0)
+
+
+def test_circuit_opens_then_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 30
+    breaker.before_call()
+    assert breaker.state == 'half_open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    # A failed trial reopens at once; a successful one closes
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert (breaker.state, breaker.failures) == ('closed', 0)
+
+
+def test_single_flight_shares_the_leaders_error():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError('provider down')
+
+    def call():
+        try:
+            flight.do('key', fail)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while not flight.coalesced:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+    assert len(errors) == 2 and errors[0] is errors[1]
+    # The key is free again once the call completes
+    assert flight.do('key', lambda: 'ok') == 'ok'
+
+
+def test_backoff_is_capped_full_jitter():
+    assert all(0 <= backoff_delay(attempt, base=0.5, cap=4) <= min(4, 0.5 * 2 ** attempt) for attempt in range(10))
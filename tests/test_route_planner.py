@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+from components.enhanced_route_planner import EnhancedRoutePlanner
+
+
+def _hazards_along(a, b, n=20):
+    t = np.linspace(0.1, 0.9, n)
+    return pd.DataFrame({
+        'hazard_type': 'Accident', 'severity': 5, 'confidence': 90.0,
+        'lat': a[0] + t * (b[0] - a[0]), 'lon': a[1] + t * (b[1] - a[1]), 'source': 'Traffic API'
+    })
+
+
+def test_fastest_route_is_kept_when_every_detour_is_over_budget():
+    planner = EnhancedRoutePlanner()
+    hazards = _hazards_along((28.6326, 77.2197), (28.5480, 77.2522))
+    for max_detour in (10, 25, 50):
+        routes = planner.find_alternative_routes('Rajiv Chowk', 'Nehru Place', hazards, {'max_detour': max_detour})
+        assert routes and routes[0]['route'] == ['Rajiv Chowk', 'Nehru Place']
+        assert routes[0]['safety_score'] == 0
+        assert 'lowest hazard exposure' not in routes[0]['details']
+
+    route = planner.find_safest_route('Rajiv Chowk', 'Nehru Place', hazards, {'max_detour': 10})
+    assert route['route'] == ['Rajiv Chowk', 'Nehru Place']
+
+
+def test_alternatives_respect_detour_budget():
+    planner = EnhancedRoutePlanner()
+    routes = planner.find_alternative_routes('Connaught Place', 'Hauz Khas', pd.DataFrame(), {'max_detour': 50})
+    fastest_km = routes[0]['distance_km']
+    assert len(routes) > 1
+    assert all(route['distance_km'] <= fastest_km * 1.5 + 1e-9 for route in routes)
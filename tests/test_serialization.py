@@ -0,0 +1,52 @@
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from utils import serialization
+
+
+def _frame(n=5000):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        'id': [f"H{i}" for i in range(n)],
+        'severity': rng.integers(1, 6, n),
+        'lat': rng.uniform(28.5, 28.7, n),
+        'sources': [('Traffic API', 'User Report')] * n
+    })
+    frame.attrs['data_version'] = 3
+    return frame
+
+
+@pytest.fixture
+def bare_install(monkeypatch):
+    """None of the optional codec libraries installed"""
+    for name in ('pa', 'msgpack', 'zstandard', 'lz4_frame'):
+        monkeypatch.setattr(serialization, name, None)
+
+
+@pytest.mark.skipif(serialization.pa is None, reason='pyarrow not installed')
+def test_dataframe_round_trips_through_arrow():
+    frame = _frame()
+    payload = serialization.dumps(frame)
+    assert serialization.codec_name(payload)[0] == 'arrow'
+    restored = serialization.loads(payload)
+    pd.testing.assert_frame_equal(restored, frame)
+    assert restored.attrs == {'data_version': 3}
+
+
+def test_pickled_dataframe_skips_zlib(bare_install):
+    frame = _frame()
+    payload = serialization.dumps(frame)
+    assert serialization.codec_name(payload) == ('pickle', 'none')
+    pd.testing.assert_frame_equal(serialization.loads(payload), frame)
+
+
+def test_other_values_still_use_zlib(bare_install):
+    value = {'ids': [f"H{i}" for i in range(1000)]}
+    payload = serialization.dumps(value)
+    assert serialization.codec_name(payload) == ('pickle', 'zlib')
+    assert serialization.loads(payload) == value
+
+
+def test_untagged_payload_is_a_plain_pickle():
+    assert serialization.loads(pickle.dumps({'a': 1})) == {'a': 1}
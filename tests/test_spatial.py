@@ -0,0 +1,39 @@
+import numpy as np
+from utils.spatial import HazardIndex, project
+
+
+def _brute_force(index, a_lat, a_lon, b_lat, b_lon, radius_m):
+    """Every (segment, hazard) pair by exact point-to-segment distance"""
+    ax, ay = project(a_lat, a_lon, index.ref_lat)
+    bx, by = project(b_lat, b_lon, index.ref_lat)
+    pairs = []
+    for s in range(len(ax)):
+        dx, dy = bx[s] - ax[s], by[s] - ay[s]
+        t = np.clip(((index.x - ax[s]) * dx + (index.y - ay[s]) * dy) / max(dx * dx + dy * dy, 1e-9), 0, 1)
+        distances = np.hypot(index.x - (ax[s] + t * dx), index.y - (ay[s] + t * dy))
+        pairs.extend((s, int(h), distances[h]) for h in np.flatnonzero(distances <= radius_m))
+    return pairs
+
+
+def test_segments_query_matches_brute_force():
+    rng = np.random.default_rng(0)
+    index = HazardIndex(rng.uniform(28.55, 28.65, 5000), rng.uniform(77.15, 77.25, 5000))
+    # Short street segments and a few long ones that get cut into many pieces
+    a_lat, a_lon = rng.uniform(28.56, 28.64, 60), rng.uniform(77.16, 77.24, 60)
+    b_lat = a_lat + np.r_[rng.normal(0, 0.002, 50), rng.normal(0, 0.03, 10)]
+    b_lon = a_lon + np.r_[rng.normal(0, 0.002, 50), rng.normal(0, 0.03, 10)]
+
+    segment_idx, hazard_idx, distances = index.segments_query(a_lat, a_lon, b_lat, b_lon, 150)
+    expected = _brute_force(index, a_lat, a_lon, b_lat, b_lon, 150)
+    assert list(zip(segment_idx.tolist(), hazard_idx.tolist())) == [(s, h) for s, h, _ in expected]
+    np.testing.assert_allclose(distances, [d for _, _, d in expected])
+
+
+def test_within_and_empty_index():
+    index = HazardIndex([28.6000, 28.6010, 28.6100], [77.2000, 77.2000, 77.2000])
+    # 0.001 degrees of latitude is about 111 m
+    assert sorted(index.within(28.6000, 77.2000, 150).tolist()) == [0, 1]
+
+    empty = HazardIndex([], [], ref_lat=28.6)
+    assert empty.within(28.6, 77.2, 1000).size == 0
+    assert all(part.size == 0 for part in empty.segments_query([28.6], [77.2], [28.61], [77.21], 100))
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from components import enhanced_data_ingestion
+from utils.cache_manager import CachedDataIngestion, invalidate_hazards
+from utils.config import Config
+from utils.hazard_store import HazardSnapshot
+from utils.spatial import lonlat_to_tile
+
+
+class _Snapshot:
+    def __init__(self, frame):
+        self.frame = frame
+        self.calls = 0
+
+    def get_hazard_snapshot(self, bbox=None):
+        self.calls += 1
+        return self.frame
+
+
+def _hazards(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': [f"H{i}" for i in range(n)],
+        'hazard_type': 'Potholes',
+        'severity': rng.integers(1, 6, n),
+        'confidence': 80.0,
+        'lat': rng.uniform(28.50, 28.70, n),
+        'lon': rng.uniform(77.10, 77.30, n)
+    })
+
+
+def test_tiles_are_sliced_from_the_shared_snapshot():
+    hazards = _hazards()
+    ingestion = CachedDataIngestion()
+    ingestion._ingestion = source = _Snapshot(hazards)
+    zoom = Config.CACHE_TILE_ZOOM
+    xs, ys = lonlat_to_tile(hazards['lon'], hazards['lat'], zoom)
+
+    for x, y in {(int(x), int(y)) for x, y in zip(xs[:50], ys[:50])}:
+        tile = ingestion._slice_tile(zoom, x, y)
+        expected = hazards[(xs == x) & (ys == y)]
+        assert sorted(tile['id']) == sorted(expected['id'])
+
+    # One grouping per snapshot and zoom, however many tiles are sliced
+    assert ingestion._tiled[zoom][0] is hazards
+    source.frame = _hazards(seed=1)
+    assert ingestion._snapshot_tiles(zoom)[0] is source.frame
+
+
+def test_viewport_is_assembled_from_tiles():
+    hazards = _hazards()
+    ingestion = CachedDataIngestion()
+    ingestion._ingestion = _Snapshot(hazards)
+    bbox = "77.15,28.55,77.25,28.65"
+    result = ingestion.get_cached_hazards(bbox, force_refresh=True)
+    inside = hazards['lon'].between(77.15, 77.25) & hazards['lat'].between(28.55, 28.65)
+    assert sorted(result['id']) == sorted(hazards.loc[inside, 'id'])
+    assert ingestion.tile_stats['tiles'] >= ingestion.tile_stats['tile_fetches'] > 0
+
+
+def test_invalidated_tile_is_rebuilt_from_fresh_data(monkeypatch):
+    hazards = _hazards(n=200)
+    current = {'frame': hazards}
+    snapshot = HazardSnapshot(lambda: current['frame'].copy(), interval_seconds=300)
+    monkeypatch.setitem(enhanced_data_ingestion._hazard_snapshots, 'test-bbox', snapshot)
+
+    class _Shared:
+        def get_hazard_snapshot(self, bbox=None):
+            return snapshot.get()
+
+    ingestion = CachedDataIngestion()
+    ingestion._ingestion = _Shared()
+    lat, lon = 28.6012, 77.2034
+    zoom = Config.CACHE_TILE_ZOOM
+    x, y = (int(v[0]) for v in lonlat_to_tile([lon], [lat], zoom))
+    key = ingestion.tile_key(zoom, x, y)
+    ingestion.cache.invalidate(key)
+    assert 'NEW' not in set(ingestion._get_tile(key, zoom, x, y)['id'])
+
+    # A write lands well inside the snapshot interval
+    current['frame'] = pd.concat([hazards, pd.DataFrame({
+        'id': ['NEW'], 'hazard_type': 'Potholes', 'severity': 3, 'confidence': 80.0, 'lat': lat, 'lon': lon
+    })], ignore_index=True)
+    invalidate_hazards(lat, lon)
+    assert 'NEW' in set(ingestion._get_tile(key, zoom, x, y)['id'])
@@ -0,0 +1,179 @@
+import os
+import struct
+import numpy as np
+from tile_server import synthetic_hazards
+from utils.hazard_filters import HazardFilter
+from utils.hazard_lod import DETAIL_ZOOM, max_points
+from utils.vector_tiles import (BUFFER, CLUSTER_LAYER, EXTENT, HAZARD_LAYER, HazardTileIndex, TileCache,
+                                encode_tile, world_xy)
+
+
+def test_retire_removes_only_stale_generations(tmp_path):
+    cache = TileCache(str(tmp_path))
+    current = cache.generation(2)
+    filtered = cache.generation(2, HazardFilter.from_dict({'min_severity': 4}))
+    stale = cache.generation(1)
+    for generation in (current, filtered, stale, 'deadbeef-7'):
+        cache.put(generation, 0, 0, 0, b'tile')
+    for unrelated in ('hazards', 'deadbeef', 'reports-2'):
+        os.makedirs(tmp_path / unrelated)
+    (tmp_path / 'safetroute.db').write_bytes(b'')
+
+    cache.retire({current, filtered})
+
+    assert sorted(os.listdir(tmp_path)) == sorted([current, filtered, 'hazards', 'deadbeef', 'reports-2',
+                                                   'safetroute.db'])
+    assert cache.get(current, 0, 0, 0) == b'tile'
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        value |= (byte & 0x7F) << shift
+        pos += 1
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _fields(data):
+    """(field number, value) pairs of a protobuf message; length-delimited values as bytes"""
+    pos = 0
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        field, wire = key >> 3, key & 7
+        if wire == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire == 2:
+            length, pos = _read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        elif wire == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"wire type {wire}")
+        yield field, value
+
+
+def _packed(data):
+    pos, out = 0, []
+    while pos < len(data):
+        value, pos = _read_varint(data, pos)
+        out.append(value)
+    return out
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _decode_value(data):
+    (field, value), = _fields(data)
+    if field == 1:
+        return value.decode('utf-8')
+    if field == 3:
+        return struct.unpack('<d', value)[0]
+    if field == 4 or field == 5:
+        return value
+    if field == 6:
+        return _unzigzag(value)
+    if field == 7:
+        return bool(value)
+    raise ValueError(f"value field {field}")
+
+
+def decode_tile(data):
+    """{layer name: [(px, py, properties)]}, written from the MVT 2.1 spec independently of the encoder"""
+    layers = {}
+    for field, layer_bytes in _fields(data):
+        assert field == 3
+        name, keys, values, features, extent, version = None, [], [], [], None, None
+        for layer_field, value in _fields(layer_bytes):
+            if layer_field == 1:
+                name = value.decode('utf-8')
+            elif layer_field == 2:
+                features.append(value)
+            elif layer_field == 3:
+                keys.append(value.decode('utf-8'))
+            elif layer_field == 4:
+                values.append(_decode_value(value))
+            elif layer_field == 5:
+                extent = value
+            elif layer_field == 15:
+                version = value
+        assert (version, extent) == (2, EXTENT)
+        decoded = []
+        for feature in features:
+            parts = dict(_fields(feature))
+            assert parts[3] == 1  # POINT
+            command, dx, dy = _packed(parts[4])
+            assert command == (1 << 3) | 1  # MoveTo, one point
+            tags = _packed(parts.get(2, b''))
+            properties = {keys[k]: values[v] for k, v in zip(tags[::2], tags[1::2])}
+            decoded.append((_unzigzag(dx), _unzigzag(dy), properties))
+        layers[name] = decoded
+    return layers
+
+
+def test_encoded_layer_decodes_to_its_inputs():
+    wx = np.array([0.5, 0.5 + 1e-6, 0.5 - 1e-7])
+    wy = np.array([0.25, 0.25 + 3e-6, 0.25 - 2e-8])
+    z, x, y = 12, 2048, 1024
+    properties = [
+        ('name', np.array(['a', 'ü', 'a'], dtype=object)),
+        ('count', np.array([1, 300, -5])),
+        ('score', np.array([0.5, 1.25, -3.0])),
+        ('flag', np.array([True, False, True])),
+        ('big', np.array([2 ** 40, 0, 2 ** 40]))
+    ]
+    layers = decode_tile(encode_tile([('points', wx, wy, properties), ('empty', wx[:0], wy[:0], [])], z, x, y))
+
+    assert list(layers) == ['points']
+    n = 2 ** z
+    for i, (px, py, props) in enumerate(layers['points']):
+        assert px == round((wx[i] * n - x) * EXTENT)
+        assert py == round((wy[i] * n - y) * EXTENT)
+        assert props == {name: column[i].item() if hasattr(column[i], 'item') else column[i]
+                         for name, column in properties}
+
+
+def test_hazard_tiles_select_exactly_the_buffered_tile():
+    hazards = synthetic_hazards(20000, (77.0, 28.4, 77.4, 28.8), hotspots=8)
+    index = HazardTileIndex(hazards)
+    wx, wy = world_xy(hazards['lon'].to_numpy(), hazards['lat'].to_numpy())
+    margin = BUFFER / EXTENT
+    ids = hazards['id'].to_numpy()
+    rng = np.random.default_rng(0)
+
+    for z in range(DETAIL_ZOOM, 19):
+        n = 2 ** z
+        for pick in rng.integers(0, len(hazards), 10):
+            x, y = int(wx[pick] * n), int(wy[pick] * n)
+            lx, ly = wx * n - x, wy * n - y
+            expected = set(ids[(lx >= -margin) & (lx <= 1 + margin) & (ly >= -margin) & (ly <= 1 + margin)])
+            features = decode_tile(index.tile(z, x, y)).get(HAZARD_LAYER, [])
+            got = {props['id'] for _, _, props in features}
+            if len(expected) <= max_points(z):
+                assert got == expected
+            else:
+                # Capped: the most severe hazards are kept
+                assert len(got) == max_points(z) and got < expected
+                kept = hazards.set_index('id').loc[sorted(got), 'severity']
+                dropped = hazards.set_index('id').loc[sorted(expected - got), 'severity']
+                assert kept.min() >= dropped.max()
+
+
+def test_cluster_tiles_account_for_every_hazard():
+    hazards = synthetic_hazards(20000, (77.0, 28.4, 77.4, 28.8), hotspots=8)
+    index = HazardTileIndex(hazards)
+    for z in (4, 6):
+        # The whole bbox lies in one tile at these zooms
+        wx, wy = world_xy([77.0, 77.4], [28.4, 28.8])
+        xs, ys = set((wx * 2 ** z).astype(int).tolist()), set((wy * 2 ** z).astype(int).tolist())
+        assert len(xs) == len(ys) == 1
+        x, y = xs.pop(), ys.pop()
+        clusters = decode_tile(index.tile(z, x, y))[CLUSTER_LAYER]
+        assert sum(props['count'] for _, _, props in clusters) == len(hazards)
+        assert max(props['max_severity'] for _, _, props in clusters) == hazards['severity'].max()
@@ -0,0 +1,161 @@
+import argparse
+import re
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+from utils.config import Config
+from utils.hazard_filters import HazardFilter
+from utils.hazard_schema import HAZARD_SOURCES, HAZARD_TYPE_DTYPE, HAZARD_TYPES, SOURCE_DTYPE
+from utils.vector_tiles import HazardTileIndex, HazardTileService
+
+TILE_PATH = re.compile(r'^/tiles/(\d+)/(\d+)/(\d+)\.(?:pbf|mvt)$')
+
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+    """GET /tiles/{z}/{x}/{y}.pbf -> Mapbox Vector Tile of the current hazard snapshot.
+
+    Query parameters written by HazardFilter.to_query restrict the tile to
+    matching hazards; a malformed query is a 400.
+
+    Tiles are served with an ETag naming the snapshot generation and
+    `no-cache`, so browsers revalidate and get a bodiless 304 until the
+    hazards change. CORS is open because the map runs in the Streamlit
+    component iframe, on another origin.
+    """
+
+    service = None
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        match = TILE_PATH.match(path)
+        if match is None:
+            self._send(404, b'', 'text/plain')
+            return
+        z, x, y = (int(v) for v in match.groups())
+        try:
+            hazard_filter = HazardFilter.from_query(query)
+        except ValueError as e:
+            self._send(400, str(e).encode('utf-8'), 'text/plain')
+            return
+        try:
+            generation, data = self.service.tile(z, x, y, hazard_filter)
+        except ValueError as e:
+            self._send(404, str(e).encode('utf-8'), 'text/plain')
+            return
+
+        etag = f'"{generation}"'
+        if self.headers.get('If-None-Match') == etag:
+            self._send(304, b'', None, etag)
+        else:
+            self._send(200, data, 'application/vnd.mapbox-vector-tile', etag)
+
+    def _send(self, status, body, content_type, etag=None):
+        self.send_response(status)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Cache-Control', 'no-cache')
+        if etag:
+            self.send_header('ETag', etag)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host, port, cache_dir, bbox):
+    from components.enhanced_data_ingestion import EnhancedDataIngestion
+
+    ingestion = EnhancedDataIngestion()
+    TileRequestHandler.service = HazardTileService(lambda: ingestion.get_hazard_snapshot(bbox), cache_dir)
+    server = ThreadingHTTPServer((host, port), TileRequestHandler)
+    server.daemon_threads = True
+    print(f"[INFO] Hazard tiles at http://{host}:{port}/tiles/{{z}}/{{x}}/{{y}}.pbf (cache: {cache_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        stats = TileRequestHandler.service.stats
+        print(
+            f"\n[INFO] Stopped: {stats['generated']} tiles generated in {stats['generate_seconds']:.2f}s, "
+            f"{stats['disk_hits']} served from disk"
+        )
+    finally:
+        server.server_close()
+
+
+def synthetic_hazards(n, bbox, hotspots, seed=0):
+    """n hazards in the canonical schema, clustered around `hotspots` random centres in a bbox"""
+    rng = np.random.default_rng(seed)
+    west, south, east, north = bbox
+    centres = np.column_stack([rng.uniform(west, east, hotspots), rng.uniform(south, north, hotspots)])
+    spread = min(east - west, north - south) / (4 * np.sqrt(hotspots))
+    picks = rng.integers(0, hotspots, n)
+    return pd.DataFrame({
+        'id': np.char.add('bench-', np.arange(n).astype(str)).astype(object),
+        'hazard_type': pd.Categorical.from_codes(rng.integers(0, len(HAZARD_TYPES), n), dtype=HAZARD_TYPE_DTYPE),
+        'severity': rng.integers(1, 6, n).astype(np.int8),
+        'confidence': rng.uniform(40, 100, n).astype(np.float32),
+        'lat': np.clip(centres[picks, 1] + rng.normal(0, spread, n), south, north).astype(np.float32),
+        'lon': np.clip(centres[picks, 0] + rng.normal(0, spread, n), west, east).astype(np.float32),
+        'location': 'Benchmark',
+        'description': 'Synthetic hazard',
+        'source': pd.Categorical.from_codes(rng.integers(0, len(HAZARD_SOURCES), n), dtype=SOURCE_DTYPE),
+        'verified': rng.random(n) < 0.3,
+        'timestamp': pd.Timestamp.now().floor('min') - pd.to_timedelta(rng.integers(0, 1440, n), unit='m')
+    })
+
+
+def benchmark(samples=200):
+    """Time tile generation at city and country scale, on tiles under actual hazards"""
+    from utils.spatial import lonlat_to_tile
+
+    scenarios = [
+        ('city', 100000, (76.84, 28.40, 77.35, 28.88), 40, range(10, 18)),
+        ('country', 1000000, (68.1, 8.0, 97.4, 35.5), 400, range(4, 16, 2))
+    ]
+    rng = np.random.default_rng(1)
+    for name, n, bbox, hotspots, zooms in scenarios:
+        hazards = synthetic_hazards(n, bbox, hotspots)
+        started = time.perf_counter()
+        index = HazardTileIndex(hazards)
+        print(f"[INFO] {name}: {n} hazards, index built in {time.perf_counter() - started:.2f}s")
+        for zoom in zooms:
+            picks = rng.integers(0, n, samples)
+            x, y = lonlat_to_tile(hazards['lon'].to_numpy()[picks], hazards['lat'].to_numpy()[picks], zoom)
+            timings, sizes = [], []
+            for tx, ty in set(zip(x.tolist(), y.tolist())):
+                started = time.perf_counter()
+                data = index.tile(zoom, tx, ty)
+                timings.append((time.perf_counter() - started) * 1000)
+                sizes.append(len(data))
+            timings = np.array(timings)
+            print(f"       z{zoom:<2} {len(timings):4d} tiles: mean {timings.mean():6.2f} ms, "
+                  f"p95 {np.percentile(timings, 95):6.2f} ms, max {timings.max():6.2f} ms, "
+                  f"mean size {np.mean(sizes) / 1024:6.1f} KB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SafeRoute.AI hazard vector tile server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=Config.TILE_SERVER_PORT)
+    parser.add_argument('--cache-dir', default=Config.TILE_CACHE_DIR, help="directory for cached tiles")
+    parser.add_argument('--bbox', default="77.2090,28.6139,77.2290,28.6339",
+                        help="bounding box of the hazard snapshot served (minLon,minLat,maxLon,maxLat)")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="time tile generation on synthetic city- and country-scale data and exit")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark()
+        return 0
+    serve(args.host, args.port, args.cache_dir, args.bbox)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
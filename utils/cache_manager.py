@@ -1,82 +1,595 @@
-﻿import redis
-import pickle
-import json
-from datetime import datetime, timedelta
-import streamlit as st
+﻿import pickle
+import heapq
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from utils import serialization
+from utils.config import Config
+from utils.invalidation import get_invalidation_bus
+from utils.redis_pool import REDIS_ERRORS, get_redis
+from utils.spatial import lonlat_to_tile, parse_bbox, tiles_for_bbox
+
+class MemoryCache:
+    """Thread-safe in-process LRU cache bounded by approximate size in bytes.
+
+    Entries carry a TTL; a heap ordered by expiry time lets every write
+    (and `purge_expired`) drop expired entries proactively instead of
+    waiting for someone to read that exact key. When the byte budget is
+    exceeded the least recently used entries are evicted.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, default_ttl=600):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._expiry_heap = []
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'rejected': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        # A peek: no LRU touch and no hit/miss accounting
+        entry = self._entries.get(key)
+        return entry is not None and entry[2] > time.monotonic()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+            if entry[2] <= now:
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """Store a value for `ttl` seconds; returns False if it alone exceeds the byte budget"""
+        size = self.sizeof(value)
+        now = time.monotonic()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                self._stats['rejected'] += 1
+                return False
+
+            self._purge_expired(now)
+            while self._bytes + size > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            return self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._expiry_heap.clear()
+            self._bytes = 0
+
+    def purge_expired(self):
+        """Drop every expired entry now; returns the number removed"""
+        with self._lock:
+            return self._purge_expired(time.monotonic())
+
+    @property
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                hit_rate=self._stats['hits'] / lookups if lookups else 0.0
+            )
+
+    def _purge_expired(self, now):
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry_heap)
+            entry = self._entries.get(key)
+            # Heap entries of keys since overwritten or deleted are stale
+            if entry is not None and entry[2] == expires_at:
+                self._remove(key)
+                removed += 1
+        self._stats['expirations'] += removed
+        # Stale heap entries pile up under heavy overwrites; rebuild when they dominate
+        if len(self._expiry_heap) > 2 * len(self._entries) + 64:
+            self._expiry_heap = [(entry[2], key) for key, entry in self._entries.items()]
+            heapq.heapify(self._expiry_heap)
+        return removed
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[1]
+        return True
+
+    @staticmethod
+    def sizeof(value):
+        """Approximate memory footprint of a cached value in bytes"""
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=True).sum())
+        if isinstance(value, pd.Series):
+            return int(value.memory_usage(index=True, deep=True))
+        if isinstance(value, np.ndarray):
+            return int(value.nbytes)
+        if isinstance(value, (bytes, bytearray, str, int, float, bool, type(None))):
+            return sys.getsizeof(value)
+        # Envelopes and other containers are measured item by item, so a
+        # DataFrame inside one is never pickled just to be sized
+        if isinstance(value, dict):
+            return sys.getsizeof(value) + sum(
+                MemoryCache.sizeof(k) + MemoryCache.sizeof(v) for k, v in value.items()
+            )
+        if isinstance(value, (list, tuple)):
+            return sys.getsizeof(value) + sum(MemoryCache.sizeof(item) for item in value)
+        try:
+            return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            return sys.getsizeof(value)
+
+
+_memory_cache = None
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-refresh')
+_tile_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='cache-tiles')
+_key_locks = [threading.Lock() for _ in range(64)]
+_refreshing = set()
+_invalidated_at = {}  # key -> time of the last invalidation event seen for it
+_module_lock = threading.Lock()
+
+
+def _get_memory_cache():
+    """Process-wide L1 tier shared by every CacheManager"""
+    global _memory_cache
+    with _module_lock:
+        if _memory_cache is None:
+            _memory_cache = MemoryCache(max_bytes=Config.CACHE_MEMORY_MAX_MB * 1024 * 1024)
+            get_invalidation_bus().subscribe(_drop_invalidated)
+        return _memory_cache
+
+
+def _drop_invalidated(keys):
+    """Invalidation bus subscriber: drop our L1 copies of the given keys"""
+    now = time.time()
+    with _module_lock:
+        memory_cache = _memory_cache
+        for key in keys:
+            _invalidated_at[key] = now
+        if len(_invalidated_at) > 4096:
+            # Only computes still in flight need the timestamps
+            for key in [k for k, at in _invalidated_at.items() if at < now - 300]:
+                del _invalidated_at[key]
+    if memory_cache is not None:
+        for key in keys:
+            memory_cache.delete(key)
+
+
+def _loads(payload):
+    """Decode a Redis payload; an undecodable one (corrupt, or from an incompatible version) is a miss"""
+    try:
+        return serialization.loads(payload)
+    except Exception:
+        return None
+
+
+def hazard_tile_keys(lat, lon):
+    """Cache keys of every tile, at every cached zoom, containing the given points"""
+    keys = set()
+    for zoom in range(Config.CACHE_TILE_ZOOM + 1):
+        xs, ys = lonlat_to_tile(lon, lat, zoom)
+        keys.update(CachedDataIngestion.tile_key(zoom, x, y) for x, y in zip(xs.tolist(), ys.tolist()))
+    return keys
+
+
+def invalidate_hazards(lat, lon):
+    """Publish an invalidation for the hazard tiles covering changed hazards"""
+    lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+    lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+    known = ~(np.isnan(lat) | np.isnan(lon))
+    if not known.any():
+        return 0
+    return get_invalidation_bus().publish(hazard_tile_keys(lat[known], lon[known]))
+
 
 class CacheManager:
+    # Compare-and-delete, so a lock is only released by the holder that set it
+    _UNLOCK_SCRIPT = """
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            return redis.call('del', KEYS[1])
+        end
+        return 0
+    """
+
     def __init__(self):
-        try:
-            self.redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=False)
-            self.redis_client.ping()
-            self.redis_available = True
-        except:
-            self.redis_available = False
-            self.memory_cache = {}
+        # L1: bounded in-process tier, also the fallback when Redis is down
+        self.memory_cache = _get_memory_cache()
+        self.stats = {'l1_hits': 0, 'l2_hits': 0, 'computes': 0, 'early_refreshes': 0,
+                      'stale_served': 0, 'lock_waits': 0}
+        # L2: shared pool; construction never blocks, a background check tracks availability
+        self._redis = get_redis()
+    
+    @property
+    def redis_client(self):
+        """Pooled Redis client, or None while Redis is unreachable"""
+        return self._redis.client
+    
+    @property
+    def redis_available(self):
+        return self._redis.available
     
     def set(self, key, value, expire_minutes=10):
         """Cache data with expiration"""
-        if self.redis_available:
-            try:
-                self.redis_client.setex(
-                    key, 
-                    timedelta(minutes=expire_minutes), 
-                    pickle.dumps(value)
-                )
-            except:
-                self.memory_cache[key] = {
-                    'value': value,
-                    'expiry': datetime.now() + timedelta(minutes=expire_minutes)
-                }
-        else:
-            self.memory_cache[key] = {
-                'value': value,
-                'expiry': datetime.now() + timedelta(minutes=expire_minutes)
-            }
+        self.set_many({key: value}, expire_minutes)
     
     def get(self, key):
         """Retrieve cached data"""
-        if self.redis_available:
+        return self.get_many([key]).get(key)
+    
+    def set_many(self, items, expire_minutes=10):
+        """Cache several values in one pipelined round trip"""
+        client = self.redis_client
+        if client is not None:
+            payloads = {key: serialization.dumps(value) for key, value in items.items()}
             try:
-                cached = self.redis_client.get(key)
-                return pickle.loads(cached) if cached else None
-            except:
-                return self._get_from_memory(key)
-        else:
-            return self._get_from_memory(key)
+                pipe = client.pipeline(transaction=False)
+                for key, payload in payloads.items():
+                    pipe.setex(key, timedelta(minutes=expire_minutes), payload)
+                pipe.execute()
+                return
+            except REDIS_ERRORS as e:
+                self._redis.record_error(e)
+        for key, value in items.items():
+            self.memory_cache.set(key, value, ttl=expire_minutes * 60)
+    
+    def get_many(self, keys):
+        """Cached values for the keys found, fetched with a single MGET"""
+        keys = list(keys)
+        client = self.redis_client
+        if client is not None:
+            try:
+                payloads = client.mget(keys)
+            except REDIS_ERRORS as e:
+                self._redis.record_error(e)
+            else:
+                found = {key: _loads(cached) for key, cached in zip(keys, payloads) if cached}
+                return {key: value for key, value in found.items() if value is not None}
+        found = {}
+        for key in keys:
+            value = self._get_from_memory(key)
+            if value is not None:
+                found[key] = value
+        return found
     
     def _get_from_memory(self, key):
-        """Get from in-memory cache with expiry check"""
-        if key in self.memory_cache:
-            cache_entry = self.memory_cache[key]
-            if datetime.now() < cache_entry['expiry']:
-                return cache_entry['value']
+        """Get from the bounded in-memory tier"""
+        return self.memory_cache.get(key)
+    
+    def get_stats(self):
+        """Read-through counters plus the in-memory tier's hit, miss, eviction and size statistics"""
+        return dict(self.stats, memory=self.memory_cache.stats)
+    
+    def get_or_compute(self, key, compute, ttl_seconds=300, stale_seconds=None, beta=1.0):
+        """Read-through lookup: L1 memory, then Redis, then `compute()`.
+        
+        Each value is fresh for `ttl_seconds` and may then be served stale
+        for `stale_seconds` more (default: another ttl) while a single
+        background refresh replaces it. Shortly before expiry a caller may
+        also start that refresh early, with a probability that grows as
+        expiry nears and with how long the value took to compute (XFetch),
+        so hot keys rarely expire at all. On a cold miss only one caller
+        per process (and, with Redis, per cluster) computes; the rest wait
+        for its result.
+        """
+        stale_seconds = ttl_seconds if stale_seconds is None else stale_seconds
+        envelope = self._read_envelope(key)
+        now = time.time()
+        
+        if envelope is not None:
+            expires_at = envelope['expires_at']
+            early = envelope['delta'] * beta * -math.log(1.0 - random.random())
+            if now + early < expires_at:
+                return envelope['value']
+            if now < expires_at:
+                self.stats['early_refreshes'] += 1
             else:
-                del self.memory_cache[key]
+                self.stats['stale_served'] += 1
+            self._refresh_in_background(key, compute, ttl_seconds, stale_seconds)
+            return envelope['value']
+        
+        lock = _key_locks[hash(key) % len(_key_locks)]
+        with lock:
+            # Another caller may have filled the key while we waited
+            envelope = self._read_envelope(key)
+            if envelope is not None:
+                self.stats['lock_waits'] += 1
+                return envelope['value']
+            
+            token = self._acquire_redis_lock(key, ttl_seconds)
+            if token is None:
+                # Another process is computing: wait for its result, then compute anyway
+                envelope = self._wait_for_value(key, timeout=min(ttl_seconds, 10))
+                if envelope is not None:
+                    self.stats['lock_waits'] += 1
+                    return envelope['value']
+            try:
+                return self._compute_and_store(key, compute, ttl_seconds, stale_seconds)['value']
+            finally:
+                self._release_redis_lock(key, token)
+    
+    def invalidate(self, key):
+        """Drop a key from both tiers"""
+        self.memory_cache.delete(key)
+        client = self.redis_client
+        if client is not None:
+            try:
+                client.delete(key)
+            except REDIS_ERRORS as e:
+                self._redis.record_error(e)
+    
+    def prefetch(self, keys):
+        """Promote read-through entries missing from L1 with one MGET, ahead of get_or_compute"""
+        client = self.redis_client
+        missing = [key for key in keys if key not in self.memory_cache]
+        if client is None or not missing:
+            return 0
+        try:
+            payloads = client.mget(missing)
+        except REDIS_ERRORS as e:
+            self._redis.record_error(e)
+            return 0
+        promoted = 0
+        for key, cached in zip(missing, payloads):
+            if cached and self._promote(key, cached) is not None:
+                promoted += 1
+        return promoted
+    
+    def _read_envelope(self, key):
+        envelope = self.memory_cache.get(key)
+        if envelope is not None:
+            self.stats['l1_hits'] += 1
+            return envelope
+        client = self.redis_client
+        if client is None:
+            return None
+        try:
+            cached = client.get(key)
+        except REDIS_ERRORS as e:
+            self._redis.record_error(e)
+            return None
+        if not cached:
+            return None
+        return self._promote(key, cached)
+    
+    def _promote(self, key, cached):
+        envelope = _loads(cached)
+        if not isinstance(envelope, dict) or 'expires_at' not in envelope:
+            return None
+        # The value is encoded separately so DataFrames get their columnar codec
+        envelope['value'] = _loads(envelope['value'])
+        if envelope['value'] is None:
+            return None
+        self.stats['l2_hits'] += 1
+        # Promote to L1 for the rest of its stale window
+        self.memory_cache.set(key, envelope, ttl=max(envelope['stale_until'] - time.time(), 0))
+        return envelope
+    
+    def _compute_and_store(self, key, compute, ttl_seconds, stale_seconds):
+        started = time.time()
+        value = compute()
+        finished = time.time()
+        self.stats['computes'] += 1
+        if _invalidated_at.get(key, 0) >= started:
+            # The data changed while we computed; hand the value out but don't cache it
+            return {'value': value, 'delta': finished - started,
+                    'expires_at': finished, 'stale_until': finished}
+        envelope = {
+            'value': value,
+            'delta': finished - started,
+            'expires_at': finished + ttl_seconds,
+            'stale_until': finished + ttl_seconds + stale_seconds
+        }
+        lifetime = ttl_seconds + stale_seconds
+        self.memory_cache.set(key, envelope, ttl=lifetime)
+        client = self.redis_client
+        if client is not None:
+            payload = serialization.dumps(dict(envelope, value=serialization.dumps(envelope['value'])))
+            try:
+                client.setex(key, timedelta(seconds=lifetime), payload)
+            except REDIS_ERRORS as e:
+                self._redis.record_error(e)
+        return envelope
+    
+    def _refresh_in_background(self, key, compute, ttl_seconds, stale_seconds):
+        with _module_lock:
+            if key in _refreshing:
+                return
+            _refreshing.add(key)
+        
+        def refresh():
+            token = self._acquire_redis_lock(key, ttl_seconds)
+            try:
+                # With Redis, a refresh already running in another process wins
+                if token is not None or not self.redis_available:
+                    self._compute_and_store(key, compute, ttl_seconds, stale_seconds)
+            finally:
+                self._release_redis_lock(key, token)
+                with _module_lock:
+                    _refreshing.discard(key)
+        
+        _refresh_executor.submit(refresh)
+    
+    def _acquire_redis_lock(self, key, ttl_seconds):
+        """Token for a cluster-wide compute lock, or None if another process holds it.
+        
+        Without Redis there is nothing to coordinate with and a local token is returned.
+        """
+        token = uuid.uuid4().hex
+        client = self.redis_client
+        if client is None:
+            return token
+        try:
+            acquired = client.set(f"lock:{key}", token, nx=True, px=int(min(ttl_seconds, 30) * 1000))
+        except REDIS_ERRORS as e:
+            self._redis.record_error(e)
+            return token
+        return token if acquired else None
+    
+    def _release_redis_lock(self, key, token):
+        client = self.redis_client
+        if token is None or client is None:
+            return
+        try:
+            client.eval(self._UNLOCK_SCRIPT, 1, f"lock:{key}", token)
+        except REDIS_ERRORS as e:
+            self._redis.record_error(e)
+    
+    def _wait_for_value(self, key, timeout):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            envelope = self._read_envelope(key)
+            if envelope is not None:
+                return envelope
+            time.sleep(0.05)
         return None
 
 class CachedDataIngestion:
+    """Hazard lookups cached per map tile.
+
+    A bbox is snapped to the z/x/y tiles covering it at Config.CACHE_TILE_ZOOM;
+    each tile's hazards are cached under their own key, so viewports that
+    overlap (or differ by a pixel) are assembled from the same entries and
+    only tiles nobody has asked for yet are fetched. Missing tiles are
+    sliced from the shared hazard snapshot, which is grouped by tile once
+    per snapshot and zoom.
+    """
+
     def __init__(self):
         self.cache = CacheManager()
         from utils.database import DatabaseManager
         self.db = DatabaseManager()
+        self._ingestion = None
+        self._tiled = OrderedDict()  # zoom -> (snapshot, sorted tile codes, row order)
+        self._lock = threading.Lock()
+        self.tile_stats = {'requests': 0, 'tiles': 0, 'tile_fetches': 0}
     
     def get_cached_hazards(self, bbox, force_refresh=False):
-        """Get hazards with caching"""
-        cache_key = f"hazards_{bbox}"
+        """Get hazards inside a bbox, assembled from per-tile cache entries"""
+        zoom, tiles = tiles_for_bbox(bbox, Config.CACHE_TILE_ZOOM, Config.CACHE_MAX_TILES)
+        keys = [self.tile_key(zoom, x, y) for x, y in tiles]
+        if force_refresh:
+            for key in keys:
+                self.cache.invalidate(key)
+        else:
+            # One MGET for every tile not already in memory
+            self.cache.prefetch(keys)
         
-        if not force_refresh:
-            cached = self.cache.get(cache_key)
-            if cached is not None:
-                st.sidebar.info("Using cached data")
-                return cached
+        # Cached tiles return immediately; missing ones are fetched concurrently,
+        # each behind get_or_compute's per-key stampede protection
+        futures = [
+            _tile_executor.submit(self._get_tile, key, zoom, x, y)
+            for key, (x, y) in zip(keys, tiles)
+        ]
+        frames = [future.result() for future in futures]
+        self._count(requests=1, tiles=len(tiles))
         
-        # Fetch fresh data
-        from components.enhanced_data_ingestion import EnhancedDataIngestion
-        data_ingestion = EnhancedDataIngestion()
-        hazards = data_ingestion.get_real_time_hazards(bbox)
+        hazards = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if hazards.empty:
+            return hazards
+        west, south, east, north = parse_bbox(bbox)
+        inside = hazards['lon'].between(west, east) & hazards['lat'].between(south, north)
+        return hazards[inside].reset_index(drop=True)
+    
+    def tile_hit_rate(self):
+        """Share of tiles served from cache rather than fetched"""
+        with self._lock:
+            if not self.tile_stats['tiles']:
+                return 0.0
+            return 1.0 - self.tile_stats['tile_fetches'] / self.tile_stats['tiles']
+    
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.tile_stats[name] += value
+    
+    @staticmethod
+    def tile_key(zoom, x, y):
+        return f"hazards:tile:{zoom}/{x}/{y}"
+    
+    def _get_tile(self, key, zoom, x, y):
+        def fetch():
+            self._count(tile_fetches=1)
+            return self._slice_tile(zoom, x, y, fresh_after=_invalidated_at.get(key, 0))
         
-        # Cache for 5 minutes
-        self.cache.set(cache_key, hazards, expire_minutes=5)
+        # Hazard writes invalidate their tiles, so the TTL only bounds feed staleness;
+        # past it a tile is served stale for up to 5 minutes while one refresh runs
+        return self.cache.get_or_compute(key, fetch, ttl_seconds=Config.HAZARD_CACHE_TTL, stale_seconds=300)
+    
+    def _snapshot_tiles(self, zoom, fresh_after=0):
+        """(snapshot, sorted tile codes, row order) grouping the current snapshot by tile at `zoom`.
+        
+        A snapshot read before `fresh_after` (the tile's last invalidation)
+        predates the write that invalidated it, so it is reloaded first
+        rather than cached again under the tile's TTL.
+        """
+        from components.enhanced_data_ingestion import EnhancedDataIngestion, expire_hazard_snapshots
+        with self._lock:
+            if self._ingestion is None:
+                self._ingestion = EnhancedDataIngestion()
+            ingestion = self._ingestion
+        snapshot = ingestion.get_hazard_snapshot()
+        if snapshot.attrs.get('loaded_at', fresh_after) < fresh_after:
+            expire_hazard_snapshots()
+            snapshot = ingestion.get_hazard_snapshot()
+        with self._lock:
+            tiled = self._tiled.get(zoom)
+            if tiled is not None and tiled[0] is snapshot:
+                return tiled
         
-        return hazards
+        # Assigned like hazard_tile_keys, so invalidations hit the tile a hazard is cached in
+        if snapshot.empty:
+            tiled = (snapshot, np.array([], dtype=np.int64), np.array([], dtype=np.intp))
+        else:
+            rows = np.flatnonzero((snapshot['lat'].notna() & snapshot['lon'].notna()).to_numpy())
+            xs, ys = lonlat_to_tile(snapshot['lon'].to_numpy()[rows], snapshot['lat'].to_numpy()[rows], zoom)
+            codes = xs * (2 ** zoom) + ys
+            order = np.argsort(codes, kind='stable')
+            tiled = (snapshot, codes[order], rows[order])
+        with self._lock:
+            self._tiled[zoom] = tiled
+            while len(self._tiled) > Config.CACHE_TILE_ZOOM + 1:
+                self._tiled.popitem(last=False)
+        return tiled
+    
+    def _slice_tile(self, zoom, x, y, fresh_after=0):
+        """Hazards of the shared snapshot inside tile z/x/y"""
+        snapshot, codes, rows = self._snapshot_tiles(zoom, fresh_after)
+        code = x * (2 ** zoom) + y
+        lo, hi = np.searchsorted(codes, [code, code + 1])
+        return snapshot.iloc[rows[lo:hi]].reset_index(drop=True)
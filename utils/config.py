@@ -12,14 +12,45 @@ class Config:
     GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY', '')
     
     # API Endpoints
-    MAPBOX_BASE_URL = "https://api.mapbox.com"
+    MAPBOX_BASE_URL = os.getenv('MAPBOX_BASE_URL', "https://api.mapbox.com")
     OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5"
     
     # App Settings
     DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
     CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', '300'))
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_MEMORY_MAX_MB = int(os.getenv('CACHE_MEMORY_MAX_MB', '64'))
+    # Hazard lookups are cached per z/x/y tile so overlapping viewports share entries
+    CACHE_TILE_ZOOM = int(os.getenv('CACHE_TILE_ZOOM', '14'))
+    CACHE_MAX_TILES = int(os.getenv('CACHE_MAX_TILES', '16'))
+    # Writes publish invalidations, so cached hazard tiles can live this long (seconds)
+    HAZARD_CACHE_TTL = int(os.getenv('HAZARD_CACHE_TTL', '1800'))
     HAZARD_UPDATE_INTERVAL = int(os.getenv('HAZARD_UPDATE_INTERVAL', '300'))
     
+    # Ingestion: 'inline' polls feeds from the UI, 'service' reads what
+    # ingestion_service.py has written and polls its version counter
+    INGESTION_MODE = os.getenv('INGESTION_MODE', 'inline').lower()
+    INGESTION_INTERVAL = int(os.getenv('INGESTION_INTERVAL', '60'))
+    VERSION_POLL_INTERVAL = int(os.getenv('VERSION_POLL_INTERVAL', '5'))
+    
+    # Hazard vector tiles (tile_server.py); when TILE_SERVER_URL is set the
+    # live map streams hazards from it instead of embedding them
+    TILE_SERVER_URL = os.getenv('TILE_SERVER_URL', '')
+    TILE_SERVER_PORT = int(os.getenv('TILE_SERVER_PORT', '8600'))
+    TILE_CACHE_DIR = os.getenv('TILE_CACHE_DIR', 'data/tiles')
+    
+    # Offline map data
+    OSM_EXTRACT_PATH = os.getenv('OSM_EXTRACT_PATH', 'data/delhi.osm')
+    # Cities and states the extract covers, comma-separated, for qualified lookups ("Janpath, New Delhi")
+    OSM_EXTRACT_REGIONS = [region.strip() for region in
+                           os.getenv('OSM_EXTRACT_REGIONS', 'New Delhi,Delhi,NCT of Delhi,India').split(',')]
+    
+    # Geocoding cache (TTLs in seconds)
+    GEOCODE_CACHE_PATH = os.getenv('GEOCODE_CACHE_PATH', 'data/geocode_cache.db')
+    GEOCODE_CACHE_TTL = int(os.getenv('GEOCODE_CACHE_TTL', str(30 * 86400)))
+    GEOCODE_NEGATIVE_TTL = int(os.getenv('GEOCODE_NEGATIVE_TTL', '86400'))
+    GEOCODE_WARMUP_CSV = os.getenv('GEOCODE_WARMUP_CSV', 'data/known_addresses.csv')
+    
     # Model Paths
     YOLO_MODEL_PATH = os.getenv('YOLO_MODEL_PATH', 'models/yolov8_road_hazards.pt')
     
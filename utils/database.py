@@ -3,6 +3,7 @@ import pandas as pd
 import json
 from datetime import datetime
 import streamlit as st
+from utils.cache_manager import invalidate_hazards
 from utils.error_handling import DataValidator
 
 class DatabaseManager:
@@ -35,6 +36,9 @@ class DatabaseManager:
             )
         ''')
         
+        # Incremental readers poll hazards by insertion time
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_hazards_created_at ON hazards(created_at)')
+        
         # Users table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -89,6 +93,15 @@ class DatabaseManager:
             )
         ''')
         
+        # Data version counters published by the ingestion service
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS data_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
         conn.commit()
         conn.close()
     
@@ -100,28 +113,11 @@ class DatabaseManager:
         cursor = conn.cursor()
         
         try:
-            cursor.execute('''
-                INSERT OR REPLACE INTO hazards 
-                (id, hazard_type, severity, confidence, lat, lon, location, description, source, verified, timestamp, image_path, reporter_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                hazard_data['id'],
-                hazard_data['hazard_type'],
-                hazard_data['severity'],
-                hazard_data.get('confidence', 50),
-                hazard_data['lat'],
-                hazard_data['lon'],
-                hazard_data.get('location', ''),
-                hazard_data.get('description', ''),
-                hazard_data.get('source', 'Community'),
-                hazard_data.get('verified', False),
-                hazard_data.get('timestamp', datetime.now().isoformat()),
-                hazard_data.get('image_path', ''),
-                hazard_data.get('reporter_id', '')
-            ))
+            cursor.execute(self._HAZARD_UPSERT, self._hazard_row(hazard_data))
             
             conn.commit()
             self._log_event('INFO', f"Hazard {hazard_data['id']} saved", 'database')
+            invalidate_hazards(hazard_data['lat'], hazard_data['lon'])
             
         except sqlite3.IntegrityError as e:
             self._log_event('ERROR', f"Database integrity error: {e}", 'database')
@@ -132,6 +128,82 @@ class DatabaseManager:
         finally:
             conn.close()
     
+    _HAZARD_UPSERT = '''
+        INSERT OR REPLACE INTO hazards 
+        (id, hazard_type, severity, confidence, lat, lon, location, description, source, verified, timestamp, image_path, reporter_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    
+    @staticmethod
+    def _hazard_row(hazard_data):
+        return (
+            hazard_data['id'],
+            hazard_data['hazard_type'],
+            hazard_data['severity'],
+            hazard_data.get('confidence', 50),
+            hazard_data['lat'],
+            hazard_data['lon'],
+            hazard_data.get('location', ''),
+            hazard_data.get('description', ''),
+            hazard_data.get('source', 'Community'),
+            hazard_data.get('verified', False),
+            hazard_data.get('timestamp', datetime.now().isoformat()),
+            hazard_data.get('image_path', ''),
+            hazard_data.get('reporter_id', '')
+        )
+    
+    def save_hazards(self, hazards):
+        """Bulk-save hazards in one transaction; invalid records are skipped.
+        
+        Returns (ids of the saved hazards, rejected_count).
+        """
+        rows = []
+        rejected = 0
+        for hazard_data in hazards:
+            try:
+                DataValidator.validate_hazard_data(hazard_data)
+                rows.append(self._hazard_row(hazard_data))
+            except ValueError:
+                rejected += 1
+        
+        if not rows:
+            return [], rejected
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany(self._HAZARD_UPSERT, rows)
+            self._log_event('INFO', f"Bulk saved {len(rows)} hazards ({rejected} rejected)", 'database')
+            invalidate_hazards([row[4] for row in rows], [row[5] for row in rows])
+            return [row[0] for row in rows], rejected
+        except sqlite3.Error as e:
+            self._log_event('ERROR', f"Error bulk saving hazards: {e}", 'database')
+            raise
+        finally:
+            conn.close()
+    
+    def bump_data_version(self, name='hazards'):
+        """Increment a published data version counter and return the new value"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                conn.execute('''
+                    INSERT INTO data_versions (name, version) VALUES (?, 1)
+                    ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+                ''', (name,))
+            return conn.execute('SELECT version FROM data_versions WHERE name = ?', (name,)).fetchone()[0]
+        finally:
+            conn.close()
+    
+    def get_data_version(self, name='hazards'):
+        """Read a published data version counter (0 when never published)"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute('SELECT version FROM data_versions WHERE name = ?', (name,)).fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+    
     def get_recent_hazards(self, hours=24, limit=1000):
         """Get recent hazards from database"""
         conn = sqlite3.connect(self.db_path)
@@ -151,6 +223,31 @@ class DatabaseManager:
         finally:
             conn.close()
     
+    def get_hazards_since(self, since=None, hours=24, limit=10000):
+        """Get hazards written at or after a created_at watermark.
+        
+        With no watermark this is the full window. Rows rewritten by
+        save_hazard get a new created_at, so updates are picked up too.
+        """
+        if since is None:
+            return self.get_recent_hazards(hours=hours, limit=limit)
+        
+        conn = sqlite3.connect(self.db_path)
+        query = '''
+            SELECT * FROM hazards 
+            WHERE created_at >= ?
+            AND datetime(timestamp) >= datetime('now', ?)
+            ORDER BY created_at
+            LIMIT ?
+        '''
+        try:
+            return pd.read_sql_query(query, conn, params=(since, f'-{hours} hours', limit))
+        except Exception as e:
+            self._log_event('ERROR', f"Error retrieving hazard delta: {e}", 'database')
+            return pd.DataFrame()
+        finally:
+            conn.close()
+    
     def get_hazard_stats(self):
         """Get hazard statistics for dashboard"""
         conn = sqlite3.connect(self.db_path)
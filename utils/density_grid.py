@@ -0,0 +1,147 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from utils.spatial import lonlat_to_tile, parse_bbox
+
+# Map zooms that get a grid; cells are tiles CELL_OFFSET zooms further in (3 -> 32 px cells)
+MIN_ZOOM = 8
+MAX_ZOOM = 18
+CELL_OFFSET = 3
+
+# Most cells sent for one viewport; beyond it a coarser grid is used
+MAX_CELLS = 4000
+
+# Filter combinations that keep their own grids; the least recently used is dropped
+MAX_GRID_SETS = 8
+
+
+class DensityGrids:
+    """Severity-weighted hazard density on fixed Web-Mercator grids, one per zoom.
+
+    Every grid is a sorted array of cell ids with parallel arrays of
+    summed weight, hazard count and weighted coordinate sums (for the
+    centroid). `update(frame)` diffs the new hazard set against the last
+    one by id and applies only the added, removed and moved hazards, so
+    a refresh costs O(changes) per zoom rather than a rebuild.
+    """
+
+    def __init__(self, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, max_cells=MAX_CELLS):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.max_cells = max_cells
+        self._grids = {zoom: _empty_grid() for zoom in range(min_zoom, max_zoom + 1)}
+        self._points = pd.DataFrame({'lat': [], 'lon': [], 'weight': []}, index=pd.Index([], dtype=object))
+        self._source = None
+        self._lock = threading.Lock()
+        self.stats = {'updates': 0, 'points_applied': 0}
+
+    def update(self, hazards_df):
+        """Bring the grids in line with a hazard frame (id, lat, lon, severity); returns hazards applied"""
+        with self._lock:
+            if hazards_df is self._source:
+                return 0
+            points = pd.DataFrame({
+                'lat': hazards_df['lat'].to_numpy(dtype=np.float64),
+                'lon': hazards_df['lon'].to_numpy(dtype=np.float64),
+                'weight': hazards_df['severity'].to_numpy(dtype=np.float64)
+            }, index=pd.Index(hazards_df['id'].astype(str), dtype=object))
+            points = points[~points.index.duplicated(keep='last')].dropna()
+
+            # One hash join against the previous set: rows that are new or differ
+            # are added, their previous versions and vanished ids subtracted
+            old = self._points
+            previous = old.reindex(points.index)
+            differs = ~(previous.to_numpy() == points.to_numpy()).all(axis=1)
+            added = points[differs]
+            replaced = previous[differs].dropna()
+            removed = pd.concat([replaced, old[~old.index.isin(points.index)]])
+
+            delta_lat = np.concatenate([removed['lat'].to_numpy(), added['lat'].to_numpy()])
+            delta_lon = np.concatenate([removed['lon'].to_numpy(), added['lon'].to_numpy()])
+            delta_weight = np.concatenate([-removed['weight'].to_numpy(), added['weight'].to_numpy()])
+            delta_count = np.concatenate([np.full(len(removed), -1), np.ones(len(added), dtype=np.int64)])
+            if delta_count.size:
+                for zoom in self._grids:
+                    self._apply(zoom, delta_lat, delta_lon, delta_weight, delta_count)
+
+            self._points = points
+            self._source = hazards_df
+            self.stats['updates'] += 1
+            self.stats['points_applied'] += int(delta_count.size)
+            return int(delta_count.size)
+
+    def cells(self, zoom, bbox=None):
+        """Weighted cells for a map zoom inside a bbox: frame of lat, lon (centroids), weight, count"""
+        zoom = int(min(max(round(zoom), self.min_zoom), self.max_zoom))
+        with self._lock:
+            while True:
+                cells, weight, count, lat_sum, lon_sum = self._grids[zoom]
+                lat, lon = lat_sum / np.maximum(weight, 1e-9), lon_sum / np.maximum(weight, 1e-9)
+                if bbox is not None:
+                    west, south, east, north = parse_bbox(bbox)
+                    inside = (lon >= west) & (lon <= east) & (lat >= south) & (lat <= north)
+                    lat, lon, weight, count = lat[inside], lon[inside], weight[inside], count[inside]
+                if len(lat) <= self.max_cells or zoom == self.min_zoom:
+                    break
+                zoom -= 1
+        return pd.DataFrame({'lat': lat, 'lon': lon, 'weight': weight, 'count': count})
+
+    def _apply(self, zoom, lat, lon, weight, count):
+        cell_zoom = zoom + CELL_OFFSET
+        x, y = lonlat_to_tile(lon, lat, cell_zoom)
+        keys, idx = np.unique(x * (2 ** cell_zoom) + y, return_inverse=True)
+        d_weight = np.bincount(idx, weights=weight, minlength=len(keys))
+        d_count = np.bincount(idx, weights=count, minlength=len(keys)).astype(np.int64)
+        d_lat = np.bincount(idx, weights=weight * lat, minlength=len(keys))
+        d_lon = np.bincount(idx, weights=weight * lon, minlength=len(keys))
+
+        cells, cell_weight, cell_count, lat_sum, lon_sum = self._grids[zoom]
+        pos = np.searchsorted(cells, keys)
+        if len(cells):
+            known = cells[np.minimum(pos, len(cells) - 1)] == keys
+        else:
+            known = np.zeros(len(keys), dtype=bool)
+
+        # Existing cells are updated in place, new ones merged in sorted order
+        cell_weight[pos[known]] += d_weight[known]
+        cell_count[pos[known]] += d_count[known]
+        lat_sum[pos[known]] += d_lat[known]
+        lon_sum[pos[known]] += d_lon[known]
+        new = ~known
+        if new.any():
+            cells = np.concatenate([cells, keys[new]])
+            order = np.argsort(cells, kind='stable')
+            cells = cells[order]
+            cell_weight = np.concatenate([cell_weight, d_weight[new]])[order]
+            cell_count = np.concatenate([cell_count, d_count[new]])[order]
+            lat_sum = np.concatenate([lat_sum, d_lat[new]])[order]
+            lon_sum = np.concatenate([lon_sum, d_lon[new]])[order]
+
+        # Cells whose last hazard left are dropped
+        alive = cell_count > 0
+        if not alive.all():
+            cells, cell_weight, cell_count = cells[alive], cell_weight[alive], cell_count[alive]
+            lat_sum, lon_sum = lat_sum[alive], lon_sum[alive]
+        self._grids[zoom] = (cells, cell_weight, cell_count, lat_sum, lon_sum)
+
+
+def _empty_grid():
+    return (np.array([], dtype=np.int64), np.array([], dtype=np.float64), np.array([], dtype=np.int64),
+            np.array([], dtype=np.float64), np.array([], dtype=np.float64))
+
+
+_density_grids = OrderedDict()  # filter key -> DensityGrids
+_density_grids_lock = threading.Lock()
+
+
+def get_density_grids(key=None):
+    """Process-wide density grids for one filter combination (None: every hazard), shared by every session"""
+    with _density_grids_lock:
+        grids = _density_grids.get(key)
+        if grids is None:
+            grids = _density_grids[key] = DensityGrids()
+            while len(_density_grids) > MAX_GRID_SETS:
+                _density_grids.popitem(last=False)
+        _density_grids.move_to_end(key)
+        return grids
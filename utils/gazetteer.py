@@ -0,0 +1,305 @@
+import bisect
+import bz2
+import os
+import pickle
+import re
+import threading
+import xml.etree.ElementTree as ET
+import numpy as np
+from scipy.spatial import cKDTree
+from utils.config import Config
+
+EARTH_RADIUS_M = 6371000.0
+
+# Places always available, even without an OSM extract
+SEED_PLACES = [
+    ('Connaught Place', 28.6315, 77.2189, 'neighbourhood'),
+    ('India Gate', 28.6129, 77.2295, 'monument'),
+    ('Rajiv Chowk', 28.6326, 77.2197, 'station'),
+    ('Kashmere Gate', 28.6660, 77.2285, 'station'),
+    ('Nehru Place', 28.5480, 77.2522, 'neighbourhood'),
+    ('Hauz Khas', 28.5545, 77.1947, 'neighbourhood'),
+    ('Lodhi Road', 28.5910, 77.2270, 'street'),
+    ('AIIMS', 28.5672, 77.2100, 'hospital'),
+    ('Karol Bagh', 28.6519, 77.1909, 'neighbourhood'),
+    ('Lajpat Nagar', 28.5677, 77.2433, 'neighbourhood'),
+    ('Rajpath', 28.6140, 77.2290, 'street'),
+    ('Janpath', 28.6238, 77.2186, 'street'),
+    ('Barakhamba Road', 28.6300, 77.2250, 'street'),
+    ('Kasturba Gandhi Marg', 28.6250, 77.2230, 'street'),
+    ('Parliament Street', 28.6230, 77.2120, 'street'),
+    ('Ashoka Road', 28.6190, 77.2140, 'street'),
+    ('Mandir Marg', 28.6320, 77.1990, 'street'),
+    ('Bangla Sahib Road', 28.6290, 77.2070, 'street'),
+    ('Chandni Chowk', 28.6506, 77.2303, 'neighbourhood'),
+    ('Red Fort', 28.6562, 77.2410, 'monument'),
+    ('Saket', 28.5245, 77.2066, 'neighbourhood')
+]
+
+# Cities and states the seed places lie in, matched against query qualifiers ("India Gate, New Delhi")
+SEED_REGIONS = ('New Delhi', 'Delhi', 'NCT of Delhi', 'India')
+
+# OSM node tags that mark a named point worth indexing
+PLACE_TAGS = ('place', 'amenity', 'tourism', 'historic', 'leisure', 'public_transport', 'railway')
+
+# OSM tags naming the city or state a place lies in
+REGION_TAGS = ('addr:city', 'addr:district', 'addr:state', 'is_in', 'is_in:city', 'is_in:state')
+
+# A qualifier naming another indexed place this close by is consistent with a match
+QUALIFIER_RADIUS_M = 10000
+
+# Score factor for a match contradicted by a qualifier ("India Gate, Mumbai")
+MISMATCH_FACTOR = 0.35
+
+
+def _to_unit_xyz(lat, lon):
+    """Convert degrees to points on the unit sphere so KD-tree chords order like distances"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+class Gazetteer:
+    """Offline place-name index.
+
+    Names are kept in a sorted key list for exact and prefix lookups (every
+    word suffix of a name is a key, so "gate" finds "India Gate"), a trigram
+    inverted index for fuzzy matches and a KD-tree for nearest-place queries.
+
+    Places are (name, lat, lon, kind) with an optional fifth element, the
+    names of the cities and states they lie in. The part of a query after
+    its first comma is read as qualifiers: one naming a place's region, or
+    another place nearby, ranks that place first; any other qualifier
+    contradicts the match and scales its score down.
+    """
+
+    def __init__(self, places):
+        self.names = []
+        self.kinds = []
+        self._regions = []
+        coords = []
+        for name, lat, lon, kind, *regions in places:
+            if name and self.normalize(name):
+                self.names.append(name)
+                self.kinds.append(kind)
+                self._regions.append(frozenset(self.normalize(region) for region in (regions[0] if regions else ())))
+                coords.append((lat, lon))
+        self.coords = np.array(coords, dtype=np.float64).reshape(-1, 2)
+
+        normalized = [self.normalize(name) for name in self.names]
+        self._exact = {}
+        keys = []
+        trigram_postings = {}
+        trigram_counts = []
+        for i, norm in enumerate(normalized):
+            self._exact.setdefault(norm, []).append(i)
+            tokens = norm.split()
+            for t in range(len(tokens)):
+                keys.append((' '.join(tokens[t:]), i))
+
+            grams = self._trigrams(norm)
+            trigram_counts.append(len(grams))
+            for gram in grams:
+                trigram_postings.setdefault(gram, []).append(i)
+
+        keys.sort()
+        self._keys = [key for key, _ in keys]
+        self._key_ids = np.array([i for _, i in keys], dtype=np.int32)
+        self._trigram_index = {
+            gram: np.array(ids, dtype=np.int32) for gram, ids in trigram_postings.items()
+        }
+        self._trigram_counts = np.array(trigram_counts, dtype=np.int32)
+        self._tree = cKDTree(_to_unit_xyz(self.coords[:, 0], self.coords[:, 1])) if len(self.names) else None
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def normalize(text):
+        """Lowercase, strip punctuation and collapse whitespace"""
+        return ' '.join(re.sub(r'[^\w\s]', ' ', str(text).lower()).split())
+
+    @staticmethod
+    def _trigrams(norm):
+        padded = f"  {norm} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def search(self, query, limit=5, min_score=0.3):
+        """Rank places matching free text: exact, then prefix, then trigram similarity"""
+        segments = str(query).split(',')
+        variants = [self.normalize(query)]
+        head = self.normalize(segments[0])
+        if head and head not in variants:
+            variants.append(head)
+        # Postcodes say nothing the name doesn't
+        qualifiers = [
+            qualifier for qualifier in (
+                ' '.join(token for token in self.normalize(segment).split() if not token.isdigit())
+                for segment in segments[1:]
+            ) if qualifier
+        ]
+
+        scores = {}
+        for norm in variants:
+            if not norm:
+                continue
+            for i in self._exact.get(norm, ()):
+                scores[i] = 1.0
+
+            lo = bisect.bisect_left(self._keys, norm)
+            hi = bisect.bisect_left(self._keys, norm + '\uffff', lo)
+            for i in self._key_ids[lo:lo + min(hi - lo, limit * 8)]:
+                score = 0.6 + 0.3 * len(norm) / max(len(self.names[i]), len(norm))
+                scores[i] = max(scores.get(i, 0.0), score)
+
+        if len(scores) < limit:
+            for i, score in self._fuzzy(variants[-1] or variants[0], min_score).items():
+                scores[i] = max(scores.get(i, 0.0), score)
+
+        # Qualifiers only apply when the full query is not itself a place name
+        confirmed = dict.fromkeys(scores, 0)
+        if qualifiers:
+            full_matches = set(self._exact.get(variants[0], ()))
+            for i in scores:
+                if i not in full_matches:
+                    confirmed[i] = self._qualifier_matches(i, qualifiers)
+                    if confirmed[i] < 0:
+                        scores[i] *= MISMATCH_FACTOR
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -confirmed[item[0]], len(self.names[item[0]])))
+        return [self._entry(i, score) for i, score in ranked[:limit] if score >= min_score]
+
+    def _qualifier_matches(self, i, qualifiers):
+        """Number of qualifiers naming place i's region or a place near it; -1 if any names neither"""
+        matched = 0
+        for qualifier in qualifiers:
+            nearby = [j for j in self._exact.get(qualifier, ()) if j != i]
+            if qualifier in self._regions[i] or (
+                nearby and _distance_m(self.coords[i], self.coords[nearby]).min() <= QUALIFIER_RADIUS_M
+            ):
+                matched += 1
+            else:
+                return -1
+        return matched
+
+    def _fuzzy(self, norm, min_score):
+        """Jaccard similarity over trigram sets, counted with one bincount"""
+        if not norm:
+            return {}
+        grams = self._trigrams(norm)
+        postings = [self._trigram_index[gram] for gram in grams if gram in self._trigram_index]
+        if not postings:
+            return {}
+
+        hits = np.bincount(np.concatenate(postings), minlength=len(self.names))
+        candidates = np.nonzero(hits)[0]
+        shared = hits[candidates]
+        similarity = shared / (len(grams) + self._trigram_counts[candidates] - shared)
+        keep = similarity >= min_score
+        return dict(zip(candidates[keep].tolist(), (similarity[keep] * 0.85).tolist()))
+
+    def resolve(self, query, min_score=0.4):
+        """Best match for free text, or None when nothing is close enough"""
+        matches = self.search(query, limit=1, min_score=min_score)
+        return matches[0] if matches else None
+
+    def nearest(self, lat, lon, k=1):
+        """Nearest indexed places to a coordinate, with great-circle distance in metres"""
+        if self._tree is None:
+            return []
+        k = min(k, len(self.names))
+        chords, idx = self._tree.query(_to_unit_xyz([lat], [lon])[0], k=k)
+        chords, idx = np.atleast_1d(chords), np.atleast_1d(idx)
+        distances = 2 * np.arcsin(np.minimum(chords / 2, 1.0)) * EARTH_RADIUS_M
+        return [dict(self._entry(i, None), distance_m=float(d)) for i, d in zip(idx, distances)]
+
+    def _entry(self, i, score):
+        entry = {
+            'name': self.names[i],
+            'lat': float(self.coords[i, 0]),
+            'lon': float(self.coords[i, 1]),
+            'kind': self.kinds[i]
+        }
+        if score is not None:
+            entry['score'] = round(float(score), 3)
+        return entry
+
+
+def _distance_m(origin, points):
+    """Great-circle distances in metres from one (lat, lon) to an (n, 2) array"""
+    chords = np.linalg.norm(_to_unit_xyz(points[:, 0], points[:, 1]) - _to_unit_xyz([origin[0]], [origin[1]]), axis=1)
+    return 2 * np.arcsin(np.minimum(chords / 2, 1.0)) * EARTH_RADIUS_M
+
+
+def read_osm_places(path, regions=()):
+    """Read named places and streets from an OSM XML extract (.osm or .osm.bz2).
+
+    Places carry `regions` (the cities and states the extract covers) plus
+    any their own address or is_in tags name.
+    """
+    regions = tuple(regions)
+    opener = bz2.open if path.endswith('.bz2') else open
+    node_coords = {}
+    places = []
+    streets = {}
+
+    with opener(path, 'rb') as f:
+        for _, elem in ET.iterparse(f, events=('end',)):
+            if elem.tag == 'node':
+                lat, lon = float(elem.get('lat')), float(elem.get('lon'))
+                node_coords[elem.get('id')] = (lat, lon)
+                tags = {tag.get('k'): tag.get('v') for tag in elem.iter('tag')}
+                kind = next((tags[key] for key in PLACE_TAGS if key in tags), None)
+                if 'name' in tags and kind:
+                    places.append((tags['name'], lat, lon, kind, regions + _region_tags(tags)))
+                elem.clear()
+            elif elem.tag == 'way':
+                tags = {tag.get('k'): tag.get('v') for tag in elem.iter('tag')}
+                if 'name' in tags and 'highway' in tags:
+                    refs = [node_coords[nd.get('ref')] for nd in elem.iter('nd') if nd.get('ref') in node_coords]
+                    if refs:
+                        # Use a vertex on the street rather than its centroid
+                        lat, lon = refs[len(refs) // 2]
+                        # One entry per street name per ~1 km cell
+                        streets.setdefault((tags['name'], round(lat, 2), round(lon, 2)),
+                                           (lat, lon, regions + _region_tags(tags)))
+                elem.clear()
+            elif elem.tag == 'relation':
+                elem.clear()
+
+    places.extend((name, lat, lon, 'street', place_regions)
+                  for (name, _, _), (lat, lon, place_regions) in streets.items())
+    return places
+
+
+def _region_tags(tags):
+    return tuple(region.strip() for key in REGION_TAGS if key in tags for region in tags[key].split(','))
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Process-wide gazetteer, built from the OSM extract when one is present.
+
+    The parsed place list is pickled next to the extract so later processes
+    skip the XML parse until the extract changes.
+    """
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            places = [place + (SEED_REGIONS,) for place in SEED_PLACES]
+            path = Config.OSM_EXTRACT_PATH
+            if path and os.path.exists(path):
+                cache_path = f"{path}.places-v2.pkl"
+                if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+                    with open(cache_path, 'rb') as f:
+                        osm_places = pickle.load(f)
+                else:
+                    osm_places = read_osm_places(path, Config.OSM_EXTRACT_REGIONS)
+                    with open(cache_path, 'wb') as f:
+                        pickle.dump(osm_places, f)
+                places.extend(osm_places)
+            _gazetteer = Gazetteer(places)
+        return _gazetteer
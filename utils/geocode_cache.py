@@ -0,0 +1,167 @@
+import csv
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from utils.config import Config
+from utils.gazetteer import Gazetteer
+
+
+class GeocodeCache:
+    """Two-tier cache of geocoding results keyed by normalized address.
+
+    An in-process LRU answers repeated lookups in microseconds; behind it a
+    SQLite table keeps results across restarts. Positive results live for
+    `ttl` seconds; addresses the provider could not resolve are cached as
+    misses for the shorter `negative_ttl` so they are not re-queried on
+    every keystroke.
+    """
+
+    def __init__(self, db_path="data/geocode_cache.db", ttl=30 * 86400, negative_ttl=86400, memory_size=2048):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory_size = memory_size
+        self._memory = OrderedDict()  # key -> (expires_at, result or None)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'negative_hits': 0, 'misses': 0, 'writes': 0}
+        self._init_database()
+
+    def _init_database(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS geocode_cache (
+                    address TEXT PRIMARY KEY,
+                    lat REAL,
+                    lon REAL,
+                    place_name TEXT,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+
+    def _connection(self):
+        # One connection per thread, kept open so disk hits skip the connect
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(address):
+        return Gazetteer.normalize(address)
+
+    def get(self, address):
+        """Look up an address; returns (cached, result).
+
+        `cached` is False when the provider has to be asked. A cached miss
+        returns (True, None).
+        """
+        key = self.key(address)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits' if entry[1] is not None else 'negative_hits'] += 1
+                return True, entry[1]
+
+        row = self._connection().execute(
+            'SELECT lat, lon, place_name, expires_at FROM geocode_cache WHERE address = ? AND expires_at > ?',
+            (key, now)
+        ).fetchone()
+        if row is None:
+            with self._lock:
+                self.stats['misses'] += 1
+            return False, None
+
+        lat, lon, place_name, expires_at = row
+        result = None if lat is None else {'lon': lon, 'lat': lat, 'place_name': place_name}
+        with self._lock:
+            self.stats['disk_hits' if result is not None else 'negative_hits'] += 1
+            self._remember(key, expires_at, result)
+        return True, result
+
+    def put(self, address, result):
+        """Cache a provider result; pass None to record that the address was not found"""
+        self.put_many([(address, result)])
+
+    def put_many(self, items):
+        """Cache several (address, result) pairs in one transaction"""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for address, result in items:
+                key = self.key(address)
+                if not key:
+                    continue
+                expires_at = now + (self.ttl if result is not None else self.negative_ttl)
+                if result is not None:
+                    result = {'lon': float(result['lon']), 'lat': float(result['lat']),
+                              'place_name': result.get('place_name') or address}
+                    rows.append((key, result['lat'], result['lon'], result['place_name'], expires_at))
+                else:
+                    rows.append((key, None, None, None, expires_at))
+                self._remember(key, expires_at, result)
+            self.stats['writes'] += len(rows)
+
+        conn = self._connection()
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO geocode_cache VALUES (?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def _remember(self, key, expires_at, result):
+        self._memory[key] = (expires_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def warm_up(self, csv_path):
+        """Bulk-load known addresses from a CSV with address, lat, lon and optional place_name columns"""
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            items = [
+                (row['address'], {'lat': row['lat'], 'lon': row['lon'], 'place_name': row.get('place_name')})
+                for row in csv.DictReader(f)
+                if row.get('address') and row.get('lat') and row.get('lon')
+            ]
+        return self.put_many(items)
+
+    def purge_expired(self):
+        """Delete expired rows from disk; returns the number removed"""
+        conn = self._connection()
+        with conn:
+            return conn.execute('DELETE FROM geocode_cache WHERE expires_at <= ?', (time.time(),)).rowcount
+
+
+_geocode_cache = None
+_geocode_cache_lock = threading.Lock()
+
+
+def get_geocode_cache():
+    """Process-wide geocode cache, warmed from Config.GEOCODE_WARMUP_CSV when present"""
+    global _geocode_cache
+    with _geocode_cache_lock:
+        if _geocode_cache is None:
+            _geocode_cache = GeocodeCache(
+                Config.GEOCODE_CACHE_PATH,
+                ttl=Config.GEOCODE_CACHE_TTL,
+                negative_ttl=Config.GEOCODE_NEGATIVE_TTL
+            )
+            if Config.GEOCODE_WARMUP_CSV and os.path.exists(Config.GEOCODE_WARMUP_CSV):
+                _geocode_cache.warm_up(Config.GEOCODE_WARMUP_CSV)
+        return _geocode_cache
+
+
+if __name__ == "__main__":
+    # python -m utils.geocode_cache addresses.csv
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m utils.geocode_cache <addresses.csv>")
+    loaded = get_geocode_cache().warm_up(sys.argv[1])
+    print(f"[INFO] Warmed geocode cache with {loaded} addresses")
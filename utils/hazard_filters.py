@@ -0,0 +1,175 @@
+import threading
+import weakref
+from collections import OrderedDict, namedtuple
+from urllib.parse import parse_qs, urlencode
+import numpy as np
+import pandas as pd
+
+# Sidebar data-source choices -> canonical hazard sources (see hazard_schema.HAZARD_SOURCES)
+SOURCE_GROUPS = {
+    'Community Reports': ('Community Report', 'User Report'),
+    'Traffic APIs': ('Traffic API', 'Traffic Cam'),
+    'Weather Data': ('Weather API', 'Weather Feed'),
+    'Government Feeds': ('Govt API',)
+}
+
+
+class HazardFilter(namedtuple('HazardFilter', ['hazard_types', 'sources', 'min_severity', 'min_confidence'])):
+    """The sidebar filters in a normalized, hashable form.
+
+    `hazard_types` and `sources` are sorted tuples of canonical values, or
+    None for no restriction; the minimums are None when unset. The same
+    filter compiles to a vectorized mask for in-memory snapshots (`mask`)
+    and to tile server query parameters (`to_query`), and is itself the
+    cache key.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, filters):
+        """From render_sidebar's dict; an empty selection means no restriction, like no selection"""
+        filters = filters or {}
+        hazard_types = filters.get('hazard_types')
+        sources = filters.get('sources')
+        if sources:
+            sources = [source for group in sources for source in SOURCE_GROUPS.get(group, (group,))]
+        min_severity = filters.get('min_severity')
+        min_confidence = filters.get('min_confidence')
+        return cls(
+            tuple(sorted(set(hazard_types))) if hazard_types else None,
+            tuple(sorted(set(sources))) if sources else None,
+            int(min_severity) if min_severity is not None else None,
+            float(min_confidence) if min_confidence is not None else None
+        )
+
+    @classmethod
+    def from_query(cls, query):
+        """From a query string written by to_query"""
+        params = {name: values[0] for name, values in parse_qs(query).items()}
+        types, sources = params.get('types'), params.get('sources')
+        min_severity, min_confidence = params.get('min_severity'), params.get('min_confidence')
+        return cls(
+            tuple(sorted(set(types.split(',')))) if types else None,
+            tuple(sorted(set(sources.split(',')))) if sources else None,
+            int(min_severity) if min_severity else None,
+            float(min_confidence) if min_confidence else None
+        )
+
+    @property
+    def is_empty(self):
+        return all(value is None for value in self)
+
+    def to_query(self):
+        params = {}
+        if self.hazard_types is not None:
+            params['types'] = ','.join(self.hazard_types)
+        if self.sources is not None:
+            params['sources'] = ','.join(self.sources)
+        if self.min_severity is not None:
+            params['min_severity'] = self.min_severity
+        if self.min_confidence is not None:
+            params['min_confidence'] = f"{self.min_confidence:g}"
+        return urlencode(params)
+
+    def mask(self, hazards_df):
+        """Boolean array selecting the matching rows of a hazard frame"""
+        keep = np.ones(len(hazards_df), dtype=bool)
+        if self.hazard_types is not None:
+            keep &= _isin(hazards_df['hazard_type'], self.hazard_types)
+        if self.sources is not None:
+            source_match = _isin(hazards_df['source'], self.sources)
+            if 'sources' in hazards_df:
+                # A merged hazard matches if any report it was built from does
+                source_match = source_match | _provenance_isin(hazards_df['sources'], self.sources)
+            keep &= source_match
+        if self.min_severity is not None:
+            keep &= hazards_df['severity'].to_numpy(dtype=np.float64, na_value=np.nan) >= self.min_severity
+        if self.min_confidence is not None:
+            keep &= hazards_df['confidence'].to_numpy(dtype=np.float64, na_value=np.nan) >= self.min_confidence
+        return keep
+
+    def apply(self, hazards_df):
+        """Matching rows (with the frame's attrs); the frame itself when nothing is filtered"""
+        if self.is_empty or hazards_df.empty:
+            return hazards_df
+        filtered = hazards_df[self.mask(hazards_df)]
+        filtered.attrs = dict(hazards_df.attrs)
+        return filtered
+
+
+def _isin(column, values):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # Compare integer codes rather than strings
+        codes = column.cat.categories.get_indexer(list(values))
+        return np.isin(column.cat.codes.to_numpy(), codes[codes >= 0])
+    return column.isin(values).to_numpy()
+
+
+def _provenance_isin(column, values):
+    """Rows whose comma-separated provenance names any of `values`, tested once per distinct string"""
+    wanted = set(values)
+    codes, uniques = pd.factorize(column)
+    hits = np.array([bool(wanted.intersection(s.strip() for s in str(u).split(','))) for u in uniques], dtype=bool)
+    # Missing provenance (code -1) lands on the trailing False
+    return np.append(hits, False)[codes]
+
+
+class FilteredHazardCache:
+    """Filtered views of the current hazard snapshot, kept per filter.
+
+    Reruns, tabs and sessions that share a filter combination reuse one
+    filtered frame until the snapshot's `data_version` changes; a new
+    version drops every entry, so only the current snapshot's views are
+    held (and the snapshot itself only weakly). Frames without a
+    data_version are filtered but not cached. Like the snapshot, a
+    filtered frame is shared and must not be modified in place.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._version = None
+        self._snapshot = None  # weak reference to the frame the entries were filtered from
+        self._entries = OrderedDict()  # filter -> filtered frame
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def apply(self, hazards_df, hazard_filter):
+        if hazard_filter.is_empty:
+            return hazards_df
+        version = hazards_df.attrs.get('data_version')
+        with self._lock:
+            if self._is_current(hazards_df, version) and hazard_filter in self._entries:
+                self._entries.move_to_end(hazard_filter)
+                self.stats['hits'] += 1
+                return self._entries[hazard_filter]
+
+        filtered = hazard_filter.apply(hazards_df)
+        with self._lock:
+            self.stats['misses'] += 1
+            if version is None:
+                return filtered
+            if not self._is_current(hazards_df, version):
+                self._version, self._snapshot = version, weakref.ref(hazards_df)
+                self._entries.clear()
+            self._entries[hazard_filter] = filtered
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return filtered
+
+    def _is_current(self, hazards_df, version):
+        # The identity check tells apart snapshots of other bboxes at the same version
+        return version is not None and version == self._version and self._snapshot() is hazards_df
+
+
+_filter_cache = None
+_filter_cache_lock = threading.Lock()
+
+
+def get_filter_cache():
+    """Process-wide cache of filtered hazard snapshots"""
+    global _filter_cache
+    with _filter_cache_lock:
+        if _filter_cache is None:
+            _filter_cache = FilteredHazardCache()
+        return _filter_cache
@@ -0,0 +1,138 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from utils.spatial import lonlat_to_tile, parse_bbox
+
+# What the live map shows for one viewport: 'points' (individual hazards)
+# or 'grid' (per-cell summaries); `bbox` is the padded region the frame
+# covers, `total` the number of hazards in it before any capping
+HazardView = namedtuple('HazardView', ['level', 'frame', 'bbox', 'zoom', 'total'])
+
+# Individual hazards are only sent from this zoom on (about street level)
+DETAIL_ZOOM = 13
+
+# Most individual hazards sent for one viewport, by zoom (higher zooms use the last entry)
+MAX_POINTS_BY_ZOOM = {13: 1500, 14: 3000, 15: 5000}
+
+# Grid cells are tiles this many zoom levels below the map zoom: 3 -> 32 px cells
+GRID_CELL_OFFSET = 3
+MAX_GRID_CELLS = 2000
+
+# Viewports are padded by this fraction on each side, so small pans stay inside what was served
+VIEWPORT_PADDING = 0.5
+
+GRID_COLUMNS = ['lat', 'lon', 'count', 'max_severity', 'mean_confidence', 'hazard_type', 'cell']
+
+
+def max_points(zoom):
+    zooms = sorted(MAX_POINTS_BY_ZOOM)
+    eligible = [z for z in zooms if z <= zoom]
+    return MAX_POINTS_BY_ZOOM[eligible[-1] if eligible else zooms[0]]
+
+
+def pad_bbox(bbox, fraction=VIEWPORT_PADDING):
+    west, south, east, north = parse_bbox(bbox)
+    dx, dy = (east - west) * fraction, (north - south) * fraction
+    return max(west - dx, -180.0), max(south - dy, -85.0), min(east + dx, 180.0), min(north + dy, 85.0)
+
+
+def bbox_contains(outer, inner):
+    ow, os_, oe, on = parse_bbox(outer)
+    iw, is_, ie, in_ = parse_bbox(inner)
+    return ow <= iw and os_ <= is_ and oe >= ie and on >= in_
+
+
+class HazardLOD:
+    """Level-of-detail selection of hazards for a map viewport.
+
+    Below DETAIL_ZOOM hazards in the padded viewport are summarized per
+    grid cell (count, worst severity, mean confidence, dominant type,
+    centroid), at most MAX_GRID_CELLS of them. From DETAIL_ZOOM on the
+    individual hazards are returned, capped per zoom with the most severe
+    and most confident kept first.
+    """
+
+    def __init__(self, detail_zoom=DETAIL_ZOOM, max_grid_cells=MAX_GRID_CELLS):
+        self.detail_zoom = detail_zoom
+        self.max_grid_cells = max_grid_cells
+
+    def view(self, hazards_df, bbox, zoom):
+        zoom = int(round(zoom))
+        region = pad_bbox(bbox)
+        west, south, east, north = region
+        lat = hazards_df['lat'].to_numpy(dtype=np.float64)
+        lon = hazards_df['lon'].to_numpy(dtype=np.float64)
+        inside = (lon >= west) & (lon <= east) & (lat >= south) & (lat <= north)
+        visible = hazards_df[inside]
+        total = len(visible)
+
+        if zoom < self.detail_zoom:
+            return HazardView('grid', self.grid(visible, zoom + GRID_CELL_OFFSET), region, zoom, total)
+
+        cap = max_points(zoom)
+        if total > cap:
+            # Most severe, then most confident, first
+            order = np.lexsort((-visible['confidence'].to_numpy(dtype=np.float64),
+                                -visible['severity'].to_numpy(dtype=np.int64)))
+            visible = visible.iloc[order[:cap]]
+        return HazardView('points', visible.reset_index(drop=True), region, zoom, total)
+
+    def grid(self, hazards_df, cell_zoom):
+        """Per-cell summaries on the Web-Mercator tile grid at cell_zoom"""
+        if hazards_df.empty:
+            return pd.DataFrame({name: [] for name in GRID_COLUMNS})
+
+        lat = hazards_df['lat'].to_numpy(dtype=np.float64)
+        lon = hazards_df['lon'].to_numpy(dtype=np.float64)
+        while True:
+            x, y = lonlat_to_tile(lon, lat, cell_zoom)
+            cells, cell_idx = np.unique(x * (2 ** cell_zoom) + y, return_inverse=True)
+            if len(cells) <= self.max_grid_cells or cell_zoom == 0:
+                break
+            cell_zoom -= 1
+
+        n = len(cells)
+        counts = np.bincount(cell_idx, minlength=n)
+        severity = hazards_df['severity'].to_numpy(dtype=np.int64)
+        max_severity = np.zeros(n, dtype=np.int64)
+        np.maximum.at(max_severity, cell_idx, severity)
+
+        types = hazards_df['hazard_type']
+        if not isinstance(types.dtype, pd.CategoricalDtype):
+            types = types.astype('category')
+        n_types = len(types.cat.categories)
+        type_counts = np.bincount(cell_idx * n_types + types.cat.codes.to_numpy(), minlength=n * n_types)
+        dominant = types.cat.categories[type_counts.reshape(n, n_types).argmax(axis=1)]
+
+        return pd.DataFrame({
+            'lat': np.bincount(cell_idx, weights=lat, minlength=n) / counts,
+            'lon': np.bincount(cell_idx, weights=lon, minlength=n) / counts,
+            'count': counts,
+            'max_severity': max_severity,
+            'mean_confidence': np.bincount(
+                cell_idx, weights=hazards_df['confidence'].to_numpy(dtype=np.float64), minlength=n
+            ) / counts,
+            'hazard_type': np.asarray(dominant, dtype=object),
+            'cell': [f"{cell_zoom}/{c // 2 ** cell_zoom}/{c % 2 ** cell_zoom}" for c in cells.tolist()]
+        })
+
+
+def viewport_around(lat, lon, zoom, width_px, height_px):
+    """Approximate bbox of a width x height pixel map centred on (lat, lon), for the first render"""
+    degrees_per_px = 360.0 / (256 * 2 ** zoom)
+    half_width = width_px / 2 * degrees_per_px
+    half_height = height_px / 2 * degrees_per_px * np.cos(np.radians(lat))
+    return lon - half_width, lat - half_height, lon + half_width, lat + half_height
+
+
+def viewport_from_state(state):
+    """(bbox, zoom) from st_folium's returned state, or None before the map has reported one"""
+    if not state or not state.get('bounds') or state.get('zoom') is None:
+        return None
+    bounds = state['bounds']
+    south_west, north_east = bounds.get('_southWest') or {}, bounds.get('_northEast') or {}
+    if south_west.get('lat') is None or north_east.get('lat') is None:
+        return None
+    bbox = (south_west['lng'], south_west['lat'], north_east['lng'], north_east['lat'])
+    return bbox, state['zoom']
+
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+HAZARD_TYPES = [
+    'Potholes', 'Flooding', 'Accidents', 'Road Closures',
+    'Construction', 'Debris', 'Landslides', 'Traffic', 'Other'
+]
+
+HAZARD_SOURCES = [
+    'User Report', 'Community Report', 'Govt API', 'Traffic Cam',
+    'Traffic API', 'Weather Feed', 'Weather API', 'Other'
+]
+
+# Fixed categories keep the dtype stable across batches, so concatenating
+# frames from different sources never falls back to object columns
+HAZARD_TYPE_DTYPE = pd.CategoricalDtype(HAZARD_TYPES)
+SOURCE_DTYPE = pd.CategoricalDtype(HAZARD_SOURCES)
+
+# Canonical columnar hazard schema shared by every source adapter
+HAZARD_SCHEMA = {
+    'id': np.dtype(object),
+    'hazard_type': HAZARD_TYPE_DTYPE,
+    'severity': np.dtype(np.int8),
+    'confidence': np.dtype(np.float32),
+    'lat': np.dtype(np.float32),
+    'lon': np.dtype(np.float32),
+    'location': np.dtype(object),
+    'description': np.dtype(object),
+    'source': SOURCE_DTYPE,
+    'verified': np.dtype(bool),
+    'timestamp': np.dtype('datetime64[ns]'),
+    'image_path': np.dtype(object),
+    'reporter_id': np.dtype(object)
+}
+
+# Field names used by older record layouts -> canonical column names
+COLUMN_ALIASES = {
+    'location_description': 'location',
+    'reporter': 'reporter_id'
+}
+
+
+def empty_hazard_frame():
+    """Zero-row frame with the canonical hazard dtypes"""
+    return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in HAZARD_SCHEMA.items()})
+
+
+def to_hazard_frame(data, default_source='Other'):
+    """Coerce hazard records or a DataFrame to the canonical columnar schema.
+
+    Known aliases are renamed, unknown hazard types map to 'Other' and
+    unknown or missing sources to `default_source`, out-of-range severity
+    and confidence are clipped and missing optional fields get defaults.
+    Extra input columns are dropped.
+    """
+    frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame.from_records(list(data))
+    if frame.empty:
+        return empty_hazard_frame()
+
+    frame = frame.rename(columns={
+        alias: name for alias, name in COLUMN_ALIASES.items()
+        if alias in frame.columns and name not in frame.columns
+    })
+    n = len(frame)
+
+    def column(name, default):
+        if name in frame.columns:
+            return frame[name].reset_index(drop=True)
+        return pd.Series([default] * n)
+
+    def text(name):
+        return column(name, '').fillna('').astype(str).to_numpy(dtype=object)
+
+    def category(name, dtype, default):
+        values = pd.Categorical(column(name, default).astype(object), dtype=dtype)
+        return pd.Series(values).fillna(default)
+
+    if 'verified' in frame.columns:
+        verified = column('verified', False).fillna(False).astype(bool)
+    else:
+        verified = column('status', '') == 'verified'
+
+    timestamp = pd.to_datetime(column('timestamp', None), errors='coerce', format='mixed')
+    if timestamp.dt.tz is not None:
+        timestamp = timestamp.dt.tz_localize(None)
+
+    return pd.DataFrame({
+        'id': column('id', '').astype(str).to_numpy(dtype=object),
+        'hazard_type': category('hazard_type', HAZARD_TYPE_DTYPE, 'Other'),
+        'severity': pd.to_numeric(column('severity', 1), errors='coerce').fillna(1).clip(1, 5).astype(np.int8),
+        'confidence': pd.to_numeric(column('confidence', 50), errors='coerce').fillna(50).clip(0, 100).astype(np.float32),
+        'lat': pd.to_numeric(column('lat', np.nan), errors='coerce').astype(np.float32),
+        'lon': pd.to_numeric(column('lon', np.nan), errors='coerce').astype(np.float32),
+        'location': text('location'),
+        'description': text('description'),
+        'source': category('source', SOURCE_DTYPE, default_source if default_source in HAZARD_SOURCES else 'Other'),
+        'verified': verified.astype(bool).to_numpy(),
+        'timestamp': timestamp.fillna(pd.Timestamp.now()).astype('datetime64[ns]'),
+        'image_path': text('image_path'),
+        'reporter_id': text('reporter_id')
+    })
+
+
+def to_records(frame):
+    """Canonical frame -> plain-Python dicts, e.g. for DatabaseManager.save_hazards"""
+    return frame.assign(
+        timestamp=frame['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S'),
+        confidence=frame['confidence'].astype(np.float64).round(2),
+        lat=frame['lat'].astype(np.float64).round(6),
+        lon=frame['lon'].astype(np.float64).round(6),
+        hazard_type=frame['hazard_type'].astype(object),
+        source=frame['source'].astype(object)
+    ).to_dict('records')
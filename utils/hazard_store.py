@@ -0,0 +1,291 @@
+import heapq
+import threading
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from utils.hazard_schema import HAZARD_SCHEMA
+
+
+class HazardTable:
+    """Long-lived in-memory hazard table fed by delta merges.
+
+    Rows live in preallocated column arrays in the canonical hazard schema
+    (categoricals stored as codes) and are upserted by (source, id) into
+    reusable slots. A merge only touches the incoming rows' slots and the
+    expiry heap, so its cost follows the size of the delta; rows are
+    dropped once their timestamp leaves the window. The DataFrame view is
+    rebuilt lazily, at most once per change.
+    """
+
+    def __init__(self, window_hours=24, capacity=1024):
+        self.window = np.timedelta64(window_hours, 'h')
+        self.version = 0
+        self._capacity = capacity
+        self._columns = {name: self._allocate(dtype, capacity) for name, dtype in HAZARD_SCHEMA.items()}
+        self._active = np.zeros(capacity, dtype=bool)
+        self._expires = np.full(capacity, np.datetime64('NaT'), dtype='datetime64[ns]')
+        self._slot_keys = np.empty(capacity, dtype=object)
+        self._slot_of = {}
+        self._free = []
+        self._used = 0
+        self._expiry_heap = []
+        self._lock = threading.RLock()
+        self._frame = None
+        self._frame_version = -1
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    @staticmethod
+    def _allocate(dtype, capacity):
+        if isinstance(dtype, pd.CategoricalDtype):
+            return np.full(capacity, -1, dtype=np.int16)
+        if dtype == np.dtype('datetime64[ns]'):
+            return np.full(capacity, np.datetime64('NaT'), dtype=dtype)
+        return np.zeros(capacity, dtype=dtype) if dtype != np.dtype(object) else np.empty(capacity, dtype=object)
+
+    def upsert(self, source, frame):
+        """Insert or replace rows of one source from a canonical hazard frame.
+
+        Returns the number of rows inserted, changed or removed.
+        """
+        if frame.empty:
+            return 0
+        frame = frame.drop_duplicates('id', keep='last')
+        values = self._column_values(frame)
+        now = np.datetime64(datetime.now(), 'ns')
+        expires = values['timestamp'] + self.window
+        keys = [(source, row_id) for row_id in values['id']]
+
+        with self._lock:
+            slots = np.fromiter((self._slot_of.get(key, -1) for key in keys), dtype=np.intp, count=len(keys))
+            live = expires > now
+
+            # Rows that arrive already outside the window remove their old version
+            stale = np.flatnonzero(~live & (slots >= 0))
+            for i in stale:
+                self._release(slots[i])
+
+            rows = np.flatnonzero(live)
+            existing = rows[slots[rows] >= 0]
+            if existing.size:
+                unchanged = self._rows_equal(slots[existing], {name: col[existing] for name, col in values.items()})
+                rows = np.setdiff1d(rows, existing[unchanged], assume_unique=True)
+            if not rows.size and not stale.size:
+                return 0
+
+            new = rows[slots[rows] < 0]
+            if new.size:
+                slots[new] = self._acquire([keys[i] for i in new])
+
+            target = slots[rows]
+            for name, column in values.items():
+                self._columns[name][target] = column[rows]
+            self._expires[target] = expires[rows]
+
+            # Heap entries hold plain int nanoseconds, which compare far faster than datetime64
+            entries = list(zip(expires[rows].view(np.int64).tolist(), [keys[i] for i in rows]))
+            if len(entries) > len(self._expiry_heap):
+                # Bulk loads are cheaper to re-heapify than to push one by one
+                self._expiry_heap.extend(entries)
+                heapq.heapify(self._expiry_heap)
+            else:
+                for entry in entries:
+                    heapq.heappush(self._expiry_heap, entry)
+
+            self.version += 1
+        return int(rows.size + stale.size)
+
+    def expire(self, now=None):
+        """Drop rows whose timestamp has left the window; returns the number removed"""
+        now = int(np.datetime64(now or datetime.now(), 'ns').view(np.int64))
+        removed = 0
+        with self._lock:
+            # Inside the lock: _grow() replaces the array
+            expires = self._expires.view(np.int64)
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                expires_at, key = heapq.heappop(self._expiry_heap)
+                slot = self._slot_of.get(key)
+                # Heap entries of rows that were since replaced are stale, skip them
+                if slot is not None and expires[slot] == expires_at:
+                    self._release(slot)
+                    removed += 1
+
+            if removed:
+                self.version += 1
+        return removed
+
+    def to_frame(self):
+        """Current rows as a typed DataFrame, shared between readers until the next change"""
+        with self._lock:
+            self.expire()
+            if self._frame_version != self.version:
+                slots = np.flatnonzero(self._active[:self._used])
+                columns = {}
+                for name, dtype in HAZARD_SCHEMA.items():
+                    column = self._columns[name][slots]
+                    if isinstance(dtype, pd.CategoricalDtype):
+                        column = pd.Categorical.from_codes(column, dtype=dtype)
+                    columns[name] = column
+                self._frame = pd.DataFrame(columns)
+                self._frame_version = self.version
+            return self._frame
+
+    @staticmethod
+    def _column_values(frame):
+        values = {}
+        for name, dtype in HAZARD_SCHEMA.items():
+            column = frame[name]
+            if isinstance(dtype, pd.CategoricalDtype):
+                values[name] = column.cat.codes.to_numpy(dtype=np.int16)
+            else:
+                values[name] = column.to_numpy(dtype=dtype)
+        return values
+
+    def _rows_equal(self, slots, values):
+        equal = np.ones(len(slots), dtype=bool)
+        for name, column in values.items():
+            stored = self._columns[name][slots]
+            if column.dtype.kind == 'f':
+                equal &= (stored == column) | (np.isnan(stored) & np.isnan(column))
+            elif column.dtype.kind == 'M':
+                equal &= (stored == column) | (np.isnat(stored) & np.isnat(column))
+            else:
+                equal &= stored == column
+        return equal
+
+    def _acquire(self, keys):
+        reused = [self._free.pop() for _ in range(min(len(keys), len(self._free)))]
+        fresh = len(keys) - len(reused)
+        while self._used + fresh > self._capacity:
+            self._grow()
+        slots = np.concatenate([
+            np.array(reused, dtype=np.intp),
+            np.arange(self._used, self._used + fresh, dtype=np.intp)
+        ])
+        self._used += fresh
+        self._slot_of.update(zip(keys, slots.tolist()))
+        self._slot_keys[slots] = np.fromiter(keys, dtype=object, count=len(keys))
+        self._active[slots] = True
+        return slots
+
+    def _release(self, slot):
+        del self._slot_of[self._slot_keys[slot]]
+        self._slot_keys[slot] = None
+        self._active[slot] = False
+        self._expires[slot] = np.datetime64('NaT')
+        for name, dtype in HAZARD_SCHEMA.items():
+            if dtype == np.dtype(object):
+                self._columns[name][slot] = None
+        self._free.append(slot)
+
+    def _grow(self):
+        capacity = self._capacity * 2
+        for name, dtype in HAZARD_SCHEMA.items():
+            column = self._allocate(dtype, capacity)
+            column[:self._capacity] = self._columns[name]
+            self._columns[name] = column
+        self._active = np.concatenate([self._active, np.zeros(self._capacity, dtype=bool)])
+        self._expires = np.concatenate([self._expires, np.full(self._capacity, np.datetime64('NaT'), dtype='datetime64[ns]')])
+        self._slot_keys = np.concatenate([self._slot_keys, np.empty(self._capacity, dtype=object)])
+        self._capacity = capacity
+
+
+class HazardSnapshot:
+    """Process-wide hazard snapshot, refreshed at most once per interval.
+
+    Every reader gets the same frame object, which must be treated as
+    read-only; `version` changes only when the loaded data changes. Refresh
+    is single-flight: one caller reloads while the others keep reading the
+    previous snapshot, and only the very first load makes callers wait.
+    
+    With a version_probe (a cheap callable returning a published data
+    version), an expired snapshot is reloaded only when the probe changes.
+
+    `expire()` marks the snapshot out of date after a write: the next reader
+    reloads without consulting the probe, and readers wait for that reload
+    instead of being handed the stale frame. `attrs['loaded_at']` is the
+    wall-clock time the current data was read.
+    """
+
+    def __init__(self, loader, interval_seconds, version_probe=None):
+        self.loader = loader
+        self.interval = interval_seconds
+        self.version_probe = version_probe
+        self._probed_version = None
+        self.version = 0
+        self.refreshes = 0
+        self._frame = None
+        self._data_version = None
+        self._loaded_at = None
+        self._expirations = 0
+        self._loaded_expirations = 0
+        self._refresh_lock = threading.Lock()
+
+    def get(self):
+        """Current snapshot frame; `frame.attrs['snapshot_version']` identifies it"""
+        if self._frame is not None and not self._expired():
+            return self._frame
+
+        if self._refresh_lock.acquire(blocking=self._frame is None or self._invalidated()):
+            try:
+                # Another caller may have refreshed while we waited
+                if self._frame is None or self._expired():
+                    self._refresh()
+            finally:
+                self._refresh_lock.release()
+        return self._frame
+
+    def expire(self):
+        """Force a reload on the next read; safe to call from any thread"""
+        self._expirations += 1
+
+    def _invalidated(self):
+        return self._expirations != self._loaded_expirations
+
+    def _expired(self):
+        return (self._loaded_at is None or self._invalidated()
+                or time.monotonic() - self._loaded_at >= self.interval)
+
+    def _refresh(self):
+        # An expire() during the load leaves the snapshot expired for the next reader
+        expirations = self._expirations
+        forced = expirations != self._loaded_expirations
+        probed_version = None
+        if self.version_probe is not None and not forced:
+            try:
+                probed_version = self.version_probe()
+            except Exception:
+                probed_version = None
+            if self._frame is not None and probed_version is not None and probed_version == self._probed_version:
+                self._loaded_at = time.monotonic()
+                return
+
+        started = time.time()
+        try:
+            frame = self.loader()
+        except Exception:
+            if self._frame is None:
+                raise
+            # Keep serving the previous snapshot until the next interval
+            self._loaded_at = time.monotonic()
+            self._loaded_expirations = expirations
+            return
+
+        self.refreshes += 1
+        data_version = frame.attrs.get('data_version')
+        if self._frame is not None and data_version is not None and data_version == self._data_version:
+            # Same data: keep the frame identity, only refresh source freshness
+            self._frame.attrs['source_status'] = frame.attrs.get('source_status', {})
+            self._frame.attrs['partial'] = frame.attrs.get('partial', False)
+            self._frame.attrs['loaded_at'] = started
+        else:
+            self.version += 1
+            frame.attrs['snapshot_version'] = self.version
+            frame.attrs['loaded_at'] = started
+            self._frame = frame
+            self._data_version = data_version
+        self._probed_version = probed_version
+        self._loaded_at = time.monotonic()
+        self._loaded_expirations = expirations
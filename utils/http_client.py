@@ -0,0 +1,209 @@
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from utils.resilience import CircuitBreaker, CircuitOpenError, RateLimitedError, SingleFlight, TokenBucket, backoff_delay
+
+
+# Outbound request budget per provider: sustained requests/second and burst size
+PROVIDER_LIMITS = {
+    'mapbox': {'rate': 10, 'burst': 20},
+    'openweather': {'rate': 1, 'burst': 5},
+    'default': {'rate': 5, 'burst': 10}
+}
+
+
+class _ProviderPolicy:
+    def __init__(self, rate, burst):
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+
+
+class HttpClient:
+    """Shared keep-alive HTTP session for external APIs.
+
+    Connections are pooled per host, responses may be gzip-compressed, and
+    for polled endpoints the ETag / Last-Modified validators of the last
+    200 response are cached per URL and sent back, so an unchanged resource
+    costs a 304 with no body instead of a full download.
+
+    Each provider has a token-bucket budget and a circuit breaker.
+    Identical concurrent requests are coalesced into one, and failed
+    requests (connection errors, 429, 5xx) are retried with jittered
+    exponential backoff. When a provider is down or over budget, polled
+    endpoints fall back to their last cached body.
+    """
+
+    def __init__(self, pool_size=10, timeout=10, max_validators=512, retries=2):
+        self.timeout = timeout
+        self.max_validators = max_validators
+        self.retries = retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'User-Agent': 'SafeRouteAI/1.0'
+        })
+
+        # Request key -> (etag, last_modified, parsed body)
+        self._validators = OrderedDict()
+        self._providers = {}
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0, 'not_modified': 0, 'errors': 0, 'bytes_received': 0,
+            'retries': 0, 'rate_limited': 0, 'circuit_open': 0, 'stale_served': 0
+        }
+
+    def get_json(self, url, params=None, conditional=False, timeout=None, provider='default', parse=None):
+        """GET a JSON resource; returns the parsed body or None on a non-2xx status.
+
+        With `conditional=True` the cached validators for this URL are sent
+        and a 304 returns the body cached with them; the same body is served
+        when the provider is rate limited, failing or short-circuited.
+        Errors without a cached body are raised to the caller.
+
+        `parse`, when given, is called with the decompressed response body
+        as a binary file-like and its result is returned (and cached) in
+        place of the decoded JSON, so large bodies can be parsed as they
+        stream in. A URL must always be fetched with the same `parse`.
+        """
+        key = f"{url}?{urlencode(sorted((params or {}).items()))}"
+        policy = self._policy(provider)
+        try:
+            return self._flights.do(key, lambda: self._fetch(url, params, key, conditional, timeout, policy, parse))
+        except (RateLimitedError, CircuitOpenError, requests.RequestException) as e:
+            self._count(rate_limited=isinstance(e, RateLimitedError), circuit_open=isinstance(e, CircuitOpenError))
+            with self._lock:
+                cached = self._validators.get(key) if conditional else None
+            if cached is not None:
+                self._count(stale_served=1)
+                return cached[2]
+            if isinstance(e, requests.HTTPError):
+                return None
+            raise
+
+    def _fetch(self, url, params, key, conditional, timeout, policy, parse):
+        headers = {}
+        cached = None
+        if conditional:
+            with self._lock:
+                cached = self._validators.get(key)
+            if cached is not None:
+                etag, last_modified, _ = cached
+                if etag:
+                    headers['If-None-Match'] = etag
+                if last_modified:
+                    headers['If-Modified-Since'] = last_modified
+
+        timeout = timeout or self.timeout
+        for attempt in range(self.retries + 1):
+            policy.bucket.acquire(max_wait=timeout)
+            policy.breaker.before_call()
+            retry_after = 0.0
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=timeout,
+                                            stream=parse is not None)
+            except requests.RequestException:
+                policy.breaker.record_failure()
+                self._count(errors=1)
+                if attempt == self.retries:
+                    raise
+            else:
+                try:
+                    if response.status_code != 429 and response.status_code < 500:
+                        policy.breaker.record_success()
+                        return self._handle(response, key, conditional, cached, parse)
+
+                    policy.breaker.record_failure()
+                    if attempt == self.retries:
+                        response.raise_for_status()
+                    retry_after = self._retry_after(response)
+                finally:
+                    self._count(requests=1, bytes_received=self._received(response, parse is not None))
+                    response.close()
+
+            self._count(retries=1)
+            time.sleep(max(backoff_delay(attempt), min(retry_after, 30.0)))
+
+    def _handle(self, response, key, conditional, cached, parse):
+        if response.status_code == 304 and cached is not None:
+            self._count(not_modified=1)
+            with self._lock:
+                self._validators.move_to_end(key)
+            return cached[2]
+        if not response.ok:
+            return None
+
+        if parse is not None:
+            response.raw.decode_content = True
+            data = parse(response.raw)
+        else:
+            data = response.json()
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if conditional and (etag or last_modified):
+            with self._lock:
+                self._validators[key] = (etag, last_modified, data)
+                self._validators.move_to_end(key)
+                while len(self._validators) > self.max_validators:
+                    self._validators.popitem(last=False)
+        return data
+
+    @staticmethod
+    def _received(response, streamed):
+        """Bytes on the wire, before gzip decoding"""
+        length = response.headers.get('Content-Length')
+        if length:
+            return int(length)
+        return response.raw.tell() if streamed else len(response.content)
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return float(response.headers.get('Retry-After', 0))
+        except ValueError:
+            return 0.0
+
+    def _policy(self, provider):
+        with self._lock:
+            policy = self._providers.get(provider)
+            if policy is None:
+                limits = PROVIDER_LIMITS.get(provider, PROVIDER_LIMITS['default'])
+                policy = self._providers[provider] = _ProviderPolicy(limits['rate'], limits['burst'])
+            return policy
+
+    def provider_status(self):
+        """Circuit state and consecutive failures per provider"""
+        with self._lock:
+            return {
+                name: {'circuit': policy.breaker.state, 'failures': policy.breaker.failures}
+                for name, policy in self._providers.items()
+            }
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.stats[name] += int(value)
+            self.stats['coalesced'] = self._flights.coalesced
+
+    def close(self):
+        self.session.close()
+
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Process-wide HTTP client, so every session reuses the same connection pool"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient()
+        return _http_client
+
@@ -0,0 +1,191 @@
+import codecs
+import gc
+import json
+import re
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from utils.hazard_schema import empty_hazard_frame, to_hazard_frame
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Provider incident types -> our hazard types
+INCIDENT_TYPE_MAP = {
+    'accident': 'Accidents',
+    'collision': 'Accidents',
+    'disabled_vehicle': 'Traffic',
+    'congestion': 'Traffic',
+    'mass_transit': 'Traffic',
+    'planned_event': 'Traffic',
+    'lane_restriction': 'Road Closures',
+    'road_closure': 'Road Closures',
+    'closure': 'Road Closures',
+    'construction': 'Construction',
+    'road_hazard': 'Debris',
+    'debris': 'Debris',
+    'flooding': 'Flooding',
+    'flood': 'Flooding',
+    'weather': 'Flooding',
+    'landslide': 'Landslides',
+    'pothole': 'Potholes'
+}
+
+# Provider impact levels -> severity 1-5
+IMPACT_SEVERITY = {'low': 2, 'minor': 2, 'moderate': 3, 'major': 4, 'critical': 5}
+
+# Bytes read per call when streaming without ijson
+READ_SIZE = 64 * 1024
+
+_FEATURES_START = re.compile(r'"features"\s*:\s*\[')
+_ITEM_GAP = re.compile(r'[\s,]*')
+
+
+def parse_incidents(payload, source='Traffic API', chunk_size=8192):
+    """Convert a GeoJSON incident FeatureCollection into a canonical hazard frame.
+
+    `payload` may be an already-decoded dict, raw bytes/str, or a binary
+    file-like object. File-likes are streamed feature by feature, so memory
+    is bounded by the typed output columns rather than the decoded JSON
+    tree: with ijson when installed, otherwise by a slower stdlib decoder.
+    """
+    if hasattr(payload, 'read'):
+        frames = list(iter_incident_frames(payload, source=source, chunk_size=chunk_size))
+        return pd.concat(frames, ignore_index=True) if frames else empty_hazard_frame()
+    with _gc_paused():
+        if isinstance(payload, (bytes, bytearray, str)):
+            payload = orjson.loads(payload) if orjson is not None else json.loads(payload)
+        return _features_to_frame((payload or {}).get('features') or [], source, offset=0)
+
+
+@contextmanager
+def _gc_paused():
+    """Decoding allocates hundreds of thousands of short-lived containers that
+    cannot form cycles; letting the cyclic GC rescan them repeatedly costs
+    more than the decode itself"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def iter_incident_frames(fp, source='Traffic API', chunk_size=8192):
+    """Yield canonical hazard frames of up to chunk_size incidents from a GeoJSON stream"""
+    features = ijson.items(fp, 'features.item', use_float=True) if ijson is not None else _iter_features(fp)
+    chunk = []
+    offset = 0
+    for feature in features:
+        chunk.append(feature)
+        if len(chunk) == chunk_size:
+            with _gc_paused():
+                frame = _features_to_frame(chunk, source, offset)
+            yield frame
+            offset += len(chunk)
+            chunk = []
+    if chunk:
+        yield _features_to_frame(chunk, source, offset)
+
+
+def _iter_features(fp):
+    """Decode the items of a top-level "features" array one at a time, reading fp in blocks"""
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    eof = False
+
+    def fill():
+        nonlocal buffer, eof
+        block = fp.read(READ_SIZE)
+        eof = not block
+        buffer += text.decode(block or b'', final=eof)
+
+    while True:
+        match = _FEATURES_START.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        if eof:
+            return
+        # Keep a tail in case the key straddles two blocks
+        buffer = buffer[-32:]
+        fill()
+
+    pos = 0
+    while True:
+        pos = _ITEM_GAP.match(buffer, pos).end()
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            feature, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The item is cut off at the end of the buffer: drop what was consumed and read on
+            buffer, pos = buffer[pos:], 0
+            fill()
+            continue
+        yield feature
+        pos = end
+
+
+def _features_to_frame(features, source, offset):
+    """Pull feature fields straight into column arrays, one pass per column"""
+    if not features:
+        return empty_hazard_frame()
+
+    props = [feature.get('properties') or {} for feature in features]
+    lon, lat = _representative_points([feature.get('geometry') or {} for feature in features])
+
+    kinds = pd.Series([p.get('type') or p.get('incident_type') or p.get('category') for p in props], dtype=object)
+    hazard_type = kinds.str.lower().map(INCIDENT_TYPE_MAP).fillna('Other')
+    impact = pd.Series([p.get('impact') for p in props], dtype=object)
+    severity = impact.str.lower().map(IMPACT_SEVERITY).fillna(3)
+
+    ids = [
+        p.get('id') or feature.get('id') or f"{offset + i}"
+        for i, (feature, p) in enumerate(zip(features, props))
+    ]
+    frame = pd.DataFrame({
+        'id': [f"INC_{row_id}" for row_id in ids],
+        'hazard_type': hazard_type,
+        'severity': severity,
+        'confidence': 85,
+        'lat': lat,
+        'lon': lon,
+        'location': [p.get('road') or p.get('street') or p.get('location') or '' for p in props],
+        'description': [p.get('description') or '' for p in props],
+        'source': source,
+        'verified': True,
+        'timestamp': [p.get('start_time') or p.get('created') or p.get('timestamp') for p in props]
+    })
+    return to_hazard_frame(frame, default_source=source)
+
+
+def _representative_points(geometries):
+    """One (lon, lat) per geometry: the point itself, or the middle vertex of a line"""
+    lon = np.full(len(geometries), np.nan)
+    lat = np.full(len(geometries), np.nan)
+    for i, geometry in enumerate(geometries):
+        coords = geometry.get('coordinates')
+        kind = geometry.get('type')
+        if not coords:
+            continue
+        if kind == 'MultiLineString':
+            coords = coords[0]
+        if kind in ('LineString', 'MultiLineString', 'MultiPoint'):
+            coords = coords[len(coords) // 2]
+        try:
+            lon[i], lat[i] = float(coords[0]), float(coords[1])
+        except (TypeError, ValueError, IndexError):
+            continue
+    return lon, lat
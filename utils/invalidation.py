@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+import uuid
+from utils.redis_pool import REDIS_ERRORS, get_redis
+
+CHANNEL = 'saferoute:invalidate'
+
+
+class InvalidationBus:
+    """Broadcast cache invalidations to every process that holds a copy.
+
+    `publish(keys)` deletes the shared (Redis) copies once, then tells each
+    subscriber to drop its local copies: over Redis pub/sub when Redis is
+    reachable, and always directly to subscribers in this process, so a
+    single-process deployment without Redis still invalidates immediately.
+    """
+
+    def __init__(self, redis_health=None):
+        self.origin = uuid.uuid4().hex
+        self._redis = redis_health or get_redis()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._listener = None
+        self.stats = {'published': 0, 'received': 0, 'keys_dropped': 0}
+
+    def subscribe(self, callback):
+        """Call `callback(keys)` for every invalidation, local or remote"""
+        with self._lock:
+            self._subscribers.append(callback)
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='cache-invalidation', daemon=True)
+                self._listener.start()
+
+    def publish(self, keys):
+        """Invalidate cache keys everywhere; returns the number of keys"""
+        keys = sorted(set(keys))
+        if not keys:
+            return 0
+        self.stats['published'] += 1
+        client = self._redis.client
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.delete(*keys)
+                pipe.publish(CHANNEL, json.dumps({'origin': self.origin, 'keys': keys}))
+                pipe.execute()
+            except REDIS_ERRORS as e:
+                self._redis.record_error(e)
+        self._deliver(keys)
+        return len(keys)
+
+    def _deliver(self, keys):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(keys)
+            except Exception:
+                pass
+        self.stats['keys_dropped'] += len(keys) * len(subscribers)
+
+    def _listen(self):
+        while True:
+            client = self._redis.client
+            if client is None:
+                # Redis down: local delivery still works; entries written
+                # elsewhere meanwhile are bounded by their TTL
+                time.sleep(1.0)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(CHANNEL)
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    try:
+                        event = json.loads(message['data'])
+                    except (TypeError, ValueError):
+                        continue
+                    # Our own events were already delivered when published
+                    if event.get('origin') == self.origin:
+                        continue
+                    self.stats['received'] += 1
+                    self._deliver(event.get('keys') or [])
+            except Exception as e:
+                self._redis.record_error(e)
+                time.sleep(1.0)
+            finally:
+                pubsub.close()
+
+
+_invalidation_bus = None
+_invalidation_bus_lock = threading.Lock()
+
+
+def get_invalidation_bus():
+    """Process-wide invalidation bus"""
+    global _invalidation_bus
+    with _invalidation_bus_lock:
+        if _invalidation_bus is None:
+            _invalidation_bus = InvalidationBus()
+        return _invalidation_bus
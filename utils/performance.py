@@ -1,6 +1,7 @@
 ﻿import time
 import functools
 import streamlit as st
+from utils.resilience import CircuitOpenError, backoff_delay
 
 def time_execution(func):
     """Decorator to time function execution"""
@@ -17,19 +18,22 @@ def time_execution(func):
         return result
     return wrapper
 
-def retry_on_failure(max_retries=3, delay=1):
-    """Retry decorator for API calls"""
+def retry_on_failure(max_retries=3, delay=1, max_delay=30, exceptions=(Exception,)):
+    """Retry decorator for API calls, with exponential backoff and full jitter"""
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             for attempt in range(max_retries):
                 try:
                     return func(*args, **kwargs)
-                except Exception as e:
+                except CircuitOpenError:
+                    # The provider is known to be down; retrying only adds load
+                    raise
+                except exceptions as e:
                     if attempt == max_retries - 1:
                         st.error(f" Operation failed after {max_retries} attempts: {e}")
                         raise
-                    time.sleep(delay * (attempt + 1))
+                    time.sleep(backoff_delay(attempt, base=delay, cap=max_delay))
             return None
         return wrapper
     return decorator
@@ -0,0 +1,104 @@
+import threading
+from utils.config import Config
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Errors a Redis call can raise, and the subset meaning Redis itself is unreachable
+REDIS_ERRORS = (redis.RedisError,) if redis is not None else ()
+CONNECTION_ERRORS = (redis.ConnectionError, redis.TimeoutError) if redis is not None else ()
+
+
+class RedisHealth:
+    """Shared Redis connection pool plus a background view of whether Redis is up.
+
+    Nothing here blocks the caller: the pool is created lazily, and
+    reachability is decided by a daemon thread that pings every
+    `check_interval` seconds (every `retry_interval` while Redis is down).
+    Callers pass failed calls' errors to `record_error()`, which marks
+    Redis down on connection errors, and the checker re-enables Redis as
+    soon as a ping succeeds again.
+    """
+
+    def __init__(self, url, connect_timeout=0.25, socket_timeout=0.5,
+                 check_interval=15.0, retry_interval=2.0):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.socket_timeout = socket_timeout
+        self.check_interval = check_interval
+        self.retry_interval = retry_interval
+        self.available = False
+        self.stats = {'checks': 0, 'failures': 0, 'recoveries': 0}
+        self._client = None
+        self._wake = threading.Event()
+        self._checked = threading.Event()
+        self._checker = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The shared client, or None while Redis is unreachable"""
+        self._ensure_started()
+        return self._client if self.available else None
+
+    def mark_down(self):
+        """Record a failed call; the checker probes again shortly"""
+        if self.available:
+            self.available = False
+            self.stats['failures'] += 1
+        self._wake.set()
+
+    def record_error(self, error):
+        """Mark Redis down if `error` means it is unreachable; a bad command or reply leaves it up"""
+        if isinstance(error, CONNECTION_ERRORS):
+            self.mark_down()
+
+    def _ensure_started(self):
+        if self._checker is not None or redis is None:
+            return
+        with self._lock:
+            if self._checker is None:
+                pool = redis.ConnectionPool.from_url(
+                    self.url,
+                    socket_connect_timeout=self.connect_timeout,
+                    socket_timeout=self.socket_timeout,
+                    health_check_interval=30
+                )
+                self._client = redis.Redis(connection_pool=pool)
+                self._checker = threading.Thread(target=self._check_loop, name='redis-health', daemon=True)
+                self._checker.start()
+
+    def _check_loop(self):
+        while True:
+            self.stats['checks'] += 1
+            try:
+                self._client.ping()
+                if not self.available and self.stats['checks'] > 1:
+                    self.stats['recoveries'] += 1
+                self.available = True
+            except Exception:
+                self.available = False
+            self._checked.set()
+            self._wake.wait(self.check_interval if self.available else self.retry_interval)
+            self._wake.clear()
+
+    def wait_until_checked(self, timeout=1.0):
+        """Block up to `timeout` seconds for the first health check (scripts and benchmarks)"""
+        self._ensure_started()
+        self._checked.wait(timeout)
+        return self.available
+
+
+_redis_health = None
+_redis_health_lock = threading.Lock()
+
+
+def get_redis():
+    """Process-wide Redis pool and health state"""
+    global _redis_health
+    with _redis_health_lock:
+        if _redis_health is None:
+            _redis_health = RedisHealth(Config.REDIS_URL)
+        return _redis_health
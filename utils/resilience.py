@@ -0,0 +1,119 @@
+import random
+import threading
+import time
+
+
+class RateLimitedError(Exception):
+    """No request token became available within the allowed wait"""
+
+
+class CircuitOpenError(Exception):
+    """The provider is failing and calls are short-circuited until the cool-down ends"""
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """Exponential backoff with full jitter for retry number `attempt` (0-based)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a token if one is available; otherwise return the seconds until one is"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, max_wait=5.0):
+        """Block until a token is available, raising RateLimitedError after max_wait seconds"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self.try_acquire()
+            if wait == 0.0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitedError(f"no request token within {max_wait}s")
+            time.sleep(wait)
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls: one caller runs, the others share its result"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+class CircuitBreaker:
+    """Open after `failure_threshold` consecutive failures; allow one trial call after `reset_timeout` seconds"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = 'closed'
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError while open; after the cool-down let one trial through"""
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"circuit open after {self.failures} failures")
+                self.state = 'half_open'
+            elif self.state == 'half_open':
+                # A trial call is already in flight
+                raise CircuitOpenError("circuit half-open, trial call in progress")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = 'closed'
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self._opened_at = time.monotonic()
@@ -0,0 +1,226 @@
+import json
+import pickle
+import time
+import zlib
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# Payload header: magic, format version, codec id, compression id
+MAGIC = b'SR'
+FORMAT_VERSION = 1
+HEADER_SIZE = 5
+
+CODEC_PICKLE = 1
+CODEC_ARROW = 2
+CODEC_MSGPACK = 3
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+COMPRESSION_LZ4 = 3
+
+# Payloads smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+
+# Arrow compresses IPC buffers itself, column by column
+if pa is not None:
+    ARROW_COMPRESSION = next((name for name in ('zstd', 'lz4') if pa.Codec.is_available(name)), None)
+else:
+    ARROW_COMPRESSION = None
+
+
+def dumps(value, compress=True):
+    """Serialize a value with the best available codec, tagged in a 5-byte header.
+
+    DataFrames go through Arrow IPC, plain dicts and lists through msgpack
+    and anything else through pickle; non-Arrow payloads are compressed
+    with zstd, lz4 or zlib, whichever is installed first. A DataFrame that
+    falls back to pickle is never zlib-compressed: at DataFrame sizes zlib
+    costs an order of magnitude more time than the pickle itself.
+    """
+    if isinstance(value, pd.DataFrame) and pa is not None:
+        payload = _arrow_dumps(value, _header(CODEC_ARROW, COMPRESSION_NONE))
+        if payload is not None:
+            return payload
+
+    body = None
+    codec = CODEC_PICKLE
+    if msgpack is not None and isinstance(value, (dict, list)):
+        try:
+            body = msgpack.packb(value, use_bin_type=True)
+            codec = CODEC_MSGPACK
+        except (TypeError, ValueError, OverflowError):
+            body = None
+    if body is None:
+        body = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    compression = COMPRESSION_NONE
+    if compress and len(body) >= COMPRESS_MIN_BYTES:
+        compression, body = _compress(body, allow_zlib=not isinstance(value, pd.DataFrame))
+    return _header(codec, compression) + body
+
+
+def loads(data):
+    """Inverse of dumps; untagged data is treated as a plain pickle from before codecs existed"""
+    if data is None:
+        return None
+    view = memoryview(data)
+    if len(view) < HEADER_SIZE or bytes(view[:2]) != MAGIC:
+        return pickle.loads(data)
+
+    codec, compression = view[3], view[4]
+    body = view[HEADER_SIZE:]
+    if codec == CODEC_ARROW:
+        return _arrow_loads(data, HEADER_SIZE)
+
+    body = _decompress(compression, body)
+    if codec == CODEC_MSGPACK:
+        return msgpack.unpackb(body, raw=False)
+    return pickle.loads(body)
+
+
+def codec_name(data):
+    """Codec and compression recorded in a payload header, e.g. ('arrow', 'none')"""
+    codecs = {CODEC_PICKLE: 'pickle', CODEC_ARROW: 'arrow', CODEC_MSGPACK: 'msgpack'}
+    compressions = {COMPRESSION_NONE: 'none', COMPRESSION_ZLIB: 'zlib', COMPRESSION_ZSTD: 'zstd', COMPRESSION_LZ4: 'lz4'}
+    if len(data) < HEADER_SIZE or data[:2] != MAGIC:
+        return 'pickle', 'none'
+    return codecs.get(data[3], 'unknown'), compressions.get(data[4], 'unknown')
+
+
+def _header(codec, compression):
+    return MAGIC + bytes([FORMAT_VERSION, codec, compression])
+
+
+def _compress(body, allow_zlib=True):
+    if zstandard is not None:
+        return COMPRESSION_ZSTD, zstandard.ZstdCompressor(level=3).compress(body)
+    if lz4_frame is not None:
+        return COMPRESSION_LZ4, lz4_frame.compress(body)
+    if not allow_zlib:
+        return COMPRESSION_NONE, body
+    return COMPRESSION_ZLIB, zlib.compress(body, 1)
+
+
+def _decompress(compression, body):
+    if compression == COMPRESSION_NONE:
+        return body
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdDecompressor().decompress(body)
+    if compression == COMPRESSION_LZ4:
+        return lz4_frame.decompress(body)
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(body)
+    raise ValueError(f"Unknown compression id {compression}")
+
+
+def _arrow_dumps(frame, header):
+    """Header plus Arrow IPC stream for a frame, or None when a column has no faithful Arrow type"""
+    # attrs travel in our own metadata key, pickled; Arrow would try JSON and drop them
+    columns_only = frame.copy(deep=False)
+    columns_only.attrs = {}
+    try:
+        table = pa.Table.from_pandas(columns_only, preserve_index=not isinstance(frame.index, pd.RangeIndex))
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return None
+
+    # Tuple columns (e.g. dedup provenance) come back as lists; remember to restore them
+    tuple_columns = [
+        field.name for field in table.schema
+        if pa.types.is_list(field.type) and frame[field.name].map(type).eq(tuple).all()
+    ]
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'saferoute.tuple_columns'] = json.dumps(tuple_columns).encode('utf-8')
+    if frame.attrs:
+        try:
+            metadata[b'saferoute.attrs'] = pickle.dumps(frame.attrs, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            pass
+    table = table.replace_schema_metadata(metadata)
+
+    # Header goes straight into the sink so the stream is copied out only once
+    sink = pa.BufferOutputStream()
+    sink.write(header)
+    options = pa.ipc.IpcWriteOptions(compression=ARROW_COMPRESSION)
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _arrow_loads(data, offset):
+    # py_buffer wraps the payload without copying; uncompressed numeric
+    # columns are then handed to pandas without another copy
+    buffer = pa.py_buffer(data)[offset:]
+    table = pa.ipc.open_stream(buffer).read_all()
+    metadata = table.schema.metadata or {}
+    frame = table.to_pandas(split_blocks=True, self_destruct=True)
+
+    for name in json.loads(metadata.get(b'saferoute.tuple_columns', b'[]')):
+        frame[name] = [tuple(items) if items is not None else None for items in frame[name]]
+    if b'saferoute.attrs' in metadata:
+        frame.attrs.update(pickle.loads(metadata[b'saferoute.attrs']))
+    return frame
+
+
+def _benchmark(sizes=(10**4, 10**5, 10**6), repeat=3):
+    """Payload size and encode/decode time against pickle for hazard-shaped frames"""
+    from utils.hazard_schema import HAZARD_TYPES, HAZARD_SOURCES, to_hazard_frame
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>8} {'codec':<22} {'MB':>8} {'encode ms':>10} {'decode ms':>10}")
+    for n in sizes:
+        frame = to_hazard_frame(pd.DataFrame({
+            'id': [f"HZ{i:07d}" for i in range(n)],
+            'hazard_type': rng.choice(HAZARD_TYPES, n),
+            'severity': rng.integers(1, 6, n),
+            'confidence': rng.uniform(40, 100, n).round(1),
+            'lat': rng.uniform(28.4, 28.9, n),
+            'lon': rng.uniform(76.9, 77.4, n),
+            'location': rng.choice(['Connaught Place', 'India Gate', 'Ring Road', 'Karol Bagh'], n),
+            'description': rng.choice(['Reported by commuter', 'Verified by patrol', ''], n),
+            'source': rng.choice(HAZARD_SOURCES, n),
+            'verified': rng.random(n) > 0.3,
+            'timestamp': pd.Timestamp('2026-01-01') + pd.to_timedelta(rng.integers(0, 86400, n), unit='s')
+        }))
+
+        candidates = [
+            ('pickle', lambda f: pickle.dumps(f, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+            ('pickle+zlib', lambda f: zlib.compress(pickle.dumps(f, protocol=pickle.HIGHEST_PROTOCOL), 1),
+             lambda b: pickle.loads(zlib.decompress(b))),
+            (f"arrow ({ARROW_COMPRESSION or 'none'})", dumps, loads)
+        ]
+        for label, encode, decode in candidates:
+            encode_times, decode_times = [], []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                payload = encode(frame)
+                encode_times.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                decode(payload)
+                decode_times.append(time.perf_counter() - started)
+            print(f"{n:>8} {label:<22} {len(payload) / 1e6:>8.2f} "
+                  f"{min(encode_times) * 1000:>10.1f} {min(decode_times) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    _benchmark()
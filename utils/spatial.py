@@ -0,0 +1,139 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def project(lat, lon, ref_lat):
+    """Equirectangular projection to metres around a reference latitude.
+
+    Accurate to well under 1% at city scale, which is all corridor and
+    proximity queries need.
+    """
+    x = EARTH_RADIUS_M * np.radians(lon) * np.cos(np.radians(ref_lat))
+    y = EARTH_RADIUS_M * np.radians(lat)
+    return x, y
+
+
+def parse_bbox(bbox):
+    """(west, south, east, north) from a "west,south,east,north" string or a 4-sequence"""
+    if isinstance(bbox, str):
+        bbox = bbox.split(',')
+    west, south, east, north = (float(v) for v in bbox)
+    return west, south, east, north
+
+
+def format_bbox(west, south, east, north):
+    return f"{west:.6f},{south:.6f},{east:.6f},{north:.6f}"
+
+
+def lonlat_to_tile(lon, lat, zoom):
+    """Web-Mercator (x, y) tile indices containing each point at `zoom`"""
+    n = 2 ** zoom
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.05112878, 85.05112878)
+    x = np.floor((np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * n)
+    lat_rad = np.radians(lat)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat_rad)) / np.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def tile_bounds(zoom, x, y):
+    """(west, south, east, north) of tile z/x/y"""
+    n = 2 ** zoom
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n)))))
+    south = float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + 1) / n)))))
+    return west, south, east, north
+
+
+def tiles_for_bbox(bbox, zoom, max_tiles=None):
+    """(zoom, tiles) covering a bbox, where tiles is a list of (x, y).
+
+    When more than `max_tiles` would be needed the zoom is lowered until
+    the cover fits, so a zoomed-out viewport costs a few large tiles
+    rather than hundreds of small ones.
+    """
+    west, south, east, north = parse_bbox(bbox)
+    while True:
+        (x0, x1), (y1, y0) = lonlat_to_tile([west, east], [south, north], zoom)
+        count = (x1 - x0 + 1) * (y1 - y0 + 1)
+        if max_tiles is None or count <= max_tiles or zoom == 0:
+            break
+        zoom -= 1
+    return zoom, [(int(x), int(y)) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+class HazardIndex:
+    """KD-tree over hazard positions in a local metric projection"""
+
+    def __init__(self, lat, lon, ref_lat=None):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        if ref_lat is None:
+            ref_lat = float(lat.mean()) if lat.size else 0.0
+        self.ref_lat = ref_lat
+        self.x, self.y = project(lat, lon, self.ref_lat)
+        self.size = len(lat)
+        self._tree = cKDTree(np.column_stack([self.x, self.y])) if self.size else None
+
+    def within(self, lat, lon, radius_m):
+        """Indices of hazards within radius_m of a point"""
+        if self._tree is None:
+            return np.array([], dtype=np.intp)
+        x, y = project(lat, lon, self.ref_lat)
+        return np.asarray(self._tree.query_ball_point([x, y], radius_m), dtype=np.intp)
+
+    def segments_query(self, a_lat, a_lon, b_lat, b_lon, radius_m, piece_m=None):
+        """Find every (segment, hazard) pair closer than radius_m, for all segments at once.
+
+        Segments are cut into pieces no longer than piece_m so a single
+        KD-tree range join between piece midpoints and hazards stays tight;
+        candidate pairs are then checked with an exact point-to-segment
+        distance. Returns parallel arrays (segment_idx, hazard_idx, distance_m).
+        """
+        empty = (np.array([], dtype=np.intp), np.array([], dtype=np.intp), np.array([], dtype=np.float64))
+        a_lat = np.atleast_1d(np.asarray(a_lat, dtype=np.float64))
+        if self._tree is None or a_lat.size == 0:
+            return empty
+
+        ax, ay = project(a_lat, np.atleast_1d(a_lon), self.ref_lat)
+        bx, by = project(np.atleast_1d(b_lat), np.atleast_1d(b_lon), self.ref_lat)
+        dx, dy = bx - ax, by - ay
+        lengths = np.hypot(dx, dy)
+
+        piece_m = piece_m or max(4 * radius_m, 1.0)
+        n_pieces = np.maximum(np.ceil(lengths / piece_m), 1).astype(np.intp)
+        piece_segment = np.repeat(np.arange(a_lat.size), n_pieces)
+        starts = np.cumsum(n_pieces) - n_pieces
+        piece_pos = np.arange(piece_segment.size) - np.repeat(starts, n_pieces)
+        t_mid = (piece_pos + 0.5) / n_pieces[piece_segment]
+        mid = np.column_stack([
+            ax[piece_segment] + t_mid * dx[piece_segment],
+            ay[piece_segment] + t_mid * dy[piece_segment]
+        ])
+
+        reach = radius_m + float((lengths / n_pieces).max()) / 2
+        pairs = cKDTree(mid).sparse_distance_matrix(self._tree, reach, output_type='ndarray')
+        if pairs.size == 0:
+            return empty
+
+        segment_idx = piece_segment[pairs['i']]
+        hazard_idx = pairs['j'].astype(np.intp)
+
+        # Exact distance to each segment, clamped to its endpoints
+        sx, sy = ax[segment_idx], ay[segment_idx]
+        sdx, sdy = dx[segment_idx], dy[segment_idx]
+        hx, hy = self.x[hazard_idx], self.y[hazard_idx]
+        t = np.clip(((hx - sx) * sdx + (hy - sy) * sdy) / np.maximum(sdx * sdx + sdy * sdy, 1e-9), 0, 1)
+        distances = np.hypot(hx - (sx + t * sdx), hy - (sy + t * sdy))
+
+        keep = distances <= radius_m
+        segment_idx, hazard_idx, distances = segment_idx[keep], hazard_idx[keep], distances[keep]
+
+        # A hazard near two pieces of one segment is reported once
+        order = np.lexsort((hazard_idx, segment_idx))
+        segment_idx, hazard_idx, distances = segment_idx[order], hazard_idx[order], distances[order]
+        unique = np.ones(segment_idx.size, dtype=bool)
+        unique[1:] = (np.diff(segment_idx) != 0) | (np.diff(hazard_idx) != 0)
+        return segment_idx[unique], hazard_idx[unique], distances[unique]
@@ -0,0 +1,442 @@
+import hashlib
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from utils.hazard_filters import HazardFilter, get_filter_cache
+from utils.hazard_lod import DETAIL_ZOOM, GRID_CELL_OFFSET, max_points
+
+# Hazards are sorted by their Morton (Z-order) code at this zoom, so every
+# tile at or above it is one contiguous range of the index
+INDEX_ZOOM = 16
+MAX_ZOOM = 22
+
+# Tile coordinate space, and how far outside a tile features are still
+# included so symbols straddling a tile edge are drawn whole (extent units)
+EXTENT = 4096
+BUFFER = 64
+
+# TileCache generation directories: <run>-<snapshot version>[-<filter hash>]
+GENERATION_NAME = re.compile(r'^[0-9a-f]{8}-\d+(?:-[0-9a-f]{12})?$')
+
+HAZARD_LAYER = 'hazards'
+CLUSTER_LAYER = 'clusters'
+
+
+def world_xy(lon, lat):
+    """Web-Mercator position of each point in [0, 1) world units"""
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.05112878, 85.05112878)
+    wx = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0
+    wy = (1.0 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2.0
+    return np.clip(wx, 0.0, 1.0 - 1e-12), np.clip(wy, 0.0, 1.0 - 1e-12)
+
+
+def morton(x, y):
+    """Interleave the bits of tile x and y (up to 32 bits each) into one Z-order code"""
+    return _spread_bits(x) | (_spread_bits(y) << np.uint64(1))
+
+
+def _spread_bits(v):
+    v = np.asarray(v).astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+class HazardTileIndex:
+    """Hazards of one snapshot, indexed for z/x/y tile queries.
+
+    Points are sorted by Morton code at INDEX_ZOOM, so the hazards of any
+    tile come from at most a 3x3 block of `searchsorted` ranges (the tile
+    and its buffer) and never from a scan. Cluster summaries are
+    precomputed for every cell zoom by rolling each level up into the next
+    coarser one, so a zoomed-out tile reads at most a few dozen cells no
+    matter how many hazards lie under it.
+    """
+
+    def __init__(self, hazards_df, index_zoom=INDEX_ZOOM):
+        self.index_zoom = index_zoom
+        frame = hazards_df[hazards_df['lat'].notna() & hazards_df['lon'].notna()]
+        wx, wy = world_xy(frame['lon'].to_numpy(), frame['lat'].to_numpy())
+        n = 2 ** index_zoom
+        codes = morton(np.minimum(wx * n, n - 1).astype(np.int64), np.minimum(wy * n, n - 1).astype(np.int64))
+        order = np.argsort(codes, kind='stable')
+        self.size = len(order)
+        self.codes = codes[order]
+        self.wx, self.wy = wx[order], wy[order]
+        # Text columns stay in snapshot order (no string reshuffle); `_rows` maps index positions to them
+        self._rows = order
+        self.text = {name: _text_column(frame, name) for name in ('id', 'source', 'location', 'description')}
+        if 'timestamp' in frame:
+            self.timestamp = pd.to_datetime(frame['timestamp'], errors='coerce').to_numpy(dtype='datetime64[m]')
+        else:
+            self.timestamp = np.full(self.size, np.datetime64('NaT'), dtype='datetime64[m]')
+
+        types = frame['hazard_type']
+        if not isinstance(types.dtype, pd.CategoricalDtype):
+            types = types.astype('category')
+        self.type_names = np.asarray(types.cat.categories, dtype=object)
+        if not len(self.type_names):
+            self.type_names = np.array(['Other'], dtype=object)
+        self.type_codes = np.maximum(types.cat.codes.to_numpy(), 0).astype(np.int64)[order]
+        self.severity = frame['severity'].fillna(0).to_numpy().astype(np.int64)[order]
+        self.confidence = frame['confidence'].fillna(0).to_numpy().astype(np.float64)[order]
+        if 'verified' in frame:
+            self.verified = frame['verified'].fillna(False).to_numpy().astype(bool)[order]
+        else:
+            self.verified = np.zeros(self.size, dtype=bool)
+        self.levels = self._build_levels()
+
+    def _build_levels(self):
+        """Per cell zoom: cell codes with count, centroid, worst severity, confidence sum and type counts"""
+        # Type counts per finest cell, one row per hazard type
+        first = np.concatenate([[True], self.codes[1:] != self.codes[:-1]])[:self.size]
+        cell = np.cumsum(first) - 1
+        n_cells = int(first.sum())
+        type_counts = np.bincount(self.type_codes * n_cells + cell, minlength=len(self.type_names) * n_cells)
+        level = _reduce_cells(self.codes, {
+            'count': np.ones(self.size, dtype=np.int64),
+            'sum_wx': self.wx,
+            'sum_wy': self.wy,
+            'sum_confidence': self.confidence
+        }, {'max_severity': self.severity})
+        level[1]['types'] = type_counts.reshape(len(self.type_names), n_cells).astype(np.int32)
+
+        levels = {self.index_zoom: level}
+        for zoom in range(self.index_zoom - 1, -1, -1):
+            codes, cells = level
+            sums = {name: cells[name] for name in ('count', 'sum_wx', 'sum_wy', 'sum_confidence', 'types')}
+            level = _reduce_cells(codes >> np.uint64(2), sums, {'max_severity': cells['max_severity']})
+            levels[zoom] = level
+        for codes, cells in levels.values():
+            cells['wx'] = cells['sum_wx'] / np.maximum(cells['count'], 1)
+            cells['wy'] = cells['sum_wy'] / np.maximum(cells['count'], 1)
+        return levels
+
+    def select(self, codes, code_zoom, wx, wy, z, x, y, buffer=BUFFER):
+        """Positions (sorted) of entries with Morton codes at `code_zoom` inside tile z/x/y plus buffer"""
+        if len(codes) == 0:
+            return np.array([], dtype=np.intp)
+        n = 2 ** z
+        margin = buffer / EXTENT
+        query_zoom = min(z, code_zoom)
+        scale = 2 ** query_zoom / n
+        limit = 2 ** query_zoom - 1
+        x0, x1 = max(int(np.floor((x - margin) * scale)), 0), min(int(np.floor((x + 1 + margin) * scale)), limit)
+        y0, y1 = max(int(np.floor((y - margin) * scale)), 0), min(int(np.floor((y + 1 + margin) * scale)), limit)
+
+        shift = np.uint64(2 * (code_zoom - query_zoom))
+        starts = np.sort(np.array([int(morton(tx, ty)) for tx in range(x0, x1 + 1) for ty in range(y0, y1 + 1)],
+                                  dtype=np.uint64))
+        lo = np.searchsorted(codes, starts << shift)
+        hi = np.searchsorted(codes, (starts + np.uint64(1)) << shift)
+        idx = np.concatenate([np.arange(a, b) for a, b in zip(lo, hi) if b > a] or [np.array([], dtype=np.intp)])
+
+        # The ranges are whole (buffered) ancestor tiles; keep what falls inside this tile's buffer
+        lx, ly = wx[idx] * n - x, wy[idx] * n - y
+        inside = (lx >= -margin) & (lx <= 1 + margin) & (ly >= -margin) & (ly <= 1 + margin)
+        return idx[inside]
+
+    def hazard_layer(self, z, x, y):
+        """Individual hazards in a tile, capped per zoom with the most severe and confident first"""
+        idx = self.select(self.codes, self.index_zoom, self.wx, self.wy, z, x, y)
+        cap = max_points(z)
+        if len(idx) > cap:
+            order = np.lexsort((-self.confidence[idx], -self.severity[idx]))
+            idx = np.sort(idx[order[:cap]])
+        if not len(idx):
+            return self.wx[idx], self.wy[idx], []
+        rows = self._rows[idx]
+        timestamps = np.datetime_as_string(self.timestamp[rows], unit='m').astype(object)
+        properties = [
+            ('id', self.text['id'][rows]),
+            ('hazard_type', self.type_names[self.type_codes[idx]]),
+            ('severity', self.severity[idx]),
+            ('confidence', np.round(self.confidence[idx], 1)),
+            ('source', self.text['source'][rows]),
+            ('location', self.text['location'][rows]),
+            ('description', self.text['description'][rows]),
+            ('timestamp', np.where(timestamps == 'NaT', '', [t.replace('T', ' ') for t in timestamps])),
+            ('verified', self.verified[idx])
+        ]
+        return self.wx[idx], self.wy[idx], properties
+
+    def cluster_layer(self, z, x, y):
+        """Cell summaries in a tile: cells are tiles GRID_CELL_OFFSET zooms below it"""
+        cell_zoom = min(z + GRID_CELL_OFFSET, self.index_zoom)
+        codes, cells = self.levels[cell_zoom]
+        idx = self.select(codes, cell_zoom, cells['wx'], cells['wy'], z, x, y)
+        count = cells['count'][idx]
+        properties = [
+            ('count', count),
+            ('max_severity', cells['max_severity'][idx]),
+            ('mean_confidence', np.round(cells['sum_confidence'][idx] / count, 1)),
+            ('hazard_type', self.type_names[cells['types'][:, idx].argmax(axis=0)])
+        ]
+        return cells['wx'][idx], cells['wy'][idx], properties
+
+    def tile(self, z, x, y):
+        """Encoded MVT tile z/x/y: clusters below DETAIL_ZOOM, individual hazards from it on"""
+        if z < DETAIL_ZOOM:
+            return encode_tile([(CLUSTER_LAYER,) + self.cluster_layer(z, x, y)], z, x, y)
+        return encode_tile([(HAZARD_LAYER,) + self.hazard_layer(z, x, y)], z, x, y)
+
+
+def _text_column(frame, name):
+    if name not in frame:
+        return np.full(len(frame), '', dtype=object)
+    return frame[name].astype(object).to_numpy(dtype=object, na_value='')
+
+
+def _reduce_cells(codes, sums, maxima):
+    """Group Morton-sorted entries by code: per distinct code, sums and maxima
+    of 1-d columns and row-wise sums of 2-d (k x n) ones"""
+    if not len(codes):
+        return codes, {name: values[..., :0] for name, values in {**sums, **maxima}.items()}
+    starts = np.flatnonzero(np.concatenate([[True], codes[1:] != codes[:-1]]))
+    cells = {
+        name: np.stack([np.add.reduceat(row, starts) for row in values]) if values.ndim == 2
+        else np.add.reduceat(values, starts)
+        for name, values in sums.items()
+    }
+    cells.update({name: np.maximum.reduceat(values, starts) for name, values in maxima.items()})
+    return codes[starts], cells
+
+
+# --- Mapbox Vector Tile (v2.1) encoding -----------------------------------
+#
+# Features are encoded column-wise: each layer becomes a matrix of varint
+# tokens, one row per feature, whose length prefixes are computed from the
+# other tokens, and the whole matrix is varint-encoded in one numpy pass.
+
+_MOVE_TO_ONE = (1 << 3) | 1  # MoveTo command, count 1
+
+
+def encode_tile(layers, z, x, y):
+    """MVT bytes for [(name, wx, wy, properties)] point layers in tile z/x/y; empty layers are left out"""
+    n = 2 ** z
+    out = []
+    for name, wx, wy, properties in layers:
+        if len(wx) == 0:
+            continue
+        px = np.rint((np.asarray(wx) * n - x) * EXTENT).astype(np.int64)
+        py = np.rint((np.asarray(wy) * n - y) * EXTENT).astype(np.int64)
+        layer = _encode_layer(name, px, py, properties)
+        out.append(b'\x1a' + _varint(len(layer)) + layer)
+    return b''.join(out)
+
+
+def _encode_layer(name, px, py, properties):
+    n = len(px)
+    keys, values, tag_columns = [], [], []
+    for key_index, (key, column) in enumerate(properties):
+        codes, uniques = pd.factorize(np.asarray(column), use_na_sentinel=False)
+        tag_columns.append(np.full(n, key_index, dtype=np.uint64))
+        tag_columns.append(codes.astype(np.uint64) + np.uint64(len(values)))
+        keys.append(key)
+        values.extend(uniques.tolist() if hasattr(uniques, 'tolist') else list(uniques))
+
+    tags = np.column_stack(tag_columns) if tag_columns else np.zeros((n, 0), dtype=np.uint64)
+    geometry = np.column_stack([np.full(n, _MOVE_TO_ONE, dtype=np.uint64), _zigzag(px), _zigzag(py)])
+    tags_length = _varint_lengths(tags).sum(axis=1)
+    geometry_length = _varint_lengths(geometry).sum(axis=1)
+    feature_length = (1 + _varint_lengths(tags_length) + tags_length  # tags
+                      + 2                                               # type = POINT
+                      + 1 + _varint_lengths(geometry_length) + geometry_length)
+    features = np.column_stack([
+        np.full(n, 0x12, dtype=np.uint64), feature_length.astype(np.uint64),
+        np.full(n, 0x12, dtype=np.uint64), tags_length.astype(np.uint64), tags,
+        np.full(n, 0x18, dtype=np.uint64), np.ones(n, dtype=np.uint64),
+        np.full(n, 0x22, dtype=np.uint64), geometry_length.astype(np.uint64), geometry
+    ])
+
+    name = name.encode('utf-8')
+    parts = [b'\x78\x02', b'\x0a' + _varint(len(name)) + name, _varints(features.ravel())]
+    for key in keys:
+        key = key.encode('utf-8')
+        parts.append(b'\x1a' + _varint(len(key)) + key)
+    for value in values:
+        value = _encode_value(value)
+        parts.append(b'\x22' + _varint(len(value)) + value)
+    parts.append(b'\x28' + _varint(EXTENT))
+    return b''.join(parts)
+
+
+def _encode_value(value):
+    if isinstance(value, (bool, np.bool_)):
+        return b'\x38' + (b'\x01' if value else b'\x00')
+    if isinstance(value, (int, np.integer)):
+        value = int(value)
+        return b'\x28' + _varint(value) if value >= 0 else b'\x30' + _varint((-value << 1) - 1)
+    if isinstance(value, (float, np.floating)):
+        return b'\x19' + struct.pack('<d', float(value))
+    value = str(value).encode('utf-8')
+    return b'\x0a' + _varint(len(value)) + value
+
+
+def _zigzag(values):
+    values = np.asarray(values, dtype=np.int64)
+    return np.where(values >= 0, values << 1, ((-values) << 1) - 1).astype(np.uint64)
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _varint_lengths(values):
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(values.shape, dtype=np.int64)
+    for shift in range(7, 64, 7):
+        lengths += values >= np.uint64(1 << shift)
+    return lengths
+
+
+def _varints(values):
+    """Protobuf varint encoding of a flat uint64 array"""
+    lengths = _varint_lengths(values)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    out = np.empty(int(ends[-1]) if len(ends) else 0, dtype=np.uint8)
+    for i in range(int(lengths.max()) if len(lengths) else 0):
+        active = lengths > i
+        chunk = ((values[active] >> np.uint64(7 * i)) & np.uint64(0x7F)).astype(np.uint8)
+        out[starts[active] + i] = chunk | ((lengths[active] > i + 1).astype(np.uint8) << 7)
+    return out.tobytes()
+
+
+class TileCache:
+    """Encoded tiles on disk, one directory per snapshot generation.
+
+    A generation is written once and never modified: tiles are written to
+    a temporary file and renamed into place, so concurrent readers see
+    either nothing or a whole tile. Generations are prefixed with a
+    per-process token, so a restarted server never serves tiles left by an
+    earlier run whose snapshot versions happened to match. Only directories
+    named like a generation are ever removed, so the root may be shared.
+    """
+
+    def __init__(self, root='data/tiles'):
+        self.root = root
+        self.run = uuid.uuid4().hex[:8]
+        os.makedirs(root, exist_ok=True)
+
+    def generation(self, version, hazard_filter=None):
+        if hazard_filter is None or hazard_filter.is_empty:
+            return f"{self.run}-{int(version)}"
+        return f"{self.run}-{int(version)}-{hashlib.sha1(hazard_filter.to_query().encode('utf-8')).hexdigest()[:12]}"
+
+    def path(self, generation, z, x, y):
+        return os.path.join(self.root, generation, str(z), str(x), f"{y}.pbf")
+
+    def get(self, generation, z, x, y):
+        try:
+            with open(self.path(generation, z, x, y), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, generation, z, x, y, data):
+        path = self.path(generation, z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def retire(self, keep):
+        """Remove every generation directory not in `keep` (including earlier runs')"""
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name not in keep and GENERATION_NAME.match(name) and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+
+class HazardTileService:
+    """Hazard vector tiles for the current snapshot, indexed once per version and cached on disk.
+
+    `snapshot` is a callable returning the current hazard frame (for
+    example EnhancedDataIngestion.get_hazard_snapshot). Each filter
+    combination requested gets its own index, built from the filtered
+    snapshot, for up to `max_filters` combinations; indexes are rebuilt
+    when the frame changes and generations no longer indexed are removed
+    from the disk cache in the background.
+    """
+
+    def __init__(self, snapshot, cache_dir='data/tiles', max_filters=8):
+        self.snapshot = snapshot
+        self.cache = TileCache(cache_dir)
+        self.max_filters = max_filters
+        self._indexes = OrderedDict()  # filter -> (source frame, generation, index)
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.stats = {'generated': 0, 'disk_hits': 0, 'generate_seconds': 0.0, 'index_builds': 0,
+                      'index_seconds': 0.0}
+
+    def current(self, hazard_filter=None):
+        """(generation, index) for the current snapshot under a HazardFilter.
+
+        A new snapshot is indexed by one caller while the others keep
+        serving the previous generation; only the first build for a filter
+        makes callers wait.
+        """
+        hazard_filter = hazard_filter or HazardFilter.from_dict({})
+        frame = self.snapshot()
+        with self._lock:
+            entry = self._indexes.get(hazard_filter)
+        if (entry is None or entry[0] is not frame) and self._build_lock.acquire(blocking=entry is None):
+            try:
+                entry = self._indexes.get(hazard_filter)
+                if entry is None or entry[0] is not frame:
+                    entry = self._build(frame, hazard_filter)
+            finally:
+                self._build_lock.release()
+        with self._lock:
+            if hazard_filter in self._indexes:
+                self._indexes.move_to_end(hazard_filter)
+        return entry[1], entry[2]
+
+    def _build(self, frame, hazard_filter):
+        started = time.perf_counter()
+        index = HazardTileIndex(get_filter_cache().apply(frame, hazard_filter))
+        self.stats['index_builds'] += 1
+        self.stats['index_seconds'] += time.perf_counter() - started
+        version = frame.attrs.get('snapshot_version', self.stats['index_builds'])
+        entry = (frame, self.cache.generation(version, hazard_filter), index)
+        with self._lock:
+            self._indexes[hazard_filter] = entry
+            while len(self._indexes) > self.max_filters:
+                self._indexes.popitem(last=False)
+            keep = {generation for _, generation, _ in self._indexes.values()}
+        threading.Thread(target=self.cache.retire, args=(keep,), daemon=True).start()
+        return entry
+
+    def tile(self, z, x, y, hazard_filter=None):
+        """(generation, MVT bytes) of tile z/x/y; raises ValueError outside the tile pyramid"""
+        if not 0 <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise ValueError(f"No tile {z}/{x}/{y}")
+        generation, index = self.current(hazard_filter)
+        data = self.cache.get(generation, z, x, y)
+        if data is not None:
+            self.stats['disk_hits'] += 1
+            return generation, data
+
+        started = time.perf_counter()
+        data = index.tile(z, x, y)
+        self.stats['generated'] += 1
+        self.stats['generate_seconds'] += time.perf_counter() - started
+        self.cache.put(generation, z, x, y, data)
+        return generation, data